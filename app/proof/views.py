@@ -54,20 +54,16 @@ class Walker:
         self.buffer.write(template.render(**kwargs))
 
     def unpack_goal(self, goal):
+        '''Print the formulas of goal in rows of (left, right), with the
+        subterms they share abbreviated.'''
+        texts, abbreviations = env.printer.print_shared(list(goal.left)
+                                                        + list(goal.right))
+        left, right = texts[:len(goal.left)], texts[len(goal.left):]
         p_goal = []
-        for i in range(max(len(goal.left), len(goal.right))):
-            if i < len(goal.left):
-                left = env.printer.print_term(goal.left[i])
-            else:
-                left = ''
-
-            if i < len(goal.right):
-                right = env.printer.print_term(goal.right[i])
-            else:
-                right = ''
-
-            p_goal.append((left, right))
-        return p_goal
+        for i in range(max(len(left), len(right))):
+            p_goal.append((left[i] if i < len(left) else '',
+                           right[i] if i < len(right) else ''))
+        return p_goal, abbreviations
 
     def begin_primitive(self, primitive, goal):
         assumption_index = self.assumption_index
@@ -78,10 +74,11 @@ class Walker:
         else:
             rules = []
         p_primitive = env.print_proof(primitive)
-        p_goal = self.unpack_goal(goal)
+        p_goal, abbreviations = self.unpack_goal(goal)
         self.render('begin_primitive',
                     primitive=p_primitive,
                     goal=p_goal,
+                    abbreviations=abbreviations,
                     rules=rules,
                     assumption_index=assumption_index)
 
@@ -90,10 +87,11 @@ class Walker:
     
     def begin_compound(self, compound, goal):
         p_compound = env.print_proof(compound)
-        p_goal = self.unpack_goal(goal)
+        p_goal, abbreviations = self.unpack_goal(goal)
         self.render('begin_compound',
                     compound=p_compound,
-                    goal=p_goal)
+                    goal=p_goal,
+                    abbreviations=abbreviations)
 
     def end_compound(self, compound):
         self.render('end_compound')
@@ -147,7 +145,7 @@ def proof_advance(request, proof_id):
     proof_goal = sequent.Sequent([], [env.parse(str(proof.goal))])
 
     walker = AssumptionWalker()
-    proof_plan.evaluate(proof_goal, walker)
+    proof_plan.evaluate(proof_goal, walker, expansions=env.expansion_cache)
     
     rule_name = str(request.POST['rule_name'])
     args = request.POST.getlist('arg')
@@ -157,7 +155,7 @@ def proof_advance(request, proof_id):
     rule = builder(*args)
 
     assumption, assumption_goal = walker.assumptions[assumption_index]
-    subgoals = rule.evaluate(assumption_goal)
+    subgoals = rule.evaluate(assumption_goal, expansions=env.expansion_cache)
     padding = [env.rules['assumption']() for subgoal in subgoals]
     branch = trace.Branch(rule, *padding)
 
@@ -0,0 +1,96 @@
+'''Time matching the patterns of the rules against goal formulas.
+
+Each pattern is matched against the axioms of the set theory, first by
+parsing it and interpreting it with match_term as Environment.match
+used to, then with the pattern compiled once. Last, applicable_rules
+is timed on goals with each axiom on either side, which is what the
+proof page does for every open goal: first with its memo cleared
+before every call, then with the memo, and then cleared again after
+adding a few hundred rules whose principal formulas are small nests
+of negations and disjunctions, to show that rules which cannot apply
+cost next to nothing.
+
+Run with ``python -m cheqed.core.benchmarks.matching``.
+'''
+
+import time
+
+from cheqed.core import environment
+from cheqed.core.benchmarks.parsing import pattern_strings
+from cheqed.core.match import CompiledPattern, match_term
+from cheqed.core.sequent import Sequent
+from cheqed.core.unification import UnificationError
+
+def time_matches(match, patterns, terms, rounds):
+    start = time.time()
+    for i in range(rounds):
+        for pattern in patterns:
+            for term in terms:
+                try:
+                    match(pattern, term)
+                except UnificationError:
+                    pass
+    return time.time() - start
+
+def main(rounds=20):
+    env = environment.make_default()
+    terms = [env.axioms[name] for name in sorted(env.axioms)]
+    count = rounds * len(pattern_strings) * len(terms)
+    print '%d patterns against %d axioms, %d rounds' \
+        % (len(pattern_strings), len(terms), rounds)
+
+    elapsed = time_matches(lambda string, term: match_term(env.parse(string),
+                                                           term),
+                           pattern_strings, terms, rounds)
+    print 'interpreted  %.3fs (%.1fus per match)' \
+        % (elapsed, 1e6 * elapsed / count)
+
+    compiled = [CompiledPattern(env.parse(string))
+                for string in pattern_strings]
+    elapsed = time_matches(lambda pattern, term: pattern.match(term),
+                           compiled, terms, rounds)
+    print 'compiled     %.3fs (%.1fus per match)' \
+        % (elapsed, 1e6 * elapsed / count)
+
+    goals = [Sequent([], [term]) for term in terms] \
+        + [Sequent([term], []) for term in terms]
+    time_applicable(env, goals, rounds, 'cold', True)
+    time_applicable(env, goals, rounds, 'memoised', False)
+    for i in range(1, 301):
+        env.add_primitive(synthetic_rule(i))
+    start = time.time()
+    env.make_rule_index()
+    print 'index %d rules: %.1fms' % (len(env.rules),
+                                      1000 * (time.time() - start))
+    time_applicable(env, goals, rounds, '%d rules' % len(env.rules), True)
+
+def synthetic_rule(number):
+    '''Return a rule whose principal formula nests negations and
+    disjunctions following the binary digits of number.'''
+    name = 'synthetic_%d' % number
+    pattern = 'a'
+    while number:
+        if number % 2:
+            pattern = 'not (%s)' % pattern
+        else:
+            pattern = '(%s) or b' % pattern
+        number //= 2
+    def rule(goal):
+        return [goal]
+    rule.func_name = name
+    rule.principal = ('left', 0, pattern)
+    return rule
+
+def time_applicable(env, goals, rounds, name, clear):
+    start = time.time()
+    for i in range(rounds):
+        for goal in goals:
+            if clear:
+                env.applicable_cache.clear()
+            env.applicable_rules(goal)
+    elapsed = time.time() - start
+    print 'applicable_rules, %-9s %.3fs (%.3fms per goal)' \
+        % (name, elapsed, 1000 * elapsed / (rounds * len(goals)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+'''Time expanding the iff, implies and and definitions in a large formula.
+
+The formula is a conjunction of biconditionals between neighbouring
+atoms. It is expanded the way left_expand does it, one definition
+after another. Separately, every definition is unfolded first without
+contracting anything, and the resulting term, full of nested redexes,
+is normalised in one go.
+
+Run with ``python -m cheqed.core.benchmarks.normalization``.
+'''
+
+import time
+
+from cheqed.core import environment, term_builder
+from cheqed.core.normalize import normalize
+from cheqed.core.substitution import Substitution
+
+def chain(env, length):
+    atoms = ['p' + chr(ord('a') + i % 26) * (1 + i // 26)
+             for i in range(length + 1)]
+    return env.parse(' and '.join(['((%s:bool) iff (%s:bool))' % pair
+                                   for pair in zip(atoms, atoms[1:])]))
+
+def unfold(env, term, names):
+    '''Replace the constants in names by their definitions until none
+    is left, without contracting the redexes this creates.'''
+    mapping = {}
+    for name in names:
+        definition = env.definitions[name]
+        mapping[definition.operator.operand] = definition.operand
+    substitution = Substitution(mapping, term_builder.kernel)
+    while [atom for atom in term.atoms() if atom in mapping]:
+        term = substitution.apply_to_term(term, mapping)
+    return term
+
+def main(length=30, rounds=5):
+    env = environment.load_modules('logic')
+    names = ['iff', 'implies', 'and']
+
+    start = time.time()
+    for i in range(rounds):
+        term = chain(env, length)
+        for name in names:
+            term = environment.expand_definition(term,
+                                                 env.definitions[name])
+    elapsed = time.time() - start
+    print 'expand %s in a chain of %d: %.3fs (%.1fms each)' \
+        % (', '.join(names), length, elapsed, 1000 * elapsed / rounds)
+
+    unfolded = unfold(env, chain(env, length), names)
+    start = time.time()
+    normal = normalize(unfolded)
+    elapsed = time.time() - start
+    print 'normalize the unfolded chain (size %d): %.1fms' \
+        % (unfolded.size, 1000 * elapsed)
+    assert normal is term
+
+    start = time.time()
+    normalize(unfolded)
+    print 'normalize it again: %.3fms' % (1000 * (time.time() - start))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+'''Time parsing the axioms and definitions of the set theory.
+
+Each string is parsed both with the term builder that infers types
+node by node and with the one that infers them once for the whole
+term, which is what Environment uses.
+
+Then the ply parser and the Pratt parser are compared, both on
+constructing a parser and on parsing the theory strings together with
+the inputs of the parser tests and the patterns the rules match.
+
+Last, the patterns are parsed repeatedly through Environment.parse,
+which answers from its cache after the first round.
+
+Run with ``python -m cheqed.core.benchmarks.parsing``.
+'''
+
+import os.path
+import time
+
+from cheqed.core import environment, parser, pratt, syntax, term_builder
+from cheqed.core.cache import LRUCache
+
+# the inputs of tests/test_parser.py
+test_strings = [
+    '(=)', '(exists)', 'a:obj = b:obj', 'f:obj->obj(g:obj->obj(x))',
+    'f:obj->obj(x)', 'for_all x phi', 'h:obj->obj->obj(x, y)', 'not a',
+    'not not a', 'var', 'var:bool', 'var:bool->obj',
+    r'(exists) = (\x.(not (for_all y . (not x(y)))))',
+    r'\x f:bool->bool(x)', r'\x:bool \y:bool x', r'\x:bool x',
+    ]
+
+# patterns matched by the rules in core/rules
+pattern_strings = [
+    'a = b', 'a in powerset(b)', 'a or b', 'a subset b', 'exists x . phi',
+    'for_all x . phi', 'not a', 'schema phi . psi',
+    'x in separation(X, phi)',
+    ]
+
+def set_theory_strings():
+    '''Load the set theory, returning the strings of its axioms and
+    definitions along with the environment.'''
+    env = environment.load_modules('logic')
+    strings = []
+    add_axiom = env.helpers['axiom']
+    add_definition = env.helpers['definition']
+
+    def axiom(name, string):
+        strings.append(string)
+        add_axiom(name, string)
+
+    def definition(string):
+        strings.append(string)
+        add_definition(string)
+
+    env.helpers['axiom'] = axiom
+    env.helpers['definition'] = definition
+    env.load_extension(open(os.path.join(environment.theory_root, 'set.py')))
+    return env, strings
+
+def time_parser(parser_, strings, rounds):
+    start = time.time()
+    for i in range(rounds):
+        for string in strings:
+            parser_.parse(string)
+    return time.time() - start
+
+def time_construction(parser_class, extensions, rounds):
+    start = time.time()
+    for i in range(rounds):
+        parser_class(syntax.Syntax(extensions), term_builder.deferred)
+    return time.time() - start
+
+def main(rounds=20):
+    env, strings = set_theory_strings()
+    extensions = env.types + env.operators + env.binders
+    parsers = [('incremental', parser.Parser(syntax.Syntax(extensions),
+                                             term_builder)),
+               ('whole-term', parser.Parser(syntax.Syntax(extensions),
+                                            term_builder.deferred))]
+
+    print '%d set theory axioms and definitions, %d rounds' \
+        % (len(strings), rounds)
+    for name, parser_ in parsers:
+        elapsed = time_parser(parser_, strings, rounds)
+        print '%-12s %.3fs (%.2fms per string)' \
+            % (name, elapsed, 1000 * elapsed / (rounds * len(strings)))
+
+    strings = strings + test_strings + pattern_strings
+    print
+    print '%d strings, %d rounds' % (len(strings), rounds)
+    for name, parser_class in [('ply', parser.Parser),
+                               ('pratt', pratt.PrattParser)]:
+        elapsed = time_construction(parser_class, extensions, rounds)
+        parser_ = parser_class(syntax.Syntax(extensions),
+                               term_builder.deferred)
+        parsing = time_parser(parser_, strings, rounds)
+        print '%-12s construct %.2fms, parse %.3fs (%.3fms per string)' \
+            % (name, 1000 * elapsed / rounds, parsing,
+               1000 * parsing / (rounds * len(strings)))
+
+    print
+    env.parse_cache = LRUCache(env.parse_cache_size)
+    elapsed = time_parser(env, pattern_strings, rounds)
+    print 'Environment.parse of %d patterns, %d rounds: %.3fs' \
+        ' (%.3fms per string)' \
+        % (len(pattern_strings), rounds, elapsed,
+           1000 * elapsed / (rounds * len(pattern_strings)))
+    print 'parse cache: %(hits)d hits, %(misses)d misses' % env.parse_cache.stats()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+'''Time printing large formulas.
+
+The formulas are the chain of biconditionals from the normalization
+benchmark, with iff, implies and and expanded. Each is printed with a
+fresh printer, and then again with the same one, which finds it in its
+memo. Last, the formulas of a proof are imitated by printing every
+subformula of the expanded chain, as the proof page prints the goals
+of successive steps, and by printing them all together with their
+shared subterms abbreviated.
+
+Run with ``python -m cheqed.core.benchmarks.printing``.
+'''
+
+import time
+
+from cheqed.core import environment, printer, qterm, syntax
+from cheqed.core.benchmarks.normalization import chain
+
+def subterms(term):
+    result = [term]
+    if qterm.is_combination(term):
+        result.extend(subterms(term.operator))
+        result.extend(subterms(term.operand))
+    elif qterm.is_abstraction(term):
+        result.extend(subterms(term.body))
+    return result
+
+def main(length=30, rounds=20):
+    env = environment.load_modules('logic')
+    extensions = env.types + env.operators + env.binders
+    term = chain(env, length)
+    for name in ['iff', 'implies', 'and']:
+        term = environment.expand_definition(term, env.definitions[name])
+    print 'a formula of size %d, printed as %d characters' \
+        % (term.size, len(env.printer.print_term(term)))
+
+    start = time.time()
+    for i in range(rounds):
+        printer.Printer(syntax.Syntax(extensions)).print_term(term)
+    elapsed = time.time() - start
+    print 'fresh printer  %.2fms' % (1000 * elapsed / rounds)
+
+    printer_ = printer.Printer(syntax.Syntax(extensions))
+    printer_.print_term(term)
+    start = time.time()
+    for i in range(rounds):
+        printer_.print_term(term)
+    elapsed = time.time() - start
+    print 'memoised       %.4fms' % (1000 * elapsed / rounds)
+
+    parts = subterms(term)
+    start = time.time()
+    printer_ = printer.Printer(syntax.Syntax(extensions))
+    for part in parts:
+        printer_.print_term(part)
+    elapsed = time.time() - start
+    print 'all %d subformulas: %.1fms, %d characters' \
+        % (len(parts), 1000 * elapsed,
+           sum(len(printer_.print_term(part)) for part in parts))
+
+    start = time.time()
+    printer_ = printer.Printer(syntax.Syntax(extensions))
+    texts, abbreviations = printer_.print_shared(parts)
+    elapsed = time.time() - start
+    print 'shared:           %.1fms, %d characters, %d abbreviations' \
+        % (1000 * elapsed,
+           sum(len(text) for text in texts)
+           + sum(len(name) + len(text) for name, text in abbreviations),
+           len(abbreviations))
+
+if __name__ == '__main__':
+    main()
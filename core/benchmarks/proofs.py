@@ -0,0 +1,87 @@
+'''Time replaying long proofs.
+
+The first proof applies left_contraction and left_weakening in turn,
+hundreds of thousands of times, to a goal p |- p, and closes it with
+axiom. It is evaluated as one flat sequence of steps and as the chain
+of nested branches that pair() builds, which used to recurse once for
+each step.
+
+The second proof does the same with a compound, unwind(n), whose
+expansion is a contraction, a weakening and unwind(n - 1), so that the
+expansions nest thousands deep.
+
+Last, a finished proof of (a and b) iff (b and a), made of compounds,
+is read back from its text and evaluated over and over, as the proof
+pages do on each view, with and without a cache of expansions.
+
+Run with ``python -m cheqed.core.benchmarks.proofs``.
+'''
+
+import time
+
+from cheqed.core import environment, trace
+from cheqed.core.sequent import Sequent
+
+unwind = '''
+@compound
+@arg_types('int')
+@applicable(lambda goal: False)
+def unwind(goal, depth):
+    if depth == 0:
+        return axiom()
+    return sequence(left_contraction(), left_weakening(), unwind(depth - 1))
+'''
+
+half = 'branch(left_conjunction(), branch(right_conjunction(), qed(), qed()))'
+plan = 'branch(right_bidirectional(), %s, %s)' % (half, half)
+
+def nested(steps):
+    proof = steps[-1]
+    for step in reversed(steps[:-1]):
+        proof = trace.pair(step, proof)
+    return proof
+
+def time_proof(proof, goal):
+    start = time.time()
+    unmet = proof.evaluate(goal)
+    assert unmet == []
+    return time.time() - start
+
+def time_views(env, goal, rounds, expansions):
+    start = time.time()
+    for i in range(rounds):
+        unmet = env.evaluate(plan).evaluate(goal, expansions=expansions)
+        assert unmet == []
+    return time.time() - start
+
+def report(name, steps, elapsed):
+    print '%-24s %7d steps %8.3fs %6.1fus/step' % (name, steps, elapsed,
+                                                   1e6 * elapsed / steps)
+
+def main(length=100000, depth=20000, views=200):
+    env = environment.make_default()
+    rules = env.rules
+
+    p = env.parse('p:bool')
+    goal = Sequent([p], [p])
+    steps = [rules['left_contraction'](), rules['left_weakening']()] * length
+    steps.append(rules['axiom']())
+    report('flat sequence', len(steps),
+           time_proof(trace.Sequence(*steps), goal))
+    report('nested branches', len(steps), time_proof(nested(steps), goal))
+
+    env.load_extension(unwind)
+    report('nested compounds', 3 * depth + 1,
+           time_proof(rules['unwind'](depth), goal))
+
+    goal = Sequent([], [env.parse('(a and b) iff (b and a)')])
+    print
+    print 'viewing a proof %d times' % views
+    for name, expansions in [('without a cache', None),
+                             ('with a cache', env.expansion_cache)]:
+        elapsed = time_views(env, goal, views, expansions)
+        print '%-24s %8.3fms/view' % (name, 1000 * elapsed / views)
+    print 'hit rate %.2f' % env.expansion_cache.hit_rate()
+
+if __name__ == '__main__':
+    main()
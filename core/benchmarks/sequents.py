@@ -0,0 +1,63 @@
+'''Time the structural rules on a large goal.
+
+The goal has every axiom of the set theory and a chain of
+biconditionals on its left, and one formula on its right. The weakening, contraction and permutation rules are
+applied to it over and over, as a user does when moving the formula
+they want to work on to the front, and then a rule which brings in a
+new formula, right_negation, is applied to goals made by adding a
+negation to the right.
+
+Last, qed looks for a formula shared by both sides of a goal with the
+implications matching those biconditionals on its right, and the last
+biconditional after them. Each round makes the goal afresh, so the
+time includes indexing its sides.
+
+Run with ``python -m cheqed.core.benchmarks.sequents``.
+'''
+
+import time
+
+from cheqed.core import environment
+from cheqed.core.sequent import Sequent
+
+def time_rule(env, name, goal, rounds, *args):
+    rule = env.rules[name](*args)
+    start = time.time()
+    for i in range(rounds):
+        rule.evaluate(goal)
+    return time.time() - start
+
+def time_qed(env, left, right, rounds):
+    rule = env.rules['qed']()
+    start = time.time()
+    for i in range(rounds):
+        rule.evaluate(Sequent(list(left), list(right)))
+    return time.time() - start
+
+def main(length=60, rounds=1000):
+    env = environment.make_default()
+    left = [env.axioms[name] for name in sorted(env.axioms)]
+    atoms = ['p' + chr(ord('a') + i % 26) * (1 + i // 26)
+             for i in range(length + 1)]
+    left.extend(env.parse('(%s:bool) iff (%s:bool)' % pair)
+                for pair in zip(atoms, atoms[1:]))
+    goal = Sequent(left, [env.parse('not (a in b)')])
+    print 'a goal of %d formulas, %d rounds' % (len(left) + 1, rounds)
+
+    for name, args in [('left_weakening', ()),
+                       ('left_contraction', ()),
+                       ('left_permutation', (1,)),
+                       ('left_permutation', (len(left) - 1,)),
+                       ('right_negation', ())]:
+        elapsed = time_rule(env, name, goal, rounds, *args)
+        print '%-20s %-4s %.3fms' % (name, ''.join(map(str, args)),
+                                     1000 * elapsed / rounds)
+
+    right = [env.parse('(%s:bool) implies (%s:bool)' % pair)
+             for pair in zip(atoms, atoms[1:])]
+    right.append(left[-1])
+    elapsed = time_qed(env, left, right, rounds)
+    print '%-25s %.3fms' % ('qed', 1000 * elapsed / rounds)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+'''Time parsing a corpus of formulas from a file.
+
+The corpus repeats the axioms and definitions of the set theory, one
+formula per line. It is parsed with one Parser.parse call per line,
+then with Parser.parse_stream, and then with parse_stream inferring
+types in a pool with a worker process per CPU. The pool only pays for
+its pickling with several CPUs.
+
+Run with ``python -m cheqed.core.benchmarks.streaming``.
+'''
+
+import multiprocessing
+import time
+
+from cheqed.core.benchmarks.parsing import set_theory_strings
+
+def main(copies=100, processes=None):
+    env, strings = set_theory_strings()
+    env.make_parser()
+    lines = ['%s\n' % string for string in strings] * copies
+    print '%d formulas' % len(lines)
+
+    start = time.time()
+    for line in lines:
+        env.parser.parse(line)
+    print 'parse each line        %.3fs' % (time.time() - start)
+
+    start = time.time()
+    for term in env.parser.parse_stream(lines):
+        pass
+    print 'parse_stream           %.3fs' % (time.time() - start)
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes)
+    start = time.time()
+    for term in env.parser.parse_stream(lines, pool):
+        pass
+    print 'parse_stream, %d workers %.3fs' % (processes, time.time() - start)
+    pool.close()
+    pool.join()
+
+if __name__ == '__main__':
+    main()
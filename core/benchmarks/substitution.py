@@ -0,0 +1,66 @@
+'''Time instantiating the set.separation axiom.
+
+The substitutions are timed both through substitute, which takes the
+kernel path for these well typed terms, and through Substitution,
+which always infers types, and then all at once with substitute_many.
+
+Run with ``python -m cheqed.core.benchmarks.substitution``.
+'''
+
+import time
+
+from cheqed.core import environment, qterm
+from cheqed.core.substitution import Substitution, substitute, \
+    substitute_many
+
+def instantiate_separation(env, phi, big_x, y):
+    '''Return the substitution steps left_schema and left_universal
+    perform when right_separation cuts in set.separation.'''
+    axiom = env.axioms['set.separation']
+    match = env.match(axiom, 'schema phi . psi')
+    steps = [(phi, match['phi'], match['psi'])]
+    term = substitute(*steps[-1])
+    match = env.match(term, 'for_all X . psi')
+    steps.append((big_x, match['X'], match['psi']))
+    term = substitute(*steps[-1])
+    match = env.match(term, 'for_all y . psi')
+    steps.append((y, match['y'], match['psi']))
+    return steps
+
+def strip_binders(term):
+    '''Return the body under the binders at the front of term.'''
+    while qterm.is_combination(term) and qterm.is_abstraction(term.operand):
+        term = term.operand.body
+    return term
+
+def main(rounds=200):
+    env = environment.make_default()
+    phi = env.parse(r'\z . (z in a) and (for_all w . (w in z) implies (w in b))')
+    big_x = env.parse('powerset(union(a, b))')
+    y = env.parse('c:obj')
+    steps = instantiate_separation(env, phi, big_x, y)
+
+    def inferring(value, pattern, term):
+        return Substitution({pattern: value}).apply(term)
+
+    def report(name, elapsed):
+        print '%s: %d instantiations of set.separation: %.3fs (%.2fms each)' \
+            % (name, rounds, elapsed, 1000 * elapsed / rounds)
+
+    for name, function in [('substitute', substitute),
+                           ('inferring', inferring)]:
+        start = time.time()
+        for i in range(rounds):
+            for value, pattern, term in steps:
+                function(value, pattern, term)
+        report(name, time.time() - start)
+
+    mapping = dict((pattern, value) for value, pattern, term in steps)
+    body = strip_binders(env.axioms['set.separation'])
+    start = time.time()
+    for i in range(rounds):
+        substitute_many(mapping, body)
+    report('substitute_many', time.time() - start)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+'''Measure subterm sharing in expanded set-theory goals.
+
+Run with ``python -m cheqed.core.benchmarks.term_sharing``.
+'''
+
+import time
+
+from cheqed.core import environment, qterm
+
+def children(term):
+    if qterm.is_combination(term):
+        return [term.operator, term.operand]
+    elif qterm.is_abstraction(term):
+        return [term.bound, term.body]
+    return []
+
+def tree_size(term):
+    '''Count nodes as if no subterm were shared.'''
+    size = 0
+    stack = [term]
+    while stack:
+        node = stack.pop()
+        size += 1
+        stack.extend(children(node))
+    return size
+
+def distinct_size(terms):
+    '''Count the distinct objects reachable from terms.'''
+    seen = set()
+    stack = list(terms)
+    while stack:
+        node = stack.pop()
+        if id(node) not in seen:
+            seen.add(id(node))
+            stack.extend(children(node))
+    return len(seen)
+
+def expanded_axioms(env):
+    terms = []
+    for term in env.axioms.values():
+        for name in ['iff', 'implies', 'and', 'exists', 'subset']:
+            term = environment.expand_definition(term, env.definitions[name])
+        terms.append(term)
+    return terms
+
+def main():
+    env = environment.make_default()
+
+    start = time.time()
+    terms = expanded_axioms(env)
+    elapsed = time.time() - start
+
+    total = sum(tree_size(term) for term in terms)
+    distinct = distinct_size(terms)
+    print 'expanded %d axioms in %.3fs' % (len(terms), elapsed)
+    print 'tree nodes:     %8d' % total
+    print 'distinct nodes: %8d (%.1f%%)' % (distinct,
+                                          100.0 * distinct / total)
+    print 'interned terms: %8d' % qterm.interned_count()
+
+    again = expanded_axioms(env)
+    start = time.time()
+    for i in range(1000):
+        for a, b in zip(terms, again):
+            assert a == b
+    print '1000 rounds of equality checks: %.3fs' % (time.time() - start)
+
+if __name__ == '__main__':
+    main()
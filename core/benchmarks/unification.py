@@ -0,0 +1,42 @@
+'''Time unifying long chains of type variables.
+
+Run with ``python -m cheqed.core.benchmarks.unification``.
+'''
+
+import time
+
+from cheqed.core import qtype
+from cheqed.core.qtype_unifier import TypeUnifier
+
+def unify_chain(length):
+    '''Unify v0 with v1, v1 with v2 and so on, then the last with obj.'''
+    variables = [qtype.qvar() for i in range(length)]
+    unifier = TypeUnifier()
+    for a, b in zip(variables, variables[1:]):
+        unifier.unify(a, b)
+    unifier.unify(variables[-1], qtype.qobj())
+    return unifier, variables
+
+def unify_function_chain(length):
+    '''Unify v(i) with v(i+1)->obj, then the last with obj.'''
+    variables = [qtype.qvar() for i in range(length)]
+    unifier = TypeUnifier()
+    for a, b in zip(variables, variables[1:]):
+        unifier.unify(a, qtype.qfun(b, qtype.qobj()))
+    unifier.unify(variables[-1], qtype.qobj())
+    return unifier, variables
+
+def main():
+    for chain in [unify_chain, unify_function_chain]:
+        for length in [500, 1000, 2000, 4000]:
+            start = time.time()
+            unifier, variables = chain(length)
+            unified = time.time() - start
+            # the resolved type of variables[i] nests length - i deep
+            unifier.apply(variables[-200])
+            print '%-20s %5d variables: unify %.3fs, apply %.3fs' \
+                % (chain.__name__, length, unified,
+                   time.time() - start - unified)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+'''A bounded cache which evicts the least recently used entry.'''
+
+import collections
+import threading
+
+class LRUCache:
+    '''Map keys to values, keeping at most size entries.
+
+    The cache counts its hits and misses, so that callers can tell
+    whether it is worth having. It may be shared between threads.
+    '''
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        '''Return the value for key, or default if it is not cached.'''
+        with self.lock:
+            try:
+                value = self.entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self.entries[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = value
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        '''Drop every entry; the counters are kept.'''
+        with self.lock:
+            self.entries.clear()
+
+    def hit_rate(self):
+        '''Return the fraction of lookups which found their key.'''
+        lookups = self.hits + self.misses
+        if not lookups:
+            return 0.0
+        return float(self.hits) / lookups
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.entries),
+                'max_size': self.size}
@@ -0,0 +1,74 @@
+'''A discrimination tree, indexing values by the shape of a pattern.
+
+Each pattern is read in preorder as a string of symbols: a constant by
+its name, a combination or an abstraction by a marker followed by its
+parts, and a variable by a wildcard which stands for a whole subterm.
+The patterns share a trie of these strings, so that retrieving the
+values whose patterns may match a term walks the term once for all of
+them, however many there are.
+
+Types, and variables which occur more than once, are not indexed: a
+retrieved pattern still has to be matched, but a pattern which is not
+retrieved cannot match.
+'''
+
+from cheqed.core.qterm import is_constant, is_variable, is_combination
+
+_wildcard = '*'
+
+def _symbol(term):
+    '''Return the symbol for term and the subterms that follow it.'''
+    if is_constant(term):
+        return term.name, ()
+    elif is_variable(term):
+        return None, ()
+    elif is_combination(term):
+        return '(', (term.operator, term.operand)
+    else:
+        # the bound variable of a pattern is always a variable
+        return '\\', (term.body,)
+
+class Node:
+    def __init__(self):
+        self.children = {}
+        self.values = []
+
+class DiscriminationTree:
+    def __init__(self):
+        self.root = Node()
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, pattern, value):
+        node = self.root
+        stack = [pattern]
+        while stack:
+            term = stack.pop()
+            if is_variable(term):
+                symbol = _wildcard
+            else:
+                symbol, parts = _symbol(term)
+                stack.extend(reversed(parts))
+            node = node.children.setdefault(symbol, Node())
+        node.values.append(value)
+        self.size += 1
+
+    def retrieve(self, term):
+        '''Return the values of the patterns which may match term.'''
+        values = []
+        pending = [(self.root, (term,))]
+        while pending:
+            node, stack = pending.pop()
+            if not stack:
+                values.extend(node.values)
+                continue
+            term, rest = stack[-1], stack[:-1]
+            if _wildcard in node.children:
+                pending.append((node.children[_wildcard], rest))
+            symbol, parts = _symbol(term)
+            if symbol in node.children:
+                pending.append((node.children[symbol],
+                                rest + tuple(reversed(parts))))
+        return values
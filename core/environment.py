@@ -2,10 +2,13 @@ import os.path
 
 from cheqed.core import parser, printer, qterm, qtype, syntax, sequent, unification
 from cheqed.core import trace
-from cheqed.core.match import match_term
-from cheqed.core.qterm import is_term
+from cheqed.core.cache import LRUCache
+from cheqed.core.discrimination import DiscriminationTree
+from cheqed.core.match import CompiledPattern
+from cheqed.core.qterm import is_term, rename_type_variables
 from cheqed.core.term_type_unifier import unify_types
-from cheqed.core import substitution
+from cheqed.core import substitution, nameless
+from cheqed.core.normalize import normalize
 import term_builder
 
 def arg_types(*args):
@@ -28,6 +31,14 @@ def applicable(predicate):
         return rule
     return assign_predicate
 
+def principal(side, pattern, index=0):
+    '''Declare that the rule applies only when the formula at index on
+    side ('left' or 'right') of the goal matches pattern.'''
+    def assign_principal(rule):
+        rule.principal = (side, index, pattern)
+        return rule
+    return assign_principal
+
 class RuleBuilder:
     def __init__(self, environment, rule, factory):
         self.environment = environment
@@ -47,7 +58,21 @@ class RuleBuilder:
         except AttributeError:
             return []
 
+    def principal(self):
+        try:
+            return self.rule.principal
+        except AttributeError:
+            return None
+
     def is_applicable(self, goal):
+        principal = self.principal()
+        if principal is not None:
+            side, index, pattern = principal
+            try:
+                self.environment.match(getattr(goal, side)[index], pattern)
+            except:
+                return False
+
         try:
             return self.rule.is_applicable(goal)
         except AttributeError:
@@ -63,23 +88,41 @@ class RuleBuilder:
             return False
 
 class Environment:
+    parse_cache_size = 1024
+    pattern_cache_size = 256
+    applicable_cache_size = 256
+    proved_cache_size = 1024
+    expansion_cache_size = 512
+
     def __init__(self):
         self.constants = {}
         self.definitions = {}
         self.axioms = {}
+        self.axiom_names = {}
         self.operators = []
         self.binders = []
         self.types = []
         self.parser = None
+        self.parser_class = parser.Parser
         self.printer = None
+        self.syntax_version = 0
+        self.parse_cache = LRUCache(self.parse_cache_size)
+        self.pattern_cache = LRUCache(self.pattern_cache_size)
+        self.rule_index = None
+        self.applicable_cache = LRUCache(self.applicable_cache_size)
+        self.proved_cache = LRUCache(self.proved_cache_size)
+        self.expansion_cache = trace.ExpansionCache(self.expansion_cache_size)
 
         self.rules = {}
         self.helpers = {
             'applicable': applicable,
             'arg_types': arg_types,
+            'principal': principal,
             'match': self.match,
 
             'substitute': substitution.substitute,
+            'substitute_many': substitution.substitute_many,
+            'alpha_equivalent': nameless.alpha_equivalent,
 
             'sequent': sequent.Sequent,
 
@@ -105,9 +148,23 @@ class Environment:
         self.add_primitive(self.theorem)
         self.add_compound(self.theorem_cut)        
 
+    def syntax_changed(self):
+        '''Forget the parser, and every term parsed with it.'''
+        self.parser = None
+        self.syntax_version += 1
+        self.rules_changed()
+
+    def rules_changed(self):
+        '''Forget which rules apply to which goals, which goals they
+        proved, and what compounds expanded to.'''
+        self.rule_index = None
+        self.applicable_cache.clear()
+        self.proved_cache.clear()
+        self.expansion_cache.clear()
+
     def add_type(self, type_):
         self.types.append(type_)
-        self.parser = None
+        self.syntax_changed()
 
     def add_constant(self, constant):
         atom = self.parse(constant)
@@ -118,11 +175,11 @@ class Environment:
     def add_operator(self, name, arity, associativity, precedence):
         self.operators.append(
             syntax.Operator(self.constants[name], arity, associativity, precedence))
-        self.parser = None
+        self.syntax_changed()
 
     def add_binder(self, name):
         self.binders.append(syntax.Binder(self.constants[name]))
-        self.parser = None
+        self.syntax_changed()
 
     def add_definition(self, string):
         term = self.parse(string)
@@ -133,9 +190,14 @@ class Environment:
             or qterm.is_constant(term.operator.operand)
         name = term.operator.operand.name
         self.definitions[name] = term
+        self.rules_changed()
 
     def add_axiom(self, name, string):
         self.axioms[name] = self.parse(string)
+        self.axiom_names = dict((nameless.nameless(axiom), axiom_name)
+                                for axiom_name, axiom
+                                in self.axioms.iteritems())
+        self.rules_changed()
 
     def parse_arg(self, arg_type, arg):
         if arg_type == 'int':
@@ -182,17 +244,22 @@ class Environment:
             rule = self.print_proof(proof.rule)
             branches = [self.print_proof(branch) for branch in proof.branches]
             return 'branch(%s)' % (', '.join([rule] + branches))
+        elif isinstance(proof, trace.Sequence):
+            steps = [self.print_proof(step) for step in proof.steps]
+            return 'sequence(%s)' % ', '.join(steps)
         else:
             raise Exception('unrecognized proof type %r' % proof)
 
     def add_primitive(self, rule):
         builder = RuleBuilder(self, rule, trace.Primitive)
         self.rules[builder.rule_name()] = builder
+        self.rules_changed()
         return builder
 
     def add_compound(self, rule):
         builder = RuleBuilder(self, rule, trace.Compound)
         self.rules[builder.rule_name()] = builder
+        self.rules_changed()
         return builder
 
     def _make_scope(self):
@@ -209,24 +276,103 @@ class Environment:
         
     def make_parser(self):
         extensions = self.types + self.operators + self.binders
-        self.parser = parser.Parser(syntax.Syntax(extensions), term_builder)
+        self.parser = self.parser_class(syntax.Syntax(extensions),
+                                        term_builder.deferred)
 
     def make_printer(self):
         extensions = self.types + self.operators + self.binders
         self.printer = printer.Printer(syntax.Syntax(extensions))
 
     def parse(self, string):
+        '''Parse string, reusing the term from an earlier parse of the
+        same string with the same syntax if there is one.
+
+        Every parse gives fresh type variables, so the type variables
+        of a cached term are renamed apart before it is returned.
+        '''
+        key = (string, self.syntax_version)
+        term = self.parse_cache.get(key)
+        if term is not None:
+            return rename_type_variables(term)
         if self.parser is None:
             self.make_parser()
-        return self.parser.parse(string)
+        term = self.parser.parse(string)
+        self.parse_cache.put(key, term)
+        return term
+
+    def parse_file(self, path, pool=None):
+        '''Parse the formulas in the file at path, one per line, yielding
+        their terms; see Parser.parse_stream.'''
+        if self.parser is None:
+            self.make_parser()
+        lines = open(path)
+        try:
+            for term in self.parser.parse_stream(lines, pool):
+                yield term
+        finally:
+            lines.close()
+
+    def make_rule_index(self):
+        '''Index the rules by their principal formulas, keeping the
+        rules without one aside to be tried on every goal.
+
+        The index is a pair of those rules and a dictionary of
+        discrimination trees keyed on (side, index). It is built aside
+        and then stored, so that other threads never see part of it.
+        '''
+        unindexed = []
+        trees = {}
+        for builder in self.rules.values():
+            principal = builder.principal()
+            if principal is None:
+                unindexed.append(builder)
+            else:
+                side, index, pattern = principal
+                tree = trees.setdefault((side, index), DiscriminationTree())
+                tree.insert(self.parse(pattern), builder)
+        self.rule_index = (unindexed, trees)
+        return self.rule_index
+
+    def candidate_rules(self, goal):
+        '''Return the rules which may apply to goal: those without a
+        principal formula, and those whose principal formula has the
+        shape of the goal's.'''
+        rule_index = self.rule_index
+        if rule_index is None:
+            rule_index = self.make_rule_index()
+        unindexed, trees = rule_index
+        candidates = list(unindexed)
+        for (side, index), tree in trees.iteritems():
+            formulas = getattr(goal, side)
+            if index < len(formulas):
+                candidates.extend(tree.retrieve(formulas[index]))
+        return candidates
 
     def applicable_rules(self, goal):
-        return [builder for builder in self.rules.values()
-                if builder.is_applicable(goal)]
+        rules = self.applicable_cache.get(goal)
+        if rules is None:
+            rules = [builder for builder in self.candidate_rules(goal)
+                     if builder.is_applicable(goal)]
+            self.applicable_cache.put(goal, rules)
+        return list(rules)
+
+    def prove(self, proof, goal):
+        '''Return the goals proof leaves unmet, skipping the goals this
+        environment has seen proved before.'''
+        return proof.evaluate(goal, proved=self.proved_cache)
+
+    def compile_pattern(self, string):
+        '''Return the compiled pattern for string, compiling it the first
+        time it is used with the current syntax.'''
+        key = (string, self.syntax_version)
+        pattern = self.pattern_cache.get(key)
+        if pattern is None:
+            pattern = CompiledPattern(self.parse(string))
+            self.pattern_cache.put(key, pattern)
+        return pattern
 
     def match(self, term, string):
-        pattern = self.parse(string)
-        return match_term(pattern, term)
+        return self.compile_pattern(string).match(term)
 
     @arg_types('str')
     def left_expand(self, goal, name):
@@ -245,10 +391,8 @@ class Environment:
                                  + goal.right[1:]))]
 
     def theorem(self, goal):
-        term = goal.right[0]
-        for thm in self.axioms.itervalues():
-            if thm == term:
-                return []
+        if nameless.nameless(goal.right[0]) in self.axiom_names:
+            return []
         raise Exception('theorem does not apply')
 
     @arg_types('str')
@@ -264,7 +408,7 @@ class Environment:
 def expand_definition(term, definition):
     atom, value = definition.operator.operand, definition.operand
     atom, term = unify_types([atom, term])
-    return substitution.substitute(value, atom, term)
+    return normalize(substitution.substitute(value, atom, term))
 
 theory_root = '/home/cap/thesis/cheqed/core/theory'
 def load_modules(*modules):
@@ -1,48 +1,149 @@
 from qterm import is_variable, is_constant, is_combination, is_abstraction
-from qtype_unifier import can_unify 
+from qtype_unifier import TypeUnifier
+from unification import UnificationError
 
 class TermMatcher:
+    '''Match a pattern against a term, binding pattern variables by name.
+
+    The types of matched atoms are unified as the match proceeds, in a
+    single unifier that undoes any partial unification that fails.
+    '''
+
     def __init__(self):
         self.assignments = {}
+        self.unifier = TypeUnifier()
+
+    def fail(self, pattern, term):
+        raise UnificationError('Cannot match %s with %s.' % (pattern, term))
 
     def match_term(self, pattern, term):
-        if is_variable(pattern):
-            self.match_variable(pattern, term)
-        elif is_constant(pattern) and is_constant(term):
-            self.match_constant(pattern, term)
-        elif is_combination(pattern) and is_combination(term):
-            self.match_combination(pattern, term)
-        elif is_abstraction(pattern) and is_abstraction(term):
-            self.match_abstraction(pattern, term)
-        else:
-            self.fail(pattern, term)
+        pairs = [(pattern, term)]
+        while pairs:
+            pattern, term = pairs.pop()
+            if is_variable(pattern):
+                self.match_variable(pattern, term)
+            elif is_constant(pattern) and is_constant(term):
+                self.match_constant(pattern, term)
+            elif is_combination(pattern) and is_combination(term):
+                pairs.extend(reversed(self.match_combination(pattern, term)))
+            elif is_abstraction(pattern) and is_abstraction(term):
+                pairs.extend(reversed(self.match_abstraction(pattern, term)))
+            else:
+                self.fail(pattern, term)
 
     def match_variable(self, pattern, term):
-        if can_unify([pattern.qtype, term.qtype]):
+        if self.unifier.try_unify(pattern.qtype, term.qtype):
             if pattern.name in self.assignments:
                 if self.assignments[pattern.name] == term:
                     return
                 raise UnificationError('Cannot match %s with both %s and %s.'
                                        % (pattern, term,
-                                          assignments[pattern.name]))
+                                          self.assignments[pattern.name]))
             self.assignments[pattern.name] = term
         else:
             self.fail(pattern, term)
 
     def match_constant(self, pattern, term):
         if pattern.name != term.name \
-                or not can_unify([pattern.qtype, term.qtype]):
+                or not self.unifier.try_unify(pattern.qtype, term.qtype):
             self.fail(pattern, term)
 
     def match_combination(self, pattern, term):
-        self.match_term(pattern.operator, term.operator)
-        self.match_term(pattern.operand, term.operand)
+        '''Return the pairs of parts to match next.'''
+        return [(pattern.operator, term.operator),
+                (pattern.operand, term.operand)]
 
     def match_abstraction(self, pattern, term):
-        self.match_term(pattern.bound, term.bound)
-        self.match_term(pattern.body, term.body)
+        return [(pattern.bound, term.bound), (pattern.body, term.body)]
 
 def match_term(term, pattern):
     matcher = TermMatcher()
     matcher.match_term(term, pattern)
     return matcher.assignments
+
+class CompiledPattern:
+    '''A pattern compiled once into nested closures, to be matched
+    against many terms.
+
+    Matching walks the term checking only its shape and the names of
+    constants, operators before operands, and collects the subterms at
+    the pattern's atoms. Only when the whole shape matches are the
+    pattern variables bound, and the types of all the atoms are then
+    unified together in one unifier.
+    '''
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.atoms = []
+        self.matcher = self._compile(pattern)
+
+        # the index of the first occurrence of each variable, and the
+        # later occurrences which must match the same subterm
+        self.first = {}
+        self.repeats = []
+        for index, atom in enumerate(self.atoms):
+            if is_variable(atom):
+                if atom.name in self.first:
+                    self.repeats.append((index, self.first[atom.name]))
+                else:
+                    self.first[atom.name] = index
+
+    def _compile(self, pattern):
+        # atoms are listed in the order the closures visit them
+        if is_variable(pattern):
+            self.atoms.append(pattern)
+            def match(term, found):
+                found.append(term)
+        elif is_constant(pattern):
+            self.atoms.append(pattern)
+            name = pattern.name
+            def match(term, found):
+                if not is_constant(term) or term.name != name:
+                    _fail(pattern, term)
+                found.append(term)
+        elif is_combination(pattern):
+            operator = self._compile(pattern.operator)
+            operand = self._compile(pattern.operand)
+            def match(term, found):
+                if not is_combination(term):
+                    _fail(pattern, term)
+                operator(term.operator, found)
+                operand(term.operand, found)
+        else:
+            bound = self._compile(pattern.bound)
+            body = self._compile(pattern.body)
+            def match(term, found):
+                if not is_abstraction(term):
+                    _fail(pattern, term)
+                bound(term.bound, found)
+                body(term.body, found)
+        return match
+
+    def match(self, term):
+        '''Return the assignments of subterms of term to the names of
+        the pattern variables, raising UnificationError if term does not
+        match.'''
+        found = []
+        self.matcher(term, found)
+
+        for index, first in self.repeats:
+            if found[index] is not found[first]:
+                raise UnificationError('Cannot match %s with both %s and %s.'
+                                       % (self.atoms[index], found[index],
+                                          found[first]))
+
+        unifier = None
+        for atom, term_ in zip(self.atoms, found):
+            if atom.qtype != term_.qtype:
+                if unifier is None:
+                    unifier = TypeUnifier()
+                try:
+                    unifier.unify(atom.qtype, term_.qtype)
+                except UnificationError:
+                    _fail(atom, term_)
+
+        return dict((name, found[index])
+                    for name, index in self.first.iteritems())
+
+def _fail(pattern, term):
+    raise UnificationError('Cannot match %s with %s.' % (pattern, term))
@@ -0,0 +1,377 @@
+'''A locally nameless view of terms.
+
+Bound variables are replaced by de Bruijn indices, counting binders
+outwards from the occurrence, while free variables and constants are
+kept as the ordinary (interned) atoms. Alpha-equivalent terms
+therefore have the same nameless form, and since nameless nodes are
+hash-consed like terms, alpha-equivalence is an identity check and
+the nameless form is a good key for caches.
+
+Substitution of a free variable never needs renaming in this form:
+the value's free variables are names and the term's bound variables
+are indices, so neither can capture the other. Names only come back
+when converting to an ordinary term, which is the one place a binder
+may be renamed.
+'''
+
+import threading
+import weakref
+
+from cheqed.core import qterm
+from cheqed.core.traversal import fold, write
+
+_nodes = weakref.WeakValueDictionary()
+_nodes_lock = threading.Lock()
+_nameless = weakref.WeakKeyDictionary()
+
+def _intern(key, node):
+    with _nodes_lock:
+        existing = _nodes.get(key)
+        if existing is not None:
+            return existing
+        _nodes[key] = node
+        return node
+
+def _repr_pieces(node):
+    if isinstance(node, Node):
+        return node._repr_pieces()
+    return [repr(node)]
+
+def is_bound(node):
+    return isinstance(node, Bound)
+
+def is_combination(node):
+    return isinstance(node, Combination)
+
+def is_abstraction(node):
+    return isinstance(node, Abstraction)
+
+
+class Node(object):
+    __slots__ = ('_hash', '_free_variables', '_level', '__weakref__')
+
+    def __setattr__(self, name, value):
+        raise AttributeError('nameless terms are immutable')
+
+    def _init(self, **attributes):
+        for name, value in attributes.iteritems():
+            object.__setattr__(self, name, value)
+
+    def __eq__(self, other):
+        return self is other
+
+    def __ne__(self, other):
+        return self is not other
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return write(self, _repr_pieces)
+
+
+class Bound(Node):
+    __slots__ = ('_index',)
+
+    def __new__(cls, index):
+        key = (cls, index)
+        node = _nodes.get(key)
+        if node is None:
+            node = object.__new__(cls)
+            node._init(_index=index,
+                       _hash=hash(key),
+                       _free_variables=frozenset(),
+                       _level=index + 1)
+            node = _intern(key, node)
+        return node
+
+    @property
+    def index(self):
+        return self._index
+
+    def _repr_pieces(self):
+        return ['Bound(%r)' % self.index]
+
+
+class Combination(Node):
+    __slots__ = ('_operator', '_operand')
+
+    def __new__(cls, operator, operand):
+        key = (cls, id(operator), id(operand))
+        node = _nodes.get(key)
+        if node is None:
+            node = object.__new__(cls)
+            node._init(_operator=operator,
+                       _operand=operand,
+                       _hash=hash((cls, hash(operator), hash(operand))),
+                       _free_variables=(free_variables(operator)
+                                        | free_variables(operand)),
+                       _level=max(level(operator), level(operand)))
+            node = _intern(key, node)
+        return node
+
+    @property
+    def operator(self):
+        return self._operator
+
+    @property
+    def operand(self):
+        return self._operand
+
+    def _repr_pieces(self):
+        return ['Combination(', self.operator, ', ', self.operand, ')']
+
+
+class Abstraction(Node):
+    '''A binder. It keeps no name for the variable it binds: named()
+    takes one from the term being converted back.'''
+
+    __slots__ = ('_qtype', '_body')
+
+    def __new__(cls, qtype_, body):
+        key = (cls, qtype_, id(body))
+        node = _nodes.get(key)
+        if node is None:
+            node = object.__new__(cls)
+            node._init(_qtype=qtype_,
+                       _body=body,
+                       _hash=hash((cls, qtype_, hash(body))),
+                       _free_variables=free_variables(body),
+                       _level=max(level(body) - 1, 0))
+            node = _intern(key, node)
+        return node
+
+    @property
+    def qtype(self):
+        return self._qtype
+
+    @property
+    def body(self):
+        return self._body
+
+    def _repr_pieces(self):
+        return ['Abstraction(%r, ' % self.qtype, self.body, ')']
+
+
+def free_variables(node):
+    if isinstance(node, Node):
+        return node._free_variables
+    return node.free_variables()
+
+def level(node):
+    '''Return one more than the largest index that is not bound within
+    node, or 0 if node is locally closed.'''
+    if isinstance(node, Node):
+        return node._level
+    return 0
+
+def children(node):
+    if is_combination(node):
+        return (node.operator, node.operand)
+    elif is_abstraction(node):
+        return (node.body,)
+    return ()
+
+def rebuild(node, parts):
+    if is_combination(node):
+        return Combination(*parts)
+    return Abstraction(node.qtype, parts[0])
+
+def _beneath(item):
+    '''Return the children of node paired with the number of binders
+    above them, for item a pair of node and that number for it.'''
+    node, depth = item
+    if is_abstraction(node):
+        depth += 1
+    return [(part, depth) for part in children(node)]
+
+def close(node, variable, depth=0):
+    '''Replace free occurrences of variable by the index depth.'''
+    def parts(item):
+        if variable not in free_variables(item[0]):
+            return ()
+        return _beneath(item)
+
+    def combine(item, parts):
+        node, depth = item
+        if parts:
+            return rebuild(node, parts)
+        elif node is variable:
+            return Bound(depth)
+        return node
+
+    return fold((node, depth), parts, combine)
+
+def open_(node, value, depth=0):
+    '''Replace the index depth by the locally closed node value.'''
+    def parts(item):
+        node, depth = item
+        if level(node) <= depth:
+            return ()
+        return _beneath(item)
+
+    def combine(item, parts):
+        node, depth = item
+        if parts:
+            return rebuild(node, parts)
+        elif level(node) > depth:
+            return value
+        return node
+
+    return fold((node, depth), parts, combine)
+
+def replace(node, variable, value):
+    '''Replace the free variable by the locally closed node value.'''
+    def parts(node):
+        if variable not in free_variables(node):
+            return ()
+        return children(node)
+
+    def combine(node, parts):
+        if parts:
+            return rebuild(node, parts)
+        elif node is variable:
+            return value
+        return node
+
+    return fold(node, parts, combine)
+
+def nameless(term):
+    '''Return the nameless form of term.
+
+    Nameless forms are remembered in a table with weak keys. Atoms are
+    their own nameless forms and are never entered, since the entry
+    would keep them alive.
+    '''
+    if qterm.is_atom(term):
+        return term
+    try:
+        return _nameless[term]
+    except KeyError:
+        pass
+
+    def parts(term):
+        if term in _nameless:
+            return ()
+        return qterm.children(term)
+
+    def combine(term, parts):
+        if qterm.is_atom(term):
+            return term
+        elif not parts:
+            return _nameless[term]
+        elif qterm.is_combination(term):
+            return Combination(*parts)
+        else:
+            return Abstraction(term.bound.qtype,
+                               close(parts[1], term.bound))
+
+    memo = {}
+    node = fold(term, parts, combine, memo)
+    for subterm, subnode in memo.iteritems():
+        if subnode is not subterm:
+            _nameless[subterm] = subnode
+    return node
+
+def alpha_equivalent(a, b):
+    return a is b or nameless(a) is nameless(b)
+
+def _fresh_name(hint, avoid):
+    name = hint
+    i = 1
+    while name in avoid:
+        name = hint + str(i)
+        i += 1
+    return name
+
+class _Scope(object):
+    '''The variable for a binder, and the scope of the binders around
+    it.'''
+
+    __slots__ = ('variable', 'outer')
+
+    def __init__(self, variable, outer):
+        self.variable = variable
+        self.outer = outer
+
+    def lookup(self, index):
+        scope = self
+        for i in xrange(index):
+            scope = scope.outer
+        return scope.variable
+
+def named(node, source=None, replacements=None, bound=()):
+    '''Return an ordinary term for node.
+
+    Binders take their names from the binders in the same places in
+    source, an ordinary term of the same shape as node, except where
+    source has a free variable which replacements maps to the term put
+    in its place in node; binders with no name to take are called x.
+    bound lists the variables for the enclosing binders, innermost
+    last. A binder is renamed if its name would capture a free variable
+    or an enclosing bound variable of the same name.
+    '''
+    if replacements is None:
+        replacements = {}
+    scope = None
+    for variable in bound:
+        scope = _Scope(variable, scope)
+    variables = {}
+
+    def follow(node, source):
+        if qterm.is_atom(source) and node is not source:
+            return replacements.get(source)
+        return source
+
+    def parts(item):
+        node, scope, source = item
+        if is_combination(node):
+            if qterm.is_combination(source):
+                operator, operand = source.operator, source.operand
+            else:
+                operator = operand = None
+            return ((node.operator, scope, follow(node.operator, operator)),
+                    (node.operand, scope, follow(node.operand, operand)))
+        elif is_abstraction(node):
+            if qterm.is_abstraction(source):
+                name, body = source.bound.name, source.body
+            else:
+                name, body = 'x', None
+            avoid = set(var.name for var in free_variables(node.body))
+            for index in range(level(node.body) - 1):
+                avoid.add(scope.lookup(index).name)
+            variable = qterm.Variable(_fresh_name(name, avoid), node.qtype)
+            variables[item] = variable
+            return ((node.body, _Scope(variable, scope),
+                     follow(node.body, body)),)
+        return ()
+
+    def combine(item, parts):
+        node, scope, source = item
+        if is_bound(node):
+            return scope.lookup(node.index)
+        elif is_combination(node):
+            return qterm.Combination(*parts)
+        elif is_abstraction(node):
+            return qterm.Abstraction(variables.pop(item), parts[0])
+        return node
+
+    return fold((node, scope, follow(node, source)), parts, combine)
+
+def substitute(value, pattern, term):
+    '''Substitute value for the free variable pattern in term.
+
+    Types are not inferred; value and pattern must have the same type.
+    '''
+    qterm.validate_substitution(value, pattern)
+    node = nameless(term)
+    result = replace(node, pattern, nameless(value))
+    if result is node:
+        return term
+    return named(result, term, {pattern: value})
+
+def instantiate(abstraction, value):
+    '''Contract the redex formed by applying abstraction to value.'''
+    qterm.validate_substitution(value, abstraction.bound)
+    return named(open_(nameless(abstraction).body, nameless(value)),
+                 abstraction.body, {abstraction.bound: value})
@@ -0,0 +1,79 @@
+'''Reduce terms to beta (and optionally eta) normal form.
+
+Every term records whether it is beta normal when it is constructed,
+so normalising never walks into a subterm that is already normal.
+The normal forms of subterms which are not normal are remembered in a
+table with weak keys; a term which is its own normal form is never
+entered, since the entry would keep it alive. Since terms are
+hash-consed, a subterm shared between several formulas is only
+normalised once.
+
+A curried abstraction applied to several arguments is contracted with
+one simultaneous substitution rather than one argument at a time.
+'''
+
+import weakref
+
+from cheqed.core import qterm
+from cheqed.core.substitution import substitute_many
+from cheqed.core.traversal import fold
+
+_normal_forms = {False: weakref.WeakKeyDictionary(),
+                 True: weakref.WeakKeyDictionary()}
+
+def is_eta_redex(term):
+    return (qterm.is_abstraction(term)
+            and qterm.is_combination(term.body)
+            and term.body.operand is term.bound
+            and term.bound not in term.body.operator.free_variables())
+
+def normalize(term, eta=False):
+    '''Return the beta normal form of term, also contracting eta
+    redexes if eta is true.'''
+    if term.is_normal() and (not eta or qterm.is_atom(term)):
+        return term
+    normal_forms = _normal_forms[eta]
+    try:
+        return normal_forms[term]
+    except KeyError:
+        pass
+
+    def parts(term):
+        if term.is_normal() and (not eta or qterm.is_atom(term)):
+            return ()
+        elif term in normal_forms:
+            return ()
+        elif qterm.is_combination(term):
+            head, args = qterm.spine(term)
+            return [head] + args
+        elif qterm.is_abstraction(term):
+            return (term.body,)
+        return ()
+
+    def combine(term, parts):
+        if not parts:
+            return normal_forms.get(term, term)
+        elif qterm.is_combination(term):
+            result, args = parts[0], list(parts[1:])
+            args.reverse()
+            while args and qterm.is_abstraction(result):
+                mapping = {}
+                while args and qterm.is_abstraction(result):
+                    mapping[result.bound] = args.pop()
+                    result = result.body
+                result = normalize(substitute_many(mapping, result), eta)
+            while args:
+                result = qterm.Combination(result, args.pop())
+            return result
+        else:
+            result = qterm.rebuild(term, (term.bound, parts[0]))
+            if eta and is_eta_redex(result):
+                result = result.body.operator
+            return result
+
+    memo = {}
+    result = fold(term, parts, combine, memo)
+    for subterm, normal in memo.iteritems():
+        if normal is not subterm:
+            normal_forms[subterm] = normal
+    return result
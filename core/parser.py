@@ -1,17 +1,105 @@
+import hashlib
 import itertools
+import os
 import sys
+import threading
 
 import ply.lex as lex
 import ply.yacc as yacc
 
 from cheqed.core import qterm, qtype
 
+# Generated LALR tables are pickled here, one file per grammar, so that
+# later processes can load them. Set to None to keep them in memory only.
+table_dir = os.path.join(os.path.expanduser('~'), '.cache', 'cheqed')
+
+# lexers and table data for the grammars built so far, keyed on the
+# syntax signature (and start symbol)
+_lexers = {}
+_tables = {}
+
 class SyntaxError(Exception):
     pass
 
 class PrecedenceError(Exception):
     pass
 
+def _table_file(key):
+    if table_dir is None:
+        return None
+    try:
+        if not os.path.isdir(table_dir):
+            os.makedirs(table_dir)
+    except OSError:
+        return None
+    name = hashlib.sha1(repr(key)).hexdigest()
+    return os.path.join(table_dir, 'parser-%s.pickle' % name)
+
+def precedence_table(syntax):
+    '''Return the precedence table for the syntax, in the form ply
+    expects: a list of entries [associativity, token, ...] from the
+    loosest binding to the tightest.'''
+    precedence = [
+        (5000, 'nonassoc', 'DOT'),
+        (4900, 'nonassoc', 'BSLASH'),
+        (4800, 'right', 'ARROW'),
+        (0, 'nonassoc', 'LPAREN'),
+        (0, 'nonassoc', 'RPAREN'),
+        ]
+
+    precedence.extend([(o.precedence, o.associativity, o.token)
+                       for o in syntax.operators()])
+
+    precedence.sort(reverse=True)
+
+    table = []
+    for key, group in itertools.groupby(precedence, lambda p: p[0]):
+        token = group.next()
+        entry = [token[1], token[2]]
+        for token in group:
+            Parser.check_associativities(entry, token)
+            entry.append(token[2])
+        table.append(entry)
+    return table
+
+def is_skipped(line):
+    '''Return whether a line between the formulas of a stream is blank
+    or a comment.'''
+    line = line.strip()
+    return not line or line.startswith('#')
+
+def _finish(job):
+    qtype.separate_variables(os.getpid())
+    term_builder, term = job
+    return term_builder.finish(term)
+
+def finish_in_pool(term_builder, terms, pool, batch_size):
+    '''Finish the unfinished terms with term_builder in a
+    multiprocessing pool, batch_size terms at a time, and yield them in
+    order.
+
+    The workers name the type variables they make after their process
+    ids, so that they never clash with the variables in the terms they
+    are sent, and every finished term gets fresh variables of this
+    process's here. A syntax error in terms is raised after the terms
+    before it.
+    '''
+    while True:
+        batch = []
+        error = None
+        try:
+            for term in itertools.islice(terms, batch_size):
+                batch.append(term)
+        except SyntaxError:
+            error = sys.exc_info()
+        jobs = [(term_builder, term) for term in batch]
+        for term in pool.map(_finish, jobs):
+            yield qterm.rename_type_variables(term)
+        if error is not None:
+            raise error[0], error[1], error[2]
+        if len(batch) < batch_size:
+            return
+
 class Parser:
     def __init__(self, syntax, term_builder, quiet=True):
         self.tokens = [
@@ -38,45 +126,71 @@ class Parser:
         for word in self.syntax.words():
             self.tokens.append(word.token)
 
-        precedence = [
-            (5000, 'nonassoc', 'DOT'),
-            (4900, 'nonassoc', 'BSLASH'),
-            (4800, 'right', 'ARROW'),
-            (0, 'nonassoc', 'LPAREN'),
-            (0, 'nonassoc', 'RPAREN'),
-            ]
-                
-        precedence.extend([(o.precedence, o.associativity, o.token)
-                           for o in self.syntax.operators()])
-
-        precedence.sort(reverse=True)
-
-        self.precedence = []
-        for key, group in itertools.groupby(precedence, lambda p: p[0]):
-            token = group.next()
-            entry = [token[1], token[2]]
-            for token in group:
-                self.check_associativities(entry, token)
-                entry.append(token[2])
-            self.precedence.append(entry)
-
-        if quiet:
+        self.precedence = precedence_table(self.syntax)
+
+        self.quiet = quiet
+        self.signature = self.syntax.signature()
+        # ply's lexers and LR parsers keep the state of the current
+        # parse, so every thread gets its own, along with the type
+        # variables named in the current parse
+        self._local = threading.local()
+        self._thread_state()
+
+    def _quietly(self, function, *args, **kwargs):
+        if self.quiet:
             stderr = sys.stderr
             sys.stderr = open('/dev/null', 'w')
         try:
-            self.lexer = lex.lex(module=self)
-            self.parser = yacc.yacc(module=self, start='term',
-                                    debug=0, write_tables=0)
-            self.type_parser = yacc.yacc(module=self, start='type',
-                                         debug=0, write_tables=0)
+            return function(*args, **kwargs)
         finally:
-            if quiet:
+            if self.quiet:
                 sys.stderr = stderr
 
+    def _thread_state(self):
+        '''Return this thread's lexer, term parser and type parser,
+        making them the first time the thread parses.'''
+        local = self._local
+        try:
+            return local.lexer, local.parser, local.type_parser
+        except AttributeError:
+            pass
+        local.lexer = self._make_lexer(self.signature)
+        local.parser = self._make_parser(self.signature, 'term')
+        local.type_parser = self._make_parser(self.signature, 'type')
+        return local.lexer, local.parser, local.type_parser
+
+    def _make_lexer(self, signature):
+        if signature not in _lexers:
+            _lexers[signature] = self._quietly(lex.lex, module=self)
+        return _lexers[signature].clone(self)
+
+    def _make_parser(self, signature, start):
+        '''Return an LR parser for the grammar, generating its tables
+        only if neither this process nor the table directory has them.'''
+        key = (signature, start)
+        if key not in _tables:
+            parser = self._quietly(yacc.yacc, module=self, start=start,
+                                   debug=0, write_tables=0,
+                                   picklefile=_table_file(key))
+            productions = [(str(p), p.name, p.len, p.func, p.file, p.line)
+                           for p in parser.productions]
+            _tables[key] = (parser.action, parser.goto, productions)
+            return parser
+
+        action, goto, productions = _tables[key]
+        table = yacc.LRTable()
+        table.lr_action = action
+        table.lr_goto = goto
+        table.lr_productions = [yacc.MiniProduction(*p) for p in productions]
+        table.bind_callables(dict((p[3], getattr(self, p[3]))
+                                  for p in productions if p[3]))
+        return yacc.LRParser(table, self.p_error)
     
     def _make_doc(self, nonterminal, pattern, words):
         if len(words) > 0:
-            tokens = [word.token for word in words]
+            # sorted, so that the grammar does not depend on the order
+            # of the words
+            tokens = sorted([word.token for word in words])
             productions = '\n| '.join([pattern % tok for tok in tokens])
             return '%s : %s' % (nonterminal, productions)
         else:
@@ -84,7 +198,7 @@ class Parser:
         
     def _make_binary_operator(self):
         def p_binary_operator(p):
-            p[0] = self.term_builder.build_binary_op(self.syntax[p[2]].constant, p[1], p[3])
+            p[0] = self.term_builder.build_binary_op(self._constant(p[2]), p[1], p[3])
 
         words = [word for word in self.syntax.operators()
                  if word.arity == 2]
@@ -95,7 +209,7 @@ class Parser:
 
     def _make_unary_operator(self):
         def p_unary_operator(p):
-            p[0] = self.term_builder.build_combination(self.syntax[p[1]].constant, p[2])
+            p[0] = self.term_builder.build_combination(self._constant(p[1]), p[2])
 
         words = [word for word in self.syntax.operators()
                  if word.arity == 1]
@@ -106,7 +220,7 @@ class Parser:
 
     def _make_binder(self):
         def p_binder(p):
-            p[0] = self.term_builder.build_combination(self.syntax[p[1]].constant,
+            p[0] = self.term_builder.build_combination(self._constant(p[1]),
                                   self.term_builder.build_abstraction(p[2], p[3]))
 
         doc = self._make_doc('binder', '%s atom term',
@@ -116,7 +230,7 @@ class Parser:
 
     def _make_prefix_constants(self):
         def p_prefix_constant(p):
-            p[0] = self.syntax[p[2]].constant
+            p[0] = self._constant(p[2])
             
         doc = self._make_doc('prefix_constant', 'LPAREN %s RPAREN',
                              self.syntax.words())
@@ -131,6 +245,10 @@ class Parser:
         p_atomic_type.__doc__ = doc
         self.p_atomic_type = p_atomic_type
 
+    def _constant(self, name):
+        constant = self.syntax[name].constant
+        return self.term_builder.build_constant(constant.name, constant.qtype)
+
     @staticmethod
     def check_associativities(entry, token):
         if entry[0] != token[1]:
@@ -202,9 +320,10 @@ class Parser:
 
     def p_atomic_variable_type(self, p):
         'atomic_type : QMARK IDENT'
-        if p[2] not in self.type_context:
-            self.type_context[p[2]] = qtype.qvar()
-        p[0] = self.type_context[p[2]]
+        type_context = self._local.type_context
+        if p[2] not in type_context:
+            type_context[p[2]] = qtype.qvar()
+        p[0] = type_context[p[2]]
         
     def p_function_type(self, p):
         'type : type ARROW type'
@@ -240,16 +359,81 @@ class Parser:
         p[0] = c
 
     def p_error(self, p):
+        if p is None:
+            raise SyntaxError('Syntax error at end of input')
         raise SyntaxError("Syntax error at '%s'" % p.value)
 
     def parse(self, string):
-        self.type_context = {}
-        term = self.parser.parse(string, lexer=self.lexer)
-        self.type_context = None
-        return term
+        lexer, parser, type_parser = self._thread_state()
+        self._local.type_context = {}
+        try:
+            term = parser.parse(string, lexer=lexer)
+        finally:
+            self._local.type_context = None
+        return self.term_builder.finish(term)
 
     def parse_type(self, string):
-        self.type_context = {}
-        term = self.type_parser.parse(string, lexer=self.lexer)
-        self.type_context = None
-        return term
+        lexer, parser, type_parser = self._thread_state()
+        self._local.type_context = {}
+        try:
+            return type_parser.parse(string, lexer=lexer)
+        finally:
+            self._local.type_context = None
+
+    def parse_stream(self, lines, pool=None, batch_size=256):
+        '''Parse the formulas in lines, an iterable of strings such as
+        an open file, yielding their terms as they are read.
+
+        There is one formula per line, except that a formula continues
+        on the next line while it has unclosed parentheses. Blank lines
+        and lines starting with # between formulas are skipped. Syntax
+        errors give the line number. If pool, a multiprocessing pool,
+        is given, types are inferred in its workers.
+        '''
+        terms = self._parse_lines(lines)
+        if pool is None:
+            return (self.term_builder.finish(term) for term in terms)
+        return finish_in_pool(self.term_builder, terms, pool, batch_size)
+
+    def _parse_lines(self, lines):
+        lexer = self._thread_state()[0]
+        tokens = []
+        depth = 0
+        for number, line in enumerate(lines, 1):
+            if not tokens and is_skipped(line):
+                continue
+            lexer.input(line)
+            try:
+                for token in iter(lexer.token, None):
+                    token.lineno = number
+                    if token.type == 'LPAREN':
+                        depth += 1
+                    elif token.type == 'RPAREN':
+                        depth -= 1
+                    tokens.append(token)
+            except SyntaxError, e:
+                raise SyntaxError('line %d: %s' % (number, e))
+            if tokens and depth <= 0:
+                yield self._parse_tokens(tokens)
+                tokens = []
+                depth = 0
+        if tokens:
+            yield self._parse_tokens(tokens)
+
+    def _parse_tokens(self, tokens):
+        '''Parse a formula from its tokens, without finishing it.'''
+        read = []
+        def next_token():
+            if len(read) == len(tokens):
+                return None
+            read.append(tokens[len(read)])
+            return read[-1]
+
+        lexer, parser, type_parser = self._thread_state()
+        self._local.type_context = {}
+        try:
+            return parser.parse(lexer=lexer, tokenfunc=next_token)
+        except SyntaxError, e:
+            raise SyntaxError('line %d: %s' % ((read or tokens)[-1].lineno, e))
+        finally:
+            self._local.type_context = None
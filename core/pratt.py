@@ -0,0 +1,280 @@
+'''An operator precedence (Pratt) parser for the term language.
+
+PrattParser accepts the same language as parser.Parser and builds the
+same terms through the same term builder calls, but reads the operator
+and binder tables of the syntax directly instead of generating an LALR
+parser for them, so it is cheap to construct and quick on the short
+strings that rules parse as patterns.
+
+Where the ply grammar is ambiguous, its conflicts are resolved by the
+precedence table: when the term that ends a rule is followed by an
+operator or an application, the rule is closed if the operator binds
+more loosely than the rule (or as tightly, for left associative
+rules), and the term is extended otherwise. The same comparison is
+made here, with the same table, so that bodies of binders, dots and
+abstractions still extend as far as they can.
+'''
+
+import copy
+import re
+
+from cheqed.core import qtype
+from cheqed.core.parser import SyntaxError, precedence_table, \
+    finish_in_pool, is_skipped
+
+_token = re.compile(r'\s*(?:(?P<ident>=|[a-zA-Z_]+)|(?P<punct>->|[().,\\:?]))')
+
+_punctuation = {
+    '(': 'LPAREN',
+    ')': 'RPAREN',
+    ',': 'COMMA',
+    '.': 'DOT',
+    '\\': 'BSLASH',
+    '->': 'ARROW',
+    ':': 'COLON',
+    '?': 'QMARK',
+    }
+
+_end = ('END', None)
+
+class PrattParser:
+    def __init__(self, syntax, term_builder):
+        self.syntax = syntax
+        self.term_builder = term_builder
+        self.words = set(syntax.names())
+
+        self.levels = {}
+        for level, entry in enumerate(precedence_table(self.syntax)):
+            for token in entry[1:]:
+                self.levels[token] = (level + 1, entry[0])
+
+        self.unary = {}
+        self.binary = {}
+        for operator in self.syntax.operators():
+            if operator.arity == 1:
+                self.unary[operator.name] = operator
+            elif operator.arity == 2:
+                self.binary[operator.name] = operator
+        self.binders = set(binder.name for binder in self.syntax.binders())
+        self.types = set(type_.name for type_ in self.syntax.types())
+
+    def tokenize(self, string):
+        '''Return the tokens of string as (kind, value) pairs. Names of
+        words in the syntax have kind 'WORD'.'''
+        tokens = []
+        position = 0
+        end = len(string.rstrip())
+        while position < end:
+            match = _token.match(string, position)
+            if match is None:
+                raise SyntaxError("Syntax error at '%s'"
+                                  % string[position:].lstrip()[0])
+            ident = match.group('ident')
+            if ident is None:
+                tokens.append((_punctuation[match.group('punct')], None))
+            elif ident in self.words:
+                tokens.append(('WORD', ident))
+            else:
+                tokens.append(('IDENT', ident))
+            position = match.end()
+        tokens.append(_end)
+        tokens.reverse()
+        return tokens
+
+    def peek(self):
+        return self.tokens[-1]
+
+    def next(self):
+        return self.tokens.pop()
+
+    def expect(self, kind):
+        token = self.next()
+        if token[0] != kind:
+            self.error(token)
+        return token
+
+    def error(self, token):
+        if token is _end:
+            raise SyntaxError('Syntax error at end of input')
+        raise SyntaxError("Syntax error at '%s'" % (token[1] or token[0]))
+
+    def _constant(self, name):
+        constant = self.syntax[name].constant
+        return self.term_builder.build_constant(constant.name, constant.qtype)
+
+    def _level(self, token):
+        '''Return the precedence level and associativity of the token,
+        if it can continue a term, or None.'''
+        kind, value = token
+        if kind == 'LPAREN':
+            return self.levels['LPAREN']
+        elif kind == 'WORD' and value in self.binary:
+            return self.levels[self.binary[value].token]
+        return None
+
+    def term(self, rule=None):
+        '''Parse a term which ends the rule with the given precedence
+        level and associativity, or a whole term if rule is None.'''
+        term = self.prefix()
+        while True:
+            token = self.peek()
+            shift = self._level(token)
+            if shift is None:
+                return term
+            if rule is not None:
+                if (shift[0] < rule[0]
+                    or (shift[0] == rule[0] and rule[1] == 'left')):
+                    return term
+                if shift[0] == rule[0] and rule[1] == 'nonassoc':
+                    self.error(token)
+
+            self.next()
+            if token[0] == 'LPAREN':
+                term = self.application(term)
+            else:
+                operator = self.binary[token[1]]
+                right = self.term(self.levels[operator.token])
+                term = self.term_builder.build_binary_op(
+                    self._constant(token[1]), term, right)
+
+    def prefix(self):
+        kind, value = token = self.next()
+        if kind == 'IDENT':
+            return self.atom(token)
+        elif kind == 'LPAREN':
+            if (self.peek()[0] == 'WORD'
+                and self.tokens[-2][0] == 'RPAREN'):
+                name = self.next()[1]
+                self.next()
+                return self._constant(name)
+            term = self.term()
+            self.expect('RPAREN')
+            return term
+        elif kind == 'DOT':
+            return self.term(self.levels['DOT'])
+        elif kind == 'BSLASH':
+            bound = self.atom(self.expect('IDENT'))
+            body = self.term(self.levels['BSLASH'])
+            return self.term_builder.build_abstraction(bound, body)
+        elif kind == 'WORD' and value in self.unary:
+            operand = self.term(self.levels[self.unary[value].token])
+            return self.term_builder.build_combination(self._constant(value),
+                                                       operand)
+        elif kind == 'WORD' and value in self.binders:
+            bound = self.atom(self.expect('IDENT'))
+            # the binder rule has no precedence, so its body extends
+            # as far as possible
+            body = self.term((0, 'right'))
+            return self.term_builder.build_combination(
+                self._constant(value),
+                self.term_builder.build_abstraction(bound, body))
+        self.error(token)
+
+    def atom(self, token):
+        if self.peek()[0] == 'COLON':
+            self.next()
+            return self.term_builder.build_variable(token[1], self.type_())
+        return self.term_builder.build_variable(token[1], qtype.qvar())
+
+    def application(self, operator):
+        args = []
+        while self.peek()[0] != 'RPAREN':
+            args.append(self.term())
+            if self.peek()[0] != 'COMMA':
+                break
+            self.next()
+        self.expect('RPAREN')
+        for arg in args:
+            operator = self.term_builder.build_combination(operator, arg)
+        return operator
+
+    def type_(self):
+        left = self.atomic_type()
+        if self.peek()[0] == 'ARROW':
+            self.next()
+            return qtype.qfun(left, self.type_())
+        return left
+
+    def atomic_type(self):
+        kind, value = token = self.next()
+        if kind == 'QMARK':
+            name = self.expect('IDENT')[1]
+            if name not in self.type_context:
+                self.type_context[name] = qtype.qvar()
+            return self.type_context[name]
+        elif kind == 'WORD' and value in self.types:
+            return self.syntax[value].constructor()
+        elif kind == 'LPAREN':
+            type_ = self.type_()
+            self.expect('RPAREN')
+            return type_
+        self.error(token)
+
+    def _reader(self, tokens):
+        '''Return a copy of the parser to hold the state of one parse,
+        so that threads can share the parser.'''
+        reader = copy.copy(self)
+        reader.tokens = tokens
+        reader.type_context = {}
+        return reader
+
+    def _parse(self, tokens, production):
+        reader = self._reader(tokens)
+        result = getattr(reader, production)()
+        reader.expect('END')
+        return result
+
+    def parse(self, string):
+        return self.term_builder.finish(self._parse(self.tokenize(string),
+                                                    'term'))
+
+    def parse_type(self, string):
+        return self._parse(self.tokenize(string), 'type_')
+
+    def parse_stream(self, lines, pool=None, batch_size=256):
+        '''Parse the formulas in lines as parser.Parser.parse_stream
+        does.'''
+        terms = self._parse_lines(lines)
+        if pool is None:
+            return (self.term_builder.finish(term) for term in terms)
+        return finish_in_pool(self.term_builder, terms, pool, batch_size)
+
+    def _parse_lines(self, lines):
+        # the tokens of the formula so far, last first, and the line
+        # of each
+        tokens = []
+        numbers = []
+        depth = 0
+        for number, line in enumerate(lines, 1):
+            if not tokens and is_skipped(line):
+                continue
+            try:
+                line_tokens = self.tokenize(line)[1:]
+            except SyntaxError, e:
+                raise SyntaxError('line %d: %s' % (number, e))
+            for kind, value in line_tokens:
+                if kind == 'LPAREN':
+                    depth += 1
+                elif kind == 'RPAREN':
+                    depth -= 1
+            tokens[:0] = line_tokens
+            numbers[:0] = [number] * len(line_tokens)
+            if tokens and depth <= 0:
+                yield self._parse_tokens(tokens, numbers)
+                tokens = []
+                numbers = []
+                depth = 0
+        if tokens:
+            yield self._parse_tokens(tokens, numbers)
+
+    def _parse_tokens(self, tokens, numbers):
+        reader = self._reader([_end] + tokens)
+        try:
+            term = reader.term()
+            reader.expect('END')
+            return term
+        except SyntaxError, e:
+            # the offending token is the last one read
+            read = len(tokens) + 1 - len(reader.tokens)
+            number = numbers[-min(max(read, 1), len(tokens))]
+            raise SyntaxError('line %d: %s' % (number, e))
@@ -1,101 +1,161 @@
-from cheqed.core import qtype, qterm, unification, substitution, term_builder
+import itertools
+import string
+import weakref
 
-def match_unary_op(term):
-    return (term.operator,
-            term.operand)
+from cheqed.core import qterm
 
-def match_binary_op(term):
-    return (term.operator.operator,
-            term.operator.operand,
-            term.operand)
+def abbreviation_names():
+    '''Yield A, B, ..., Z, AA, AB, ...'''
+    for length in itertools.count(1):
+        for letters in itertools.product(string.ascii_uppercase,
+                                         repeat=length):
+            yield ''.join(letters)
 
-def match_binder(term):
-    return (term.operator,
-            term.operand.bound,
-            term.operand.body)
+class Printer(object):
+    '''Print terms in the concrete syntax the parser reads.
 
-def match_separation(term):
-    if term.operator.operator.name != 'separation':
-        raise TypeError
-    return (term.operator.operand,
-            term.operand)
+    The names of the operators and binders are looked up once, when the
+    printer is made, and each node is printed by its shape. Printed
+    terms are remembered, along with their subterms up to memo_limit in
+    size, so that printing the formulas of a proof, which share most
+    of their subterms, mostly looks strings up.
+    '''
+
+    memo_limit = 256
+    abbreviation_size = 10
 
-class Printer(object):
     def __init__(self, syntax):
         self.syntax = syntax
+        self.unary = set()
+        self.binary = set()
+        for operator in syntax.operators():
+            if operator.arity == 1:
+                self.unary.add(operator.name)
+            elif operator.arity == 2:
+                self.binary.add(operator.name)
+        self.binders = set(binder.name for binder in syntax.binders())
+        self.memo = weakref.WeakKeyDictionary()
 
     def print_term(self, term):
-        for method in [self.print_atom,
-                       self.print_abstraction,
-                       self.print_combination]:
-            try:
-                return method(term)
-            except (AttributeError, TypeError):
-                pass
-        raise TypeError
-
-    def print_atom(self, atom):
-        return atom.name
-
-    def print_abstraction(self, abstraction):
-        return '(\\%s. %s)' % (self.print_atom(abstraction.bound),
-                               self.print_term(abstraction.body))
-
-    def print_unary_operator(self, combination):
-        operator, operand = match_unary_op(combination)
-        for operator_ in self.syntax.operators():
-            if operator_.arity == 1 and operator_.name == operator.name:
-                return '(%s %s)' % (self.print_atom(operator),
-                                    self.print_term(operand))
-        raise TypeError
-
-    def print_binary_operator(self, combination):
-        operator, first, second = match_binary_op(combination)
-        for operator_ in self.syntax.operators():
-            if operator_.arity == 2 and operator_.name == operator.name:
-                return '(%s %s %s)' % (self.print_term(first),
-                                       self.print_atom(operator),
-                                       self.print_term(second))
-        raise TypeError
-
-    def print_binder(self, combination):
-        binder, bound, body = match_binder(combination)
-        for binder_ in self.syntax.binders():
-            if binder_.name == binder.name:
-                return '(%s %s . %s)' % (self.print_atom(binder),
-                                         self.print_atom(bound),
-                                         self.print_term(body))
-        raise TypeError
-
-    def print_separation(self, term):
-        superset, predicate = match_separation(term)
-        bound = term_builder.build_variable('x', qtype.qvar())
-        pretty_predicate = substitution.beta_reduce(term_builder.unary_op(predicate, bound))
-        return '{ %s in %s | %s }' % (self.print_atom(bound),
-                                      self.print_term(superset),
-                                      self.print_combination(pretty_predicate))
-    
-    def print_function(self, combination):
-        def uncurry(term):
-            if not qterm.is_combination(term):
-                return term, []
-            operator, operands = uncurry(term.operator)
-            return operator, operands + [term.operand]
-
-        operator, operands = uncurry(combination)
-        
-        pretty_args = ', '.join([self.print_term(o) for o in operands])
-        return '%s(%s)' % (self.print_term(operator),
-                           pretty_args)
-
-    def print_combination(self, combination):
-        for method in [self.print_unary_operator,
-                       self.print_binder,
-                       self.print_separation,
-                       self.print_binary_operator,
-                       self.print_function]:
-            try:
-                return method(combination)
-            except (AttributeError, TypeError):
-                pass
-        raise TypeError
+        try:
+            return self.memo[term]
+        except KeyError:
+            pass
+        out = []
+        self._write(term, out, self.memo)
+        text = self.memo[term] = ''.join(out)
+        return text
+
+    def print_shared(self, terms):
+        '''Print terms, writing each subterm which occurs more than once
+        and is at least abbreviation_size in size only once.
+
+        Return the texts of the terms and a list of (name, text) pairs
+        for the abbreviations they use, in the order in which they
+        first occur. An abbreviation stands for its text, and its text
+        may use other abbreviations. The names are chosen apart from the
+        names of the atoms of terms.
+        '''
+        counts = {}
+        order = []
+        stack = list(reversed(terms))
+        while stack:
+            term = stack.pop()
+            if term.size < self.abbreviation_size:
+                continue
+            if term in counts:
+                counts[term] += 1
+                continue
+            counts[term] = 1
+            order.append(term)
+            if qterm.is_combination(term):
+                stack.append(term.operand)
+                stack.append(term.operator)
+            elif qterm.is_abstraction(term):
+                stack.append(term.body)
+
+        taken = set()
+        for term in terms:
+            taken.update(atom.name for atom in term.atoms())
+        names = (name for name in abbreviation_names() if name not in taken)
+
+        memo = {}
+        shared = []
+        for term in order:
+            if counts[term] > 1:
+                memo[term] = names.next()
+                shared.append(term)
+
+        texts = []
+        for term in terms:
+            out = []
+            self._write(term, out, memo)
+            texts.append(''.join(out))
+
+        abbreviations = []
+        for term in shared:
+            name = memo.pop(term)
+            out = []
+            self._write(term, out, memo)
+            memo[term] = name
+            abbreviations.append((name, ''.join(out)))
+        return texts, abbreviations
+
+    def _write(self, term, out, memo):
+        # the stack holds terms still to be written, text to append,
+        # and (term, start) marks for remembering what was written for
+        # term from out[start] on
+        stack = [term]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                out.append(item)
+                continue
+            elif isinstance(item, tuple):
+                term, start = item
+                memo[term] = ''.join(out[start:])
+                continue
+
+            term = item
+            if qterm.is_atom(term):
+                out.append(term.name)
+                continue
+            text = memo.get(term)
+            if text is not None:
+                out.append(text)
+                continue
+
+            if term.size <= self.memo_limit:
+                stack.append((term, len(out)))
+            pieces = self._pieces(term)
+            pieces.reverse()
+            stack.extend(pieces)
+
+    def _pieces(self, term):
+        '''Return the text and the subterms to write for term, in
+        order.'''
+        if qterm.is_abstraction(term):
+            return ['(\\%s. ' % term.bound.name, term.body, ')']
+
+        operator = term.operator
+        if qterm.is_atom(operator):
+            if operator.name in self.unary:
+                return ['(%s ' % operator.name, term.operand, ')']
+            if (operator.name in self.binders
+                and qterm.is_abstraction(term.operand)):
+                return ['(%s %s . ' % (operator.name, term.operand.bound.name),
+                        term.operand.body, ')']
+        elif (qterm.is_combination(operator)
+              and qterm.is_atom(operator.operator)
+              and operator.operator.name in self.binary):
+            return ['(', operator.operand, ' %s ' % operator.operator.name,
+                    term.operand, ')']
+
+        head, operands = qterm.spine(term)
+        pieces = [head, '(']
+        for i, operand in enumerate(operands):
+            if i:
+                pieces.append(', ')
+            pieces.append(operand)
+        pieces.append(')')
+        return pieces
@@ -23,9 +23,20 @@ construction process contains more nuance than belongs in a simple
 constructor, and so substitution cannot be written as an instance
 method without introducing a truly nasty dependency graph.
 
+Terms are hash-consed: the constructors hand back an existing term
+whenever a structurally identical one is still alive, so equal terms
+are the same object and equality is an identity check. Subterms are
+shared between every term that contains them, which keeps proofs with
+many repeated subformulas small. Pickled terms are rebuilt through the
+constructors, so they are shared in the process that loads them too.
+
 '''
 
+import threading
+import weakref
+
 from cheqed.core import qtype
+from cheqed.core.traversal import fold, write
 
 def is_constant(term):
     return isinstance(term, Constant)
@@ -45,6 +56,39 @@ def is_atom(term):
 def is_term(term):
     return is_atom(term) or is_combination(term) or is_abstraction(term)
 
+def children(term):
+    '''Return the immediate subterms of term.'''
+    if is_combination(term):
+        return (term.operator, term.operand)
+    elif is_abstraction(term):
+        return (term.bound, term.body)
+    return ()
+
+def spine(term):
+    '''Return the head of term and the list of arguments it is
+    applied to.'''
+    args = []
+    while is_combination(term):
+        args.append(term.operand)
+        term = term.operator
+    args.reverse()
+    return term, args
+
+def rebuild(term, parts):
+    '''Return term with its immediate subterms replaced by parts, or
+    term itself if they are the same.'''
+    if is_combination(term):
+        operator, operand = parts
+        if operator is term.operator and operand is term.operand:
+            return term
+        return Combination(operator, operand)
+    elif is_abstraction(term):
+        bound, body = parts
+        if bound is term.bound and body is term.body:
+            return term
+        return Abstraction(bound, body)
+    return term
+
 def by_name(atoms):
     by_name = {}
     for atom in atoms:
@@ -56,67 +100,252 @@ def validate_substitution(a, b):
         raise TypeError('cannot substitute term of type %s for term of type %s'
                         % (a.qtype, b.qtype))
 
+def rename_type_variables(term):
+    '''Return term with its type variables replaced by fresh ones.'''
+    type_variables = term.type_variables()
+    if not type_variables:
+        return term
+    return term.substitute_types(dict((variable, qtype.qvar())
+                                      for variable in type_variables))
+
+def same_up_to_type_variables(a, b, renaming=None):
+    '''Return whether a and b differ only by a one-to-one renaming of
+    type variables.'''
+    if renaming is None:
+        renaming = ({}, {})
+
+    def same_types(a, b):
+        if qtype.is_variable(a) and qtype.is_variable(b):
+            forward, backward = renaming
+            return (forward.setdefault(a, b) == b
+                    and backward.setdefault(b, a) == a)
+        elif qtype.is_polymorphic(a) and qtype.is_polymorphic(b):
+            return (a.name == b.name and len(a.args) == len(b.args)
+                    and all(same_types(x, y) for x, y in zip(a.args, b.args)))
+        return a == b
+
+    seen = set()
+    pairs = [(a, b)]
+    while pairs:
+        a, b = pairs.pop()
+        if (a, b) in seen:
+            continue
+        seen.add((a, b))
+        if is_atom(a):
+            if not (a.__class__ == b.__class__ and a.name == b.name
+                    and same_types(a.qtype, b.qtype)):
+                return False
+        elif a.__class__ != b.__class__:
+            return False
+        else:
+            pairs.extend(reversed(zip(children(a), children(b))))
+    return True
+
+
+_terms = weakref.WeakValueDictionary()
+_terms_lock = threading.Lock()
+
+def _intern(key, term):
+    '''Record term as the term for key, unless another thread got there
+    first, and return the recorded term.'''
+    with _terms_lock:
+        existing = _terms.get(key)
+        if existing is not None:
+            return existing
+        _terms[key] = term
+        return term
+
+def interned_count():
+    return len(_terms)
+
+def _union(a, b):
+    if not a:
+        return b
+    if not b or b is a:
+        return a
+    return a | b
+
+
+class Term(object):
+    '''Behaviour shared by every kind of term.
+
+    Terms are immutable. Everything that depends only on the structure
+    of a term is computed once, when the term is constructed, from the
+    cached values of its children.
+    '''
+
+    __slots__ = ('_qtype', '_hash', '_size', '_depth',
+                 '_atoms', '_free_variables', '_type_variables', '_normal',
+                 '__weakref__')
+
+    def __setattr__(self, name, value):
+        raise AttributeError('terms are immutable')
+
+    def _init(self, **attributes):
+        for name, value in attributes.iteritems():
+            object.__setattr__(self, name, value)
 
-class Atom(object):
-    def __init__(self, name, qtype_):
-        self._name = name
-        self._qtype = qtype_
+    @property
+    def qtype(self):
+        return self._qtype
 
     @property
-    def name(self):
-        return self._name
+    def size(self):
+        return self._size
 
     @property
-    def qtype(self):
-        return self._qtype
+    def depth(self):
+        return self._depth
 
     def __eq__(self, other):
-        return (self.__class__ == other.__class__
-                and self.name == other.name
-                and self.qtype == other.qtype)
+        return self is other
 
     def __ne__(self, other):
-        return not self == other
+        return self is not other
 
     def __hash__(self):
-        return hash(self.__class__) ^ hash(self.name) ^ hash(self.qtype)
+        return self._hash
 
-    def atoms(self):
-        return set([self])
+    def __repr__(self):
+        return write(self, lambda term: term._repr_pieces())
 
+    def atoms(self):
+        return self._atoms
 
-class Constant(Atom):
-    def __repr__(self):
-        return 'Constant(%r, %r)' % (self.name, self.qtype)
-    
     def free_variables(self):
-        return set()
+        return self._free_variables
+
+    def type_variables(self):
+        return self._type_variables
+
+    def is_normal(self):
+        '''Return whether the term is in beta normal form.'''
+        return self._normal
+
+    def _mentions(self, mapping):
+        type_variables = self._type_variables
+        if len(type_variables) <= len(mapping):
+            for variable in type_variables:
+                if variable in mapping:
+                    return True
+        else:
+            for variable in mapping:
+                if variable in type_variables:
+                    return True
+        return False
+
+    def substitute_types(self, mapping, memo=None):
+        '''Substitute mapping[key] for every type variable key at once.
+
+        Subterms whose types do not change are reused, and the term
+        itself is returned if nothing changes.
+        '''
+        if not self._mentions(mapping):
+            return self
+
+        def parts(term):
+            if term._mentions(mapping):
+                return children(term)
+            return ()
+
+        def substitute(term, parts):
+            if parts:
+                return rebuild(term, parts)
+            elif is_atom(term) and term._mentions(mapping):
+                return term._substitute_types(mapping)
+            return term
+
+        return fold(self, parts, substitute, memo)
 
     def substitute_type(self, a, b):
-        return Constant(self.name, self.qtype.substitute(a, b))
+        return self.substitute_types({b: a})
+
+
+class Atom(Term):
+    __slots__ = ('_name',)
+
+    def __new__(cls, name, qtype_):
+        key = (cls, name, qtype_)
+        atom = _terms.get(key)
+        if atom is None:
+            atom = object.__new__(cls)
+            atom._init(_name=name,
+                       _qtype=qtype_,
+                       _hash=hash(cls) ^ hash(name) ^ hash(qtype_),
+                       _size=1,
+                       _depth=1,
+                       _normal=True)
+            atom._init(_atoms=frozenset([atom]),
+                       _free_variables=atom._own_free_variables(),
+                       _type_variables=frozenset(
+                    [var for var in qtype_.atoms() if qtype.is_variable(var)]))
+            atom = _intern(key, atom)
+        return atom
 
+    @property
+    def name(self):
+        return self._name
 
-class Variable(Atom):
-    def __repr__(self):
-        return 'Variable(%r, %r)' % (self.name, self.qtype)
+    def __reduce__(self):
+        return (self.__class__, (self._name, self._qtype))
 
-    def free_variables(self):
-        return set([self])
+    def _own_free_variables(self):
+        return frozenset()
 
-    def substitute_type(self, a, b):
-        return Variable(self.name, self.qtype.substitute(a, b))
 
+class Constant(Atom):
+    __slots__ = ()
 
-class Combination(object):
-    def __init__(self, operator, operand):
-        if not qtype.is_fun(operator.qtype):
-            raise TypeError('operator qtype must be "fun"')
+    def _repr_pieces(self):
+        return ['Constant(%r, %r)' % (self.name, self.qtype)]
 
-        if operator.qtype.args[0] != operand.qtype:
-            raise TypeError('operand type must match operator argument type')
-        
-        self._operator = operator
-        self._operand = operand
+    def _substitute_types(self, mapping):
+        return Constant(self.name, self.qtype.substitute_all(mapping))
+
+
+class Variable(Atom):
+    __slots__ = ()
+
+    def _repr_pieces(self):
+        return ['Variable(%r, %r)' % (self.name, self.qtype)]
+
+    def _own_free_variables(self):
+        return frozenset([self])
+
+    def _substitute_types(self, mapping):
+        return Variable(self.name, self.qtype.substitute_all(mapping))
+
+
+class Combination(Term):
+    __slots__ = ('_operator', '_operand')
+
+    def __new__(cls, operator, operand):
+        key = (cls, id(operator), id(operand))
+        combination = _terms.get(key)
+        if combination is None:
+            if not qtype.is_fun(operator.qtype):
+                raise TypeError('operator qtype must be "fun"')
+
+            if operator.qtype.args[0] != operand.qtype:
+                raise TypeError('operand type must match operator argument type')
+
+            combination = object.__new__(cls)
+            combination._init(
+                _operator=operator,
+                _operand=operand,
+                _qtype=operator.qtype.args[1],
+                _hash=hash((cls, operator._hash, operand._hash)),
+                _size=1 + operator._size + operand._size,
+                _depth=1 + max(operator._depth, operand._depth),
+                _normal=(operator._normal and operand._normal
+                         and not isinstance(operator, Abstraction)),
+                _atoms=_union(operator._atoms, operand._atoms),
+                _free_variables=_union(operator._free_variables,
+                                       operand._free_variables),
+                _type_variables=_union(operator._type_variables,
+                                       operand._type_variables))
+            combination = _intern(key, combination)
+        return combination
 
     @property
     def operator(self):
@@ -126,42 +355,42 @@ class Combination(object):
     def operand(self):
         return self._operand
 
-    @property
-    def qtype(self):
-        return self.operator.qtype.args[1]
-
-    def __repr__(self):
-        return 'Combination(%r, %r)' % (self.operator, self.operand)
-
-    def __eq__(self, other):
-        return (self.__class__ == other.__class__
-                and self.operator == other.operator
-                and self.operand == other.operand)
-
-    def __ne__(self, other):
-        return not self == other
-
-    def __hash__(self):
-        return hash(self.__class__) ^ hash(self.operator) ^ hash(self.operand)
-
-    def atoms(self):
-        return self.operator.atoms() | self.operand.atoms()
-
-    def free_variables(self):
-        return self.operator.free_variables() | self.operand.free_variables()
-
-    def substitute_type(self, a, b):
-        return Combination(self.operator.substitute_type(a, b),
-                           self.operand.substitute_type(a, b))    
-
-
-class Abstraction(object):
-    def __init__(self, bound, body):
-        if not is_variable(bound):
-            raise TypeError('bound terms must be variables')
-
-        self._bound = bound
-        self._body = body
+    def _repr_pieces(self):
+        return ['Combination(', self.operator, ', ', self.operand, ')']
+
+    def __reduce__(self):
+        return (Combination, (self._operator, self._operand))
+
+
+class Abstraction(Term):
+    __slots__ = ('_bound', '_body')
+
+    def __new__(cls, bound, body):
+        key = (cls, id(bound), id(body))
+        abstraction = _terms.get(key)
+        if abstraction is None:
+            if not is_variable(bound):
+                raise TypeError('bound terms must be variables')
+
+            free_variables = body._free_variables
+            if bound in free_variables:
+                free_variables = free_variables - bound._atoms
+
+            abstraction = object.__new__(cls)
+            abstraction._init(
+                _bound=bound,
+                _body=body,
+                _qtype=qtype.qfun(bound.qtype, body.qtype),
+                _hash=hash((cls, bound._hash, body._hash)),
+                _size=1 + bound._size + body._size,
+                _depth=1 + body._depth,
+                _normal=body._normal,
+                _atoms=_union(body._atoms, bound._atoms),
+                _free_variables=free_variables,
+                _type_variables=_union(body._type_variables,
+                                       bound._type_variables))
+            abstraction = _intern(key, abstraction)
+        return abstraction
 
     @property
     def bound(self):
@@ -171,31 +400,9 @@ class Abstraction(object):
     def body(self):
         return self._body
 
-    @property
-    def qtype(self):
-        return qtype.qfun(self.bound.qtype, self.body.qtype)
-
-    def __repr__(self):
-        return 'Abstraction(%r, %r)' % (self.bound, self.body)
-
-    def __eq__(self, other):
-        return (self.__class__ == other.__class__
-                and self.bound == other.bound
-                and self.body == other.body)
-
-    def __ne__(self, other):
-        return not self == other
+    def _repr_pieces(self):
+        return ['Abstraction(', self.bound, ', ', self.body, ')']
 
-    def __hash__(self):
-        return hash(self.__class__) ^ hash(self.bound) ^ hash(self.body)
-
-    def atoms(self):
-        return self.body.atoms() | set([self.bound])
-
-    def free_variables(self):
-        return self.body.free_variables() - set([self.bound])
-
-    def substitute_type(self, a, b):
-        return Abstraction(self.bound.substitute_type(a, b),
-                           self.body.substitute_type(a, b))
+    def __reduce__(self):
+        return (Abstraction, (self._bound, self._body))
 
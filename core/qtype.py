@@ -1,6 +1,9 @@
+import itertools
+
 class Atom(object):
     def __init__(self, name):
         self._name = name
+        self._hash = hash(self.__class__) ^ hash(name)
 
     def __repr__(self):
         return self.name
@@ -13,7 +16,7 @@ class Atom(object):
         return not self == other
 
     def __hash__(self):
-        return hash(self.__class__) ^ hash(self.name)
+        return self._hash
 
     @property
     def name(self):
@@ -29,14 +32,21 @@ class Variable(Atom):
         else:
             return self
 
+    def substitute_all(self, mapping):
+        return mapping.get(self, self)
+
 class Constant(Atom):
     def substitute(self, a, b):
         return self
 
+    def substitute_all(self, mapping):
+        return self
+
 class Polymorphic(object):
     def __init__(self, name, args):
         self._name = name
         self._args = tuple(args)
+        self._hash = hash(self.__class__) ^ hash(name) ^ hash(self._args)
 
     def __repr__(self):
         if self.name == 'fun':
@@ -52,7 +62,7 @@ class Polymorphic(object):
         return not self == other
 
     def __hash__(self):
-        return hash(self.__class__) ^ hash(self.name) ^ hash(self.args)
+        return self._hash
 
     @property
     def name(self):
@@ -75,6 +85,14 @@ class Polymorphic(object):
         else:
             return self
 
+    def substitute_all(self, mapping):
+        '''Substitute mapping[key] for every variable key at once.'''
+        args = [arg.substitute_all(mapping) for arg in self.args]
+        for arg, old in zip(args, self.args):
+            if arg is not old:
+                return Polymorphic(self.name, args)
+        return self
+
         
 def qobj():
     return Constant('obj')
@@ -85,12 +103,19 @@ def qbool():
 def qfun(a, b):
     return Polymorphic('fun', [a, b])
 
-_variable_index = 0
+# count() is atomic, so threads never get the same variable
+_variable_index = itertools.count()
+_variable_prefix = '?v'
 def qvar():
-    global _variable_index
-    index = _variable_index
-    _variable_index += 1
-    return Variable('?v%d' % index)
+    return Variable('%s%d' % (_variable_prefix, _variable_index.next()))
+
+def separate_variables(tag):
+    '''Name the type variables made from now on apart from those of
+    every process which does not use tag. A forked process starts its
+    count where its parent's stood at the fork, so without this its
+    variables clash with the ones its parent made since.'''
+    global _variable_prefix
+    _variable_prefix = '?v%s.' % tag
 
 
 def is_atom(qtype):
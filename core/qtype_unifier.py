@@ -1,9 +1,10 @@
-from cheqed.core.unification import Unifier
-from cheqed.core.qtype import is_variable, is_polymorphic
+from cheqed.core.unification import Unifier, UnificationError
+from cheqed.core.qtype import is_variable, is_polymorphic, Polymorphic
 
 class TypeUnifier:
     def __init__(self):
         self.unifier = Unifier(is_variable, lambda x, y: x in y.atoms())
+        self.resolved = {}
 
     def unify_many(self, types):
         rep = types[0]
@@ -11,19 +12,82 @@ class TypeUnifier:
             self.unify(types[i], rep)
 
     def unify(self, a, b):
+        # variables already unified with a type constructor are
+        # unified through it, so that its arguments can be matched
+        a = self.unifier.representative(a)
+        b = self.unifier.representative(b)
         if is_polymorphic(a) and is_polymorphic(b) and a.name == b.name:
             for arg_a, arg_b in zip(a.args, b.args):
                 self.unify(arg_a, arg_b)
         else:
+            self.resolved = {}
             self.unifier.unify(a, b)
 
+    def checkpoint(self):
+        return self.unifier.checkpoint()
+
+    def rollback(self, checkpoint):
+        self.resolved = {}
+        self.unifier.rollback(checkpoint)
+
+    def commit(self, checkpoint):
+        self.unifier.commit(checkpoint)
+
+    def try_unify(self, a, b):
+        '''Unify a and b if possible, leaving the unifier unchanged
+        otherwise. Return whether unification succeeded.'''
+        checkpoint = self.checkpoint()
+        try:
+            self.unify(a, b)
+        except UnificationError:
+            self.rollback(checkpoint)
+            return False
+        self.commit(checkpoint)
+        return True
+
     def get_substitutions(self):
         return self.unifier.get_substitutions()
 
+    def get_resolved_substitutions(self):
+        '''Return a dictionary of substitutions (value for key) in which
+        no value contains a variable that is itself substituted, so
+        that the substitutions can be applied in any order.'''
+        result = {}
+        for key in self.unifier.parents.keys():
+            if is_variable(key):
+                value = self.resolve(key)
+                if value != key:
+                    result[key] = value
+        return result
+
+    def resolve(self, qtype, resolving=()):
+        if is_polymorphic(qtype):
+            args = [self.resolve(arg, resolving) for arg in qtype.args]
+            for arg, old in zip(args, qtype.args):
+                if arg is not old:
+                    return Polymorphic(qtype.name, args)
+            return qtype
+        elif not is_variable(qtype):
+            return qtype
+
+        rep = self.unifier.representative(qtype)
+        if not is_polymorphic(rep):
+            return rep
+
+        # representatives are kept alive by the unifier, so their ids
+        # are stable keys that avoid hashing deeply nested types
+        key = id(rep)
+        try:
+            return self.resolved[key]
+        except KeyError:
+            pass
+        if key in resolving:
+            raise UnificationError('%r occurs in its own resolution' % rep)
+        self.resolved[key] = self.resolve(rep, resolving + (key,))
+        return self.resolved[key]
+
     def apply(self, qtype):
-        for key, value in self.get_substitutions().iteritems():
-            qtype = qtype.substitute(value, key)
-        return qtype
+        return self.resolve(qtype)
 
 def unify(types):
     if len(types) == 0:
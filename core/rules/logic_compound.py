@@ -1,14 +1,40 @@
+# helpers
+def equations(goal, start=0):
+    return [i for i in goal.left.with_head('=') if i >= start]
+
+# rules
 @compound
 def qed(goal):
-    for i, left in enumerate(goal.left):
-        for j, right in enumerate(goal.right):
-            if left == right:
-                return sequence(left_permutation(i),
-                                right_permutation(j),
-                                axiom())
-    raise Exception('qed does not apply.')
+    shared = goal.shared_formula()
+    if shared is None:
+        raise Exception('qed does not apply.')
+    i, j = shared
+    return sequence(left_permutation(i),
+                    right_permutation(j),
+                    axiom())
+
+@compound
+@applicable(lambda goal: equations(goal, 1))
+def left_rewrite(goal):
+    # rewrite the first formula on the left with the first equation
+    # after it
+    index = equations(goal, 1)[0]
+    if index == 1:
+        return left_substitution()
+    return sequence(left_permutation(index),
+                    left_permutation(1),
+                    left_substitution())
+
+@compound
+@applicable(lambda goal: goal.right and equations(goal))
+def right_rewrite(goal):
+    # rewrite the first formula on the right with the first equation
+    # on the left
+    return sequence(left_permutation(equations(goal)[0]),
+                    right_substitution())
 
 @compound
+@principal('left', 'a and b')
 def left_conjunction(goal):
     return sequence(left_expand('and'),
                     left_negation(),
@@ -18,6 +44,7 @@ def left_conjunction(goal):
                     left_permutation(1))
 
 @compound
+@principal('right', 'a and b')
 def right_conjunction(goal):
     return sequence(right_expand('and'),
                     right_negation(),
@@ -26,6 +53,7 @@ def right_conjunction(goal):
                           left_negation()))
 
 @compound
+@principal('left', 'a implies b')
 def left_implication(goal):
     return sequence(left_expand('implies'),
                     branch(left_disjunction(),
@@ -33,12 +61,14 @@ def left_implication(goal):
                            noop()))
 
 @compound
+@principal('right', 'a implies b')
 def right_implication(goal):
     return sequence(right_expand('implies'),
                     right_disjunction(),
                     right_negation())
 
 @compound
+@principal('right', 'a iff b')
 def right_bidirectional(goal):
     return sequence(right_expand('iff'),
                     branch(right_conjunction(),
@@ -46,6 +76,7 @@ def right_bidirectional(goal):
                            right_implication()))
 
 @compound
+@principal('left', 'a iff b')
 def left_bidirectional(goal):
     return sequence(left_expand('iff'),
                     left_conjunction(),
@@ -60,7 +91,7 @@ def left_bidirectional(goal):
 
 @compound
 @arg_types('term')
-@applicable(lambda goal: match(goal.right[0], 'exists x . phi'))
+@principal('right', 'exists x . phi')
 def right_existential(goal, witness):
     return sequence(right_contraction(),
                     right_expand('exists'),
@@ -71,7 +102,7 @@ def right_existential(goal, witness):
 
 @compound
 @arg_types('term')
-@applicable(lambda goal: match(goal.left[0], 'exists x . phi'))
+@principal('left', 'exists x . phi')
 def left_existential(goal, witness):
     return sequence(left_expand('exists'),
                     left_negation(),
@@ -13,7 +13,7 @@ def noop(goal):
 @primitive
 @applicable(lambda goal: False)
 def axiom(goal):
-    if goal.left[0] != goal.right[0]:
+    if not alpha_equivalent(goal.left[0], goal.right[0]):
         raise Exception('axiom does not apply: %s is not the same as %s'
                         % (goal.left[0], goal.right[0]))
     return []
@@ -25,22 +25,26 @@ def cut(goal, witness):
             sequent([witness] + goal.left, goal.right)]
 
 @primitive
+@principal('left', 'not a')
 def left_negation(goal):
     match_ = match(goal.left[0], 'not a')
     return [sequent(goal.left[1:], [match_['a']] + goal.right)]
 
 @primitive
+@principal('right', 'not a')
 def right_negation(goal):
     match_ = match(goal.right[0], 'not a')
     return [sequent([match_['a']] + goal.left, goal.right[1:])]
 
 @primitive
+@principal('left', 'a or b')
 def left_disjunction(goal):
     match_ = match(goal.left[0], 'a or b')
     return [sequent([match_['a']] + goal.left[1:], goal.right),
             sequent([match_['b']] + goal.left[1:], goal.right)]
 
 @primitive
+@principal('right', 'a or b')
 def right_disjunction(goal):
     match_ = match(goal.right[0], 'a or b')
     return [sequent(goal.left,
@@ -48,7 +52,7 @@ def right_disjunction(goal):
 
 @primitive
 @arg_types('term')
-@applicable(lambda goal: match(goal.left[0], 'for_all x . phi'))
+@principal('left', 'for_all x . phi')
 def left_universal(goal, witness):
     match_ = match(goal.left[0], 'for_all x . phi')
     return [sequent([substitute(witness, match_['x'], match_['phi'])]
@@ -57,7 +61,7 @@ def left_universal(goal, witness):
 
 @primitive
 @arg_types('term')
-@applicable(lambda goal: match(goal.right[0], 'for_all x . phi'))
+@principal('right', 'for_all x . phi')
 def right_universal(goal, witness):
     match_ = match(goal.right[0], 'for_all x . phi')
 
@@ -72,7 +76,7 @@ def right_universal(goal, witness):
 
 @primitive
 @arg_types('term')
-@applicable(lambda goal: match(goal.left[0], 'schema phi . psi'))
+@principal('left', 'schema phi . psi')
 def left_schema(goal, witness):
     match_ = match(goal.left[0], 'schema phi . psi')
     return [sequent([substitute(witness, match_['phi'], match_['psi'])]
@@ -80,6 +84,7 @@ def left_schema(goal, witness):
                     goal.right)]
 
 @primitive
+@principal('left', 'a = b', 1)
 def left_substitution(goal):
     match_ = match(goal.left[1], 'a = b')
     return [sequent(([substitute(match_['b'], match_['a'], goal.left[0])]
@@ -87,6 +92,7 @@ def left_substitution(goal):
                     goal.right)]
 
 @primitive
+@principal('left', 'a = b')
 def right_substitution(goal):
     match_ = match(goal.left[0], 'a = b')
     return [sequent(goal.left,
@@ -94,6 +100,7 @@ def right_substitution(goal):
                      + goal.right[1:]))]
 
 @primitive
+@principal('left', 'a = b')
 def left_symmetry(goal):
     match_ = match(goal.left[0], 'a = b')
     equals = goal.left[0].operator.operator
@@ -102,6 +109,7 @@ def left_symmetry(goal):
                     goal.right)]
 
 @primitive
+@principal('right', 'a = b')
 def right_symmetry(goal):
     match_ = match(goal.right[0], 'a = b')
     equals = goal.right[0].operator.operator
@@ -1,6 +1,6 @@
 @compound
 @arg_types('term')
-@applicable(lambda goal: match(goal.right[0], 'a = b'))
+@principal('right', 'a = b')
 def right_extension(goal, witness):
     match_ = match(goal.right[0], 'a = b')
     return sequence(theorem_cut('set.extensionality'),
@@ -19,7 +19,7 @@ def right_extension(goal, witness):
 
 @compound
 @arg_types('term')
-@applicable(lambda goal: match(goal.left[0], 'a subset b'))
+@principal('left', 'a subset b')
 def left_subset(goal, witness):
     return sequence(left_expand('subset'),
                     left_universal(witness),
@@ -29,13 +29,14 @@ def left_subset(goal, witness):
 
 @compound
 @arg_types('term')
-@applicable(lambda goal: match(goal.right[0], 'a subset b'))
+@principal('right', 'a subset b')
 def right_subset(goal, witness):
     return sequence(right_expand('subset'),
                     right_universal(witness),
                     right_implication())
 
 @compound
+@principal('left', 'a in powerset(b)')
 def left_powerset(goal):
     match_ = match(goal.left[0], 'a in powerset(b)')
     return sequence(theorem_cut('set.powerset'),
@@ -50,6 +51,7 @@ def left_powerset(goal):
                            left_weakening()))
 
 @compound
+@principal('right', 'a in powerset(b)')
 def right_powerset(goal):
     match_ = match(goal.right[0], 'a in powerset(b)')
     return sequence(theorem_cut('set.powerset'),
@@ -64,7 +66,7 @@ def right_powerset(goal):
                            axiom()))
 
 @compound
-@applicable(lambda goal: match(goal.right[0], 'x in separation(X, phi)'))
+@principal('right', 'x in separation(X, phi)')
 def right_separation(goal):
     match_ = match(goal.right[0], 'x in separation(X, phi)')
     return sequence(theorem_cut('set.separation'),
@@ -88,7 +90,7 @@ def right_separation(goal):
                            axiom()))
 
 @compound
-@applicable(lambda goal: match(goal.left[0], 'x in separation(X, phi)'))
+@principal('left', 'x in separation(X, phi)')
 def left_separation(goal):
     match_ = match(goal.left[0], 'x in separation(X, phi)')
     return sequence(theorem_cut('set.separation'),
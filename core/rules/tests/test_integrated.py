@@ -1,4 +1,4 @@
-from nose.tools import assert_equal
+from nose.tools import assert_equal, assert_raises
 
 from cheqed.core import environment, trace, sequent
 
@@ -41,3 +41,44 @@ class TestRules:
         goal = [sequent.Sequent([], [self.env.parse('a:bool')]),
                 sequent.Sequent([], [self.env.parse('b:bool')])]
         assert_equal(result, goal)
+
+    def test_theorem_up_to_alpha_equivalence(self):
+        term = self.env.parse(r'for_all a . for_all b . '
+                              r'(b in powerset(a)) iff (b subset a)')
+        rule = self.env.rules['theorem']()
+        assert_equal(rule.evaluate(sequent.Sequent([], [term])), [])
+
+    def test_axiom_up_to_alpha_equivalence(self):
+        seq = sequent.Sequent([self.env.parse('for_all x . x in c')],
+                              [self.env.parse('for_all y . y in c')])
+        rule = self.env.rules['axiom']()
+        assert_equal(rule.evaluate(seq), [])
+
+    def test_qed(self):
+        a, b, c = [self.env.parse(name + ':bool') for name in 'abc']
+        seq = sequent.Sequent([a, b], [c, b])
+        rule = self.env.rules['qed']()
+        assert_equal(rule.evaluate(seq), [])
+        assert_raises(Exception, rule.evaluate, sequent.Sequent([a], [c]))
+
+    def test_left_rewrite(self):
+        seq = sequent.Sequent([self.env.parse('x in c'),
+                               self.env.parse('p:bool'),
+                               self.env.parse('x:obj = y')],
+                              [])
+        rule = self.env.rules['left_rewrite']()
+        assert_equal(rule.evaluate(seq),
+                     [sequent.Sequent([self.env.parse('y:obj in c'),
+                                       self.env.parse('x:obj = y'),
+                                       self.env.parse('p:bool')],
+                                      [])])
+
+    def test_right_rewrite(self):
+        seq = sequent.Sequent([self.env.parse('p:bool'),
+                               self.env.parse('x:obj = y')],
+                              [self.env.parse('x in c')])
+        rule = self.env.rules['right_rewrite']()
+        assert_equal(rule.evaluate(seq),
+                     [sequent.Sequent([self.env.parse('x:obj = y'),
+                                       self.env.parse('p:bool')],
+                                      [self.env.parse('y:obj in c')])])
@@ -1,11 +1,241 @@
+'''Sequents, and the persistent sequences of formulas on their sides.
+
+The rules build each new goal from the formulas of the old one, mostly
+by taking the tail of a side or adding a formula in front of it. The
+sides are therefore immutable linked lists: taking a tail or adding a
+formula costs one cell, and the rest is shared with the parent goal.
+
+Each cell also remembers the types of the free variables in its
+formulas, computed once from the cell behind it. A goal whose formulas
+are all typed and agree on those types needs no type inference, so
+only goals with new, unfinished or disagreeing formulas pay for it.
+
+Rules which look for a formula anywhere on a side, rather than at a
+fixed position, ask the side's index: made when first asked for, it
+maps the nameless form of each formula, and the name of the atom at
+its head, to where they occur.
+'''
+
+import collections
+
 from cheqed.core import qterm
-from cheqed.core.term_type_unifier import unify_types
+from cheqed.core.nameless import nameless
+from cheqed.core.type_inference import infer_all
+
+_unknown = object()
+
+class Formulas(object):
+    '''An immutable sequence of formulas which behaves like a list: it
+    can be indexed, sliced, iterated over and added to lists.'''
+
+    __slots__ = ('_head', '_tail', '_length', '_hash', '_context', '_index')
+
+    def __init__(self, head=None, tail=None):
+        if tail is None:
+            self._head = None
+            self._tail = None
+            self._length = 0
+            self._hash = 0
+            self._context = {}
+            self._index = None
+        else:
+            self._head = head
+            self._tail = tail
+            self._length = tail._length + 1
+            self._hash = hash((head, tail._hash))
+            self._context = _unknown
+            self._index = None
+
+    @staticmethod
+    def from_sequence(formulas):
+        if isinstance(formulas, Formulas):
+            return formulas
+        return empty.extend(formulas)
+
+    def cons(self, formula):
+        '''Return the formulas with formula in front.'''
+        return Formulas(formula, self)
+
+    def extend(self, formulas):
+        '''Return the formulas with formulas in front, in order.'''
+        result = self
+        for formula in reversed(list(formulas)):
+            result = Formulas(formula, result)
+        return result
+
+    def drop(self, count):
+        '''Return the formulas after the first count of them.'''
+        cell = self
+        while count > 0 and cell._length:
+            cell = cell._tail
+            count -= 1
+        return cell
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        cell = self
+        while cell._length:
+            yield cell._head
+            cell = cell._tail
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step != 1:
+                return empty.extend(list(self)[index])
+            if stop <= start:
+                return empty
+            rest = self.drop(start)
+            if stop == self._length:
+                return rest
+            return empty.extend(_take(rest, stop - start))
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('formula index out of range')
+        return self.drop(index)._head
+
+    def __add__(self, other):
+        return Formulas.from_sequence(other).extend(self)
+
+    def __radd__(self, other):
+        return self.extend(other)
+
+    def __eq__(self, other):
+        if isinstance(other, Formulas):
+            if self._length != other._length or self._hash != other._hash:
+                return False
+            a, b = self, other
+            while a is not b:
+                if a._head != b._head:
+                    return False
+                a, b = a._tail, b._tail
+            return True
+        elif isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def context(self):
+        '''Return a dictionary from the names of the free variables of
+        the formulas to their types, or None if some formula is not a
+        finished term or two variables of the same name differ in type.
+        '''
+        if self._context is not _unknown:
+            return self._context
+
+        # find the nearest cell that knows its context, then fill in
+        # the cells in front of it
+        cells = []
+        cell = self
+        while cell._context is _unknown:
+            cells.append(cell)
+            cell = cell._tail
+        context = cell._context
+        for cell in reversed(cells):
+            if context is not None:
+                context = _add_context(context, cell._head)
+            cell._context = context
+        return context
+
+    def position(self, formula):
+        '''Return the position of the first formula alpha-equivalent to
+        formula, or None if there is none.'''
+        return self._indexes()[0].get(nameless(formula))
+
+    def with_head(self, name):
+        '''Return the positions of the formulas whose head is an atom
+        called name, such as '=' for equations, in order.'''
+        return list(self._indexes()[1].get(name, ()))
+
+    def _indexes(self):
+        if self._index is None:
+            forms = {}
+            heads = {}
+            for i, formula in enumerate(self):
+                forms.setdefault(nameless(formula), i)
+                head = qterm.spine(formula)[0]
+                if qterm.is_atom(head):
+                    heads.setdefault(head.name, []).append(i)
+            self._index = (forms, heads)
+        return self._index
+
+def _take(formulas, count):
+    result = []
+    for formula in formulas:
+        if len(result) == count:
+            break
+        result.append(formula)
+    return result
+
+def _add_context(context, formula):
+    '''Return context with the free variables of formula added, without
+    changing context, or None if they disagree with it.'''
+    if not qterm.is_term(formula):
+        return None
+    added = None
+    for variable in formula.free_variables():
+        qtype_ = context.get(variable.name)
+        if qtype_ is None:
+            if added is None:
+                added = dict(context)
+            qtype_ = added.setdefault(variable.name, variable.qtype)
+        if qtype_ != variable.qtype:
+            return None
+    if added is None:
+        return context
+    return added
+
+def _agree(a, b):
+    if len(b) < len(a):
+        a, b = b, a
+    for name, qtype_ in a.iteritems():
+        if b.get(name, qtype_) != qtype_:
+            return False
+    return True
+
+empty = Formulas()
+
+def _multiset(formulas):
+    return frozenset(collections.Counter(nameless(formula)
+                                         for formula in formulas).iteritems())
 
 class Sequent(object):
-    def __init__(self, left=[], right=[]):
-        self._left, self._right = self.infer_types(left[:], right[:])
-        self._left = list(self._left)
-        self._right = list(self._right)
+    '''A goal: the formulas on the left entail one on the right.
+
+    Sequents are immutable and hashable. Two sequents are equal when
+    their sides hold the same formulas in the same order; canonical()
+    gives a key which ignores the order, and the names of bound
+    variables, for when the difference does not matter.
+    '''
+
+    def __init__(self, left=(), right=()):
+        left = Formulas.from_sequence(left)
+        right = Formulas.from_sequence(right)
+        left_context = left.context()
+        right_context = right.context()
+        if (left_context is None or right_context is None
+            or not _agree(left_context, right_context)):
+            left, right = self.infer_types(list(left), list(right))
+            left = empty.extend(left)
+            right = empty.extend(right)
+        self._left = left
+        self._right = right
+        self._hash = hash((left._hash, right._hash))
+        self._canonical = None
 
     @property
     def left(self):
@@ -17,9 +247,12 @@ class Sequent(object):
 
     @staticmethod
     def infer_types(left, right):
+        '''Infer types across every formula at once, so that free
+        variables with the same name have the same type. The formulas
+        may be unfinished terms from term_builder.deferred.'''
         all = left + right
-        if len(all) > 1:
-            all = unify_types(all)
+        if all:
+            all = infer_all(all)
             left = all[:len(left)]
             right = all[len(left):]
         return left, right
@@ -29,11 +262,39 @@ class Sequent(object):
 
     def __eq__(self, other):
         return (self.__class__ == other.__class__
+                and self._hash == other._hash
                 and self.left == other.left
                 and self.right == other.right)
 
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return self._hash
+
+    def canonical(self):
+        '''Return a key for the sequent which treats each side as a
+        multiset of formulas up to alpha-equivalence.'''
+        if self._canonical is None:
+            self._canonical = (_multiset(self.left), _multiset(self.right))
+        return self._canonical
+
+    def shared_formula(self):
+        '''Return the positions (i, j) of a formula on the left and an
+        alpha-equivalent one on the right, with i as small as it can be
+        and then j, or None if the sides share no formula.'''
+        if not self.left or not self.right:
+            return None
+        for i, formula in enumerate(self.left):
+            j = self.right.position(formula)
+            if j is not None:
+                return i, j
+        return None
+
     def free_variables(self):
         free = set()
-        for term in self.left + self.right:
+        for term in self.left:
+            free.update(term.free_variables())
+        for term in self.right:
             free.update(term.free_variables())
         return free
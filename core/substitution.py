@@ -1,63 +1,265 @@
 from cheqed.core import qterm
-from cheqed.core.term_builder import TypeInferringTermBuilder
+from cheqed.core import term_builder as builders
+from cheqed.core.traversal import fold
+from cheqed.core.qtype_unifier import TypeUnifier
+from cheqed.core.type_inference import PreAbstraction
+from cheqed.core.unification import UnificationError
 
 def beta_reduce(term):
     if not qterm.is_combination(term):
         return term
-    
+
     if qterm.is_abstraction(term.operator):
         return substitute(term.operand, term.operator.bound, term.operator.body)
     return term
 
+def reduce_spine(head, args):
+    '''Apply head to the list of args, contracting redexes at the head.
+
+    A curried abstraction applied to several arguments is instantiated
+    in one simultaneous substitution.
+    '''
+    args = list(args)
+    args.reverse()
+    while args and qterm.is_abstraction(head):
+        mapping = {}
+        while args and qterm.is_abstraction(head):
+            mapping[head.bound] = args.pop()
+            head = head.body
+        head = substitute_many(mapping, head)
+    while args:
+        head = qterm.Combination(head, args.pop())
+    return head
+
+def contract(term, patterns):
+    '''Beta reduce the redexes in term, except under binders for
+    patterns.'''
+    def parts(term):
+        if term.is_normal():
+            return ()
+        elif qterm.is_combination(term):
+            head, args = qterm.spine(term)
+            return [head] + args
+        elif qterm.is_abstraction(term) and term.bound not in patterns:
+            return (term.body,)
+        return ()
+
+    def combine(term, parts):
+        if not parts:
+            return term
+        elif qterm.is_combination(term):
+            head, args = qterm.spine(term)
+            new_head, new_args = parts[0], parts[1:]
+            if (new_head is head and not qterm.is_abstraction(head)
+                and all(new is old for new, old in zip(new_args, args))):
+                return term
+            return reduce_spine(new_head, new_args)
+        else:
+            return qterm.rebuild(term, (term.bound, parts[0]))
+
+    return fold(term, parts, combine)
+
+def occurs(pattern, term):
+    if qterm.is_variable(pattern):
+        return pattern in term.free_variables()
+    return pattern in term.atoms()
+
+def fresh_name(name, avoid):
+    new_name = name
+    i = 1
+    while new_name in avoid:
+        new_name = name + str(i)
+        i += 1
+    return new_name
+
 
 class Substitution:
-    def __init__(self, value, pattern, term_builder=TypeInferringTermBuilder()):
-        self.value = value
-        self.pattern = pattern
+    '''Substitute mapping[pattern] for every free occurrence of each
+    pattern in a term, simultaneously.
+
+    The result is built with term_builder and its types are inferred
+    once, when the whole term has been built. Substituting may create
+    redexes, which are then reduced.
+
+    The term is walked with traversal.fold, visiting each subterm
+    together with the mapping that applies beneath the binders above
+    it, so a subterm shared under the same mapping is substituted once.
+    '''
+
+    def __init__(self, mapping, term_builder=builders.deferred):
+        self.mapping = mapping
         self.term_builder = term_builder
+        self.redexes = False
+        self.mappings = {}
+        self.binders = {}
 
-    def apply_to_atom(self, atom):
-        if atom == self.pattern:
-            return self.value
-        else:
-            return atom
+    def key(self, mapping):
+        key = frozenset(mapping.iteritems())
+        self.mappings.setdefault(key, mapping)
+        return key
 
-    def apply_to_combination(self, combination):
-        operator = self.apply_to_term(combination.operator)
-        operand = self.apply_to_term(combination.operand)
-        combination = self.term_builder.build_combination(operator, operand)
-        return beta_reduce(combination)
+    def skips(self, term, mapping):
+        '''Return whether term may be left as it is.'''
+        return False
 
-    def apply_to_abstraction(self, abstraction):
-        if abstraction.bound in self.pattern.free_variables():
-            return abstraction
+    def apply_to_atom(self, atom, mapping):
+        return mapping.get(atom, atom)
 
+    def apply_to_combination(self, combination, operator, operand):
+        if qterm.is_abstraction(operator) or isinstance(operator, PreAbstraction):
+            self.redexes = True
+        return self.term_builder.build_combination(operator, operand)
+
+    def enter_abstraction(self, abstraction, mapping):
+        '''Return the bound variable of the result and the mapping for
+        the body, or None if the abstraction is left as it is.'''
         bound = abstraction.bound
         body = abstraction.body
-        a_names = set([var.name for var in self.value.free_variables()])
-        if bound.name in a_names:
-            names = set([var.name for var in body.atoms()]) \
-                | a_names
-            new_name = bound.name
-            i = 1
-            while new_name in names:
-                new_name = bound.name + str(i)
-                i += 1
-            new_bound = self.term_builder.build_variable(new_name, bound.qtype)
-            body = substitute(new_bound, bound, body)
+        if bound in mapping:
+            mapping = dict(mapping)
+            del mapping[bound]
+
+        live = [pattern for pattern in mapping if occurs(pattern, body)]
+        if not live:
+            return None
+
+        names = set()
+        for pattern in live:
+            names.update(var.name for var in mapping[pattern].free_variables())
+        if bound.name in names:
+            # rename the bound variable in the same pass
+            names.update(var.name for var in body.atoms())
+            new_bound = self.term_builder.build_variable(
+                fresh_name(bound.name, names), bound.qtype)
+            mapping = dict(mapping)
+            mapping[bound] = new_bound
             bound = new_bound
-        body = substitute(self.value, self.pattern, body)
+        return bound, mapping
+
+    def apply_to_abstraction(self, abstraction, bound, body):
         return self.term_builder.build_abstraction(bound, body)
 
-    def apply_to_term(self, term):
-        if qterm.is_atom(term):
-            return self.apply_to_atom(term)
+    def parts(self, item):
+        term, key = item
+        mapping = self.mappings[key]
+        if qterm.is_atom(term) or self.skips(term, mapping):
+            return ()
         elif qterm.is_combination(term):
-            return self.apply_to_combination(term)
+            return ((term.operator, key), (term.operand, key))
         elif qterm.is_abstraction(term):
-            return self.apply_to_abstraction(term)
+            entered = self.enter_abstraction(term, mapping)
+            if entered is None:
+                return ()
+            bound, mapping = entered
+            self.binders[item] = bound
+            return ((term.body, self.key(mapping)),)
         else:
             raise Exception('unrecognized term')
 
+    def combine(self, item, results):
+        term, key = item
+        if qterm.is_atom(term):
+            return self.apply_to_atom(term, self.mappings[key])
+        elif not results:
+            return term
+        elif qterm.is_combination(term):
+            return self.apply_to_combination(term, *results)
+        else:
+            return self.apply_to_abstraction(term, self.binders.pop(item),
+                                             results[0])
+
+    def apply_to_term(self, term, mapping):
+        return fold((term, self.key(mapping)), self.parts, self.combine)
+
+    def apply(self, term):
+        result = self.term_builder.finish(self.apply_to_term(term, self.mapping))
+        if self.redexes:
+            result = contract(result, self.mapping)
+        return result
+
+
+class KernelSubstitution(Substitution):
+    '''Substitute without inferring types.
+
+    Only the paths to occurrences of the patterns are rebuilt; every
+    other subterm is reused as it is. This is only sound when each
+    value has the type of its pattern and the free variables of the
+    values agree in type with the free variables of the same name in
+    the term, as checked by is_trusted.
+    '''
+
+    def __init__(self, mapping):
+        Substitution.__init__(self, mapping, builders.kernel)
+
+    def skips(self, term, mapping):
+        for pattern in mapping:
+            if occurs(pattern, term):
+                return False
+        return True
+
+def is_trusted(mapping, term):
+    '''Return whether substituting mapping in term needs no type
+    inference.'''
+    types = {}
+    for pattern, value in mapping.iteritems():
+        if value.qtype != pattern.qtype:
+            return False
+        for var in value.free_variables():
+            if types.setdefault(var.name, var.qtype) != var.qtype:
+                return False
+    if not types:
+        return True
+    for var in term.free_variables():
+        if types.get(var.name, var.qtype) != var.qtype:
+            return False
+    return True
+
+def specialize(value, pattern, fixed):
+    '''Instantiate the type variables of value so that its type is that
+    of pattern, if that binds none of the type variables fixed.
+    Otherwise return value unchanged.'''
+    if value.qtype == pattern.qtype or not value.type_variables():
+        return value
+    unifier = TypeUnifier()
+    try:
+        unifier.unify(value.qtype, pattern.qtype)
+        substitutions = unifier.get_resolved_substitutions()
+    except UnificationError:
+        return value
+    for var in substitutions:
+        if var in fixed:
+            return value
+    return value.substitute_types(substitutions)
+
+def specialize_all(mapping, term):
+    '''Specialize each value in mapping to the type of its pattern,
+    leaving the type variables of term, of the patterns and of the
+    other values alone.'''
+    if len(mapping) == 1:
+        [(pattern, value)] = mapping.items()
+        fixed = term.type_variables() | pattern.type_variables()
+        return {pattern: specialize(value, pattern, fixed)}
+
+    fixed = set(term.type_variables())
+    for pattern in mapping:
+        fixed.update(pattern.type_variables())
+    result = {}
+    for pattern, value in mapping.iteritems():
+        others = set(fixed)
+        for other in mapping.itervalues():
+            if other is not value:
+                others.update(other.type_variables())
+        result[pattern] = specialize(value, pattern, others)
+    return result
+
+def substitute_many(mapping, term):
+    '''Substitute mapping[pattern] for each pattern in term at once.'''
+    if not mapping:
+        return term
+    mapping = specialize_all(mapping, term)
+    if is_trusted(mapping, term):
+        return KernelSubstitution(mapping).apply(term)
+    return Substitution(mapping).apply(term)
+
 def substitute(value, pattern, term):
-    return Substitution(value, pattern).apply_to_term(term)
+    return substitute_many({pattern: value}, term)
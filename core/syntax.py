@@ -9,18 +9,28 @@ class Operator(object):
         self.associativity = associativity
         self.precedence = precedence
 
+    def signature(self):
+        return ('operator', self.name, self.token, self.arity,
+                self.associativity, self.precedence)
+
 class Binder(object):
     def __init__(self, constant):
         self.name = constant.name
         self.token = self.name.upper()
         self.constant = constant
 
+    def signature(self):
+        return ('binder', self.name, self.token)
+
 class Type(object):
     def __init__(self, constructor, name):
         self.name = name
         self.token = self.name.upper()
         self.constructor = constructor
-        
+
+    def signature(self):
+        return ('type', self.name, self.token)
+
 class Syntax(object):
     def __init__(self, words=[]):
         self._words = {}
@@ -57,5 +67,10 @@ class Syntax(object):
     def words(self):
         return self._words.values()
 
+    def signature(self):
+        '''Return a hashable summary of everything in the syntax that
+        affects the grammar, for use as a cache key.'''
+        return tuple(sorted(word.signature() for word in self.words()))
+
     def __getitem__(self, key):
         return self._words[key]
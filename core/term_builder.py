@@ -1,5 +1,6 @@
 from cheqed.core import qtype, qtype_unifier, qterm
 from cheqed.core.term_type_unifier import unify_types
+from cheqed.core.type_inference import ConstraintTermBuilder
 
 class DumbTermBuilder:
     def build_constant(self, name, type_):
@@ -14,6 +15,9 @@ class DumbTermBuilder:
     def build_abstraction(self, bound, body):
         return qterm.Abstraction(bound, body)
 
+    def finish(self, term):
+        return term
+
 class TypeInferringTermBuilder:
     def build_constant(self, name, type_):
         return qterm.Constant(name, type_)
@@ -32,9 +36,9 @@ class TypeInferringTermBuilder:
 
         unifier = qtype_unifier.TypeUnifier()
         unifier.unify(operator.qtype.args[0], operand.qtype)
-        for key, value in unifier.get_substitutions().iteritems():
-            operator = operator.substitute_type(value, key)
-            operand = operand.substitute_type(value, key)
+        substitutions = unifier.get_resolved_substitutions()
+        operator = operator.substitute_types(substitutions)
+        operand = operand.substitute_types(substitutions)
 
         operator, operand = unify_types([operator, operand])
 
@@ -47,6 +51,9 @@ class TypeInferringTermBuilder:
         bound, body = unify_types([bound, body])
         return qterm.Abstraction(bound, body)
 
+    def finish(self, term):
+        return term
+
 class CompoundTermBuilder:
     def __init__(self, base_term_builder):
         self.base = base_term_builder
@@ -63,6 +70,9 @@ class CompoundTermBuilder:
     def build_abstraction(self, bound, body):
         return self.base.build_abstraction(bound, body)
 
+    def finish(self, term):
+        return self.base.finish(term)
+
     def build_binary_op(self, operator, operand_0, operand_1):
         return self.base.build_combination(
             self.build_combination(operator, operand_0), operand_1)
@@ -73,6 +83,13 @@ class CompoundTermBuilder:
 
 builder = CompoundTermBuilder(TypeInferringTermBuilder())    
 
+# builds terms exactly as given, for callers that know them to be well
+# typed
+kernel = CompoundTermBuilder(DumbTermBuilder())
+
+# builds whole terms and infers their types once, in finish()
+deferred = CompoundTermBuilder(ConstraintTermBuilder())
+
 build_variable = builder.build_variable
 build_constant = builder.build_constant
 build_combination = builder.build_combination
@@ -80,3 +97,5 @@ build_abstraction = builder.build_abstraction
 
 build_binary_op = builder.build_binary_op
 build_binder = builder.build_binder
+
+finish = builder.finish
@@ -20,14 +20,16 @@ class TermTypeUnifier:
             self.unifier.unify_many([free.qtype for free in frees])
 
     def apply(self, term):
-        for key, value in self.get_substitutions().iteritems():
-            term = term.substitute_type(value, key)
-        return term
+        return term.substitute_types(self.get_resolved_substitutions())
 
     def get_substitutions(self):
         return self.unifier.get_substitutions()
 
+    def get_resolved_substitutions(self):
+        return self.unifier.get_resolved_substitutions()
+
 def unify_types(terms):
     unifier = TermTypeUnifier()
     unifier.add_terms(terms)
-    return [unifier.apply(term) for term in terms]
+    substitutions = unifier.get_resolved_substitutions()
+    return [term.substitute_types(substitutions) for term in terms]
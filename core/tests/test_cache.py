@@ -0,0 +1,33 @@
+from nose.tools import assert_equal, assert_true, assert_false
+
+from cheqed.core.cache import LRUCache
+
+def test_lru():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert_equal(cache.get('a'), 1)
+    cache.put('c', 3)
+    assert_true('a' in cache)
+    assert_false('b' in cache)
+    assert_equal(cache.get('b'), None)
+    assert_equal(len(cache), 2)
+    assert_equal(cache.stats(), {'hits': 1, 'misses': 1,
+                                 'size': 2, 'max_size': 2})
+
+def test_clear():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.get('a')
+    cache.clear()
+    assert_equal(len(cache), 0)
+    assert_equal(cache.hits, 1)
+
+def test_hit_rate():
+    cache = LRUCache(2)
+    assert_equal(cache.hit_rate(), 0.0)
+    cache.put('a', 1)
+    cache.get('a')
+    cache.get('b')
+    cache.get('a')
+    assert_equal(cache.hit_rate(), 2.0 / 3)
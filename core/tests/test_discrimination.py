@@ -0,0 +1,35 @@
+from nose.tools import assert_equal
+
+from cheqed.core import environment
+from cheqed.core.discrimination import DiscriminationTree
+
+class TestDiscriminationTree:
+    @classmethod
+    def setup_class(cls):
+        cls.env = environment.load_modules('logic', 'set')
+        cls.pt = cls.env.parse
+        cls.tree = DiscriminationTree()
+        for pattern in ['not a', 'a or b', 'not (a or b)', 'a', 'a = b',
+                        'for_all x . phi', 'x in separation(X, phi)']:
+            cls.tree.insert(cls.pt(pattern), pattern)
+
+    def retrieve(self, string):
+        return sorted(self.tree.retrieve(self.pt(string)))
+
+    def test_size(self):
+        assert_equal(len(self.tree), 7)
+
+    def test_retrieve(self):
+        assert_equal(self.retrieve('not (p or q)'),
+                     ['a', 'not (a or b)', 'not a'])
+        assert_equal(self.retrieve('not p'), ['a', 'not a'])
+        assert_equal(self.retrieve('p or not q'), ['a', 'a or b'])
+        assert_equal(self.retrieve('p:bool'), ['a'])
+        assert_equal(self.retrieve('for_all y . exists z . y = z'),
+                     ['a', 'for_all x . phi'])
+        assert_equal(self.retrieve(r'y in separation(Y, \z . z = z)'),
+                     ['a', 'x in separation(X, phi)'])
+
+    def test_types_are_not_indexed(self):
+        assert_equal(self.retrieve('(p:bool) = q'), ['a', 'a = b'])
+        assert_equal(self.retrieve('(p:obj) = q'), ['a', 'a = b'])
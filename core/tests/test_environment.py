@@ -1,6 +1,6 @@
-from nose.tools import assert_true, assert_equal
+from nose.tools import assert_true, assert_false, assert_equal, assert_raises
 
-from cheqed.core import qterm, qtype, trace
+from cheqed.core import environment, qterm, qtype, sequent, trace
 from cheqed.core.environment import Environment
 
 # test_module = r'''
@@ -38,3 +38,101 @@ def prim(goal):
     env.load_extension(rules)
     prim = env.rules['prim']
     assert_true(isinstance(prim(), trace.Primitive))
+
+def test_parse_cache():
+    env = environment.load_modules('logic')
+    misses = env.parse_cache.misses
+    first = env.parse('a:bool and b:bool')
+    assert_true(env.parse('a:bool and b:bool') is first)
+    assert_equal(env.parse_cache.misses, misses + 1)
+    assert_equal(env.parse_cache.hits, 1)
+
+def test_parse_cache_renames_type_variables():
+    env = environment.load_modules('logic')
+    first = env.parse('a = b')
+    second = env.parse('a = b')
+    assert_true(first is not second)
+    assert_true(qterm.same_up_to_type_variables(first, second))
+    assert_false(first.type_variables() & second.type_variables())
+
+def test_parse_cache_syntax_version():
+    env = environment.load_modules('logic')
+    env.add_constant('foo:bool->bool->bool')
+    assert_true(qterm.is_variable(env.parse('(foo)')))
+    env.add_operator('foo', 2, 'left', 10)
+    assert_true(qterm.is_constant(env.parse('(foo)')))
+
+def test_redefined_axiom():
+    env = environment.make_default()
+    theorem = env.rules['theorem']()
+    env.add_axiom('ax', 'p:bool')
+    env.add_axiom('ax', 'q:bool')
+    assert_equal(theorem.evaluate(sequent.Sequent([], [env.parse('q:bool')])),
+                 [])
+    assert_raises(Exception, theorem.evaluate,
+                  sequent.Sequent([], [env.parse('p:bool')]))
+
+def test_applicable_rules():
+    env = environment.make_default()
+    goal = sequent.Sequent([env.parse('not (p:bool)')], [])
+    candidates = [rule.rule_name() for rule in env.candidate_rules(goal)]
+    assert_true('left_negation' in candidates)
+    assert_false('right_negation' in candidates)
+    assert_false('left_universal' in candidates)
+
+    names = sorted(rule.rule_name() for rule in env.applicable_rules(goal))
+    assert_equal(names, ['cut', 'left_expand', 'left_negation',
+                         'right_expand', 'theorem_cut'])
+    assert_equal(env.applicable_cache.hits, 0)
+    env.applicable_rules(goal)
+    assert_equal(env.applicable_cache.hits, 1)
+
+def test_applicable_rules_invalidated():
+    env = environment.make_default()
+    goal = sequent.Sequent([env.parse('not (p:bool)')], [])
+    env.applicable_rules(goal)
+    env.load_extension('''
+@primitive
+@principal('left', 'not a')
+def drop(goal):
+    return []
+''')
+    assert_true('drop' in [rule.rule_name()
+                           for rule in env.applicable_rules(goal)])
+
+class CountingLog(trace.NullLog):
+    def __init__(self):
+        self.primitives = 0
+
+    def begin_primitive(self, primitive, goal):
+        self.primitives += 1
+
+def test_proved_cache():
+    env = environment.make_default()
+    a, b = env.parse('a:bool'), env.parse('b:bool')
+    goal = sequent.Sequent([a, b], [env.parse('a and a')])
+    rules = env.rules
+    proof = trace.branch(rules['right_conjunction'](),
+                         rules['axiom'](), rules['axiom']())
+    assert_equal(env.prove(proof, goal), [])
+    assert_true(goal.canonical() in env.proved_cache)
+
+    # the same goal, with its left side in another order, is skipped
+    log = CountingLog()
+    permuted = sequent.Sequent([b, a], goal.right)
+    assert_equal(proof.evaluate(permuted, log, env.proved_cache), [])
+    assert_equal(log.primitives, 0)
+
+    env.rules_changed()
+    assert_equal(len(env.proved_cache), 0)
+
+def test_proved_cache_needs_whole_proof():
+    env = environment.make_default()
+    goal = sequent.Sequent([env.parse('a:bool')], [env.parse('a and a')])
+    rules = env.rules
+    for proof in [trace.branch(rules['right_conjunction'](),
+                               rules['axiom'](), rules['assumption']()),
+                  trace.branch(rules['right_conjunction'](),
+                               rules['axiom']())]:
+        assert_equal(env.prove(proof, goal), [])
+        assert_false(goal.canonical() in env.proved_cache)
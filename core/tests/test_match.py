@@ -0,0 +1,61 @@
+from nose.tools import assert_equal, assert_true
+from py.test import raises
+
+from cheqed.core import environment
+from cheqed.core.benchmarks.parsing import pattern_strings
+from cheqed.core.qterm import Constant, Variable, Combination
+from cheqed.core.qtype import qobj, qfun
+from cheqed.core.match import CompiledPattern, match_term
+from cheqed.core.unification import UnificationError
+
+class TestCompiledPattern:
+    @classmethod
+    def setup_class(cls):
+        cls.env = environment.load_modules('logic', 'set')
+        cls.pt = cls.env.parse
+
+    def assert_same(self, pattern, term):
+        try:
+            expected = match_term(pattern, term)
+        except UnificationError:
+            raises(UnificationError, CompiledPattern(pattern).match, term)
+        else:
+            assert_equal(CompiledPattern(pattern).match(term), expected)
+
+    def test_same_as_match_term(self):
+        terms = [self.pt(string) for string in pattern_strings] \
+            + [self.env.axioms[name] for name in sorted(self.env.axioms)] \
+            + [self.pt('not not a'), self.pt('x:bool = y:bool'),
+               self.pt('p:bool or q:bool and r:bool')]
+        for string in pattern_strings:
+            for term in terms:
+                self.assert_same(self.pt(string), term)
+
+    def test_match(self):
+        term = self.pt(r'y:obj in separation(z:obj, \w:obj . w = z)')
+        match = self.env.match(term, 'x in separation(X, phi)')
+        assert_equal(match['x'], self.pt('y:obj'))
+        assert_equal(match['X'], self.pt('z:obj'))
+        assert_equal(match['phi'], self.pt(r'\w:obj . w = z:obj'))
+
+    def test_repeated_variables(self):
+        pattern = CompiledPattern(self.pt('a = a'))
+        assert_equal(pattern.match(self.pt('x:obj = x')),
+                     {'a': self.pt('x:obj')})
+        raises(UnificationError, pattern.match, self.pt('x:obj = y:obj'))
+
+    def test_types(self):
+        or_ = Constant('or', qfun(qobj(), qfun(qobj(), qobj())))
+        x = Variable('x', qobj())
+        pattern = CompiledPattern(self.pt('a or b'))
+        raises(UnificationError, pattern.match,
+               Combination(Combination(or_, x), x))
+        pattern = CompiledPattern(self.pt('f:?a->?a(x:?a)'))
+        raises(UnificationError, pattern.match, self.pt('g:obj->bool(y)'))
+        assert_true(pattern.match(self.pt('g:obj->obj(y)')))
+
+    def test_compiled_once(self):
+        env = environment.load_modules('logic')
+        pattern = env.compile_pattern('not a')
+        env.match(self.pt('not b:bool'), 'not a')
+        assert_true(env.compile_pattern('not a') is pattern)
@@ -0,0 +1,68 @@
+import gc
+import weakref
+
+from nose.tools import assert_true, assert_false, assert_equal, assert_raises
+
+from cheqed.core import environment, nameless, qterm
+from cheqed.core.qtype import qobj, qfun
+from cheqed.core.qterm import Variable, Constant, Abstraction, Combination
+
+def setup_module(module):
+    module.env = environment.load_modules('logic', 'set')
+    module.pt = env.parse
+
+def test_alpha_equivalence():
+    assert_true(nameless.alpha_equivalent(pt('for_all x . x in a'),
+                                          pt('for_all y . y in a')))
+    assert_false(nameless.alpha_equivalent(pt('for_all x . x in a'),
+                                           pt('for_all y . a in y')))
+    assert_false(nameless.alpha_equivalent(pt('for_all x . x in a'),
+                                           pt('for_all a . a in a')))
+    assert_true(nameless.alpha_equivalent(
+            pt('for_all x . for_all y . x in y'),
+            pt('for_all y . for_all x . y in x')))
+
+def test_nameless_form():
+    x = Variable('x', qobj())
+    a = Variable('a', qobj())
+    f = Constant('f', qfun(qobj(), qfun(qobj(), qobj())))
+    term = Abstraction(x, Combination(Combination(f, x), a))
+    node = nameless.nameless(term)
+    assert_equal(node.body.operator.operand, nameless.Bound(0))
+    assert_true(node.body.operand is a)
+    assert_equal(nameless.free_variables(node), frozenset([a]))
+    assert_equal(nameless.level(node), 0)
+
+def test_named_round_trip():
+    for string in ['for_all x . exists y . x in y',
+                   r'\x . \y . x = y',
+                   'a in b']:
+        term = pt(string)
+        assert_equal(nameless.named(nameless.nameless(term), term), term)
+
+def test_substitute_avoids_capture():
+    term = pt('for_all y . x:obj in y')
+    result = nameless.substitute(pt('y:obj'), pt('x:obj'), term)
+    assert_true(nameless.alpha_equivalent(result,
+                                          pt('for_all z . y:obj in z')))
+    assert_equal(result.operand.bound.name, 'y1')
+
+def test_substitute_checks_types():
+    assert_raises(TypeError, nameless.substitute,
+                  pt('y:bool'), pt('x:obj'), pt('x:obj'))
+
+def test_instantiate():
+    abstraction = pt(r'\x . for_all y . x in y')
+    result = nameless.instantiate(abstraction, pt('y:obj'))
+    assert_true(nameless.alpha_equivalent(result,
+                                          pt('for_all z . y:obj in z')))
+
+def test_cache_keeps_no_terms_alive():
+    x = Variable('x', qobj())
+    y = Variable('kept_alive', qobj())
+    nameless.nameless(y)
+    nameless.nameless(Abstraction(x, y))
+    alive = weakref.ref(y)
+    del y
+    gc.collect()
+    assert_true(alive() is None)
@@ -0,0 +1,74 @@
+import gc
+import weakref
+
+from nose.tools import assert_true, assert_false, assert_equal
+
+from cheqed.core import environment, qterm
+from cheqed.core.normalize import normalize
+from cheqed.core.qtype import qobj, qfun, qbool
+from cheqed.core.qterm import Abstraction, Combination, Variable
+
+class TestNormalize:
+    @classmethod
+    def setup_class(cls):
+        cls.env = environment.load_modules('logic')
+        cls.pt = cls.env.parse
+        cls.x = Variable('x', qobj())
+        cls.y = Variable('y', qobj())
+        cls.p = Variable('p', qfun(qobj(), qbool()))
+
+    def test_normal_flag(self):
+        px = Combination(self.p, self.x)
+        redex = Combination(Abstraction(self.x, px), self.y)
+        assert_true(px.is_normal())
+        assert_false(redex.is_normal())
+        assert_false(Abstraction(self.y, redex).is_normal())
+
+    def test_normal_terms_are_returned(self):
+        term = self.pt(r'for_all x . (p:obj->bool)(x)')
+        assert_true(normalize(term) is term)
+
+    def test_nested_redexes(self):
+        px = Combination(self.p, self.x)
+        inner = Combination(Abstraction(self.x, px), self.y)
+        outer = Combination(Abstraction(self.y, inner), self.x)
+        term = Abstraction(self.x, Combination(Combination(
+                    self.pt('(and)'), outer), inner))
+        expected = self.pt(r'\x:obj . (p:obj->bool)(x) and p(y:obj)')
+        assert_equal(normalize(term), expected)
+        assert_true(normalize(term) is normalize(term))
+
+    def test_curried(self):
+        f = Variable('f', qfun(qobj(), qfun(qobj(), qbool())))
+        body = Combination(Combination(f, self.y), self.x)
+        value = Abstraction(self.x, Abstraction(self.y, body))
+        term = Combination(Combination(value, self.y), self.x)
+        assert_equal(normalize(term), Combination(Combination(f, self.x),
+                                                  self.y))
+
+    def test_eta(self):
+        term = Abstraction(self.x, Combination(self.p, self.x))
+        assert_true(normalize(term) is term)
+        assert_true(normalize(term, eta=True) is self.p)
+
+        f = Variable('f', qfun(qobj(), qfun(qobj(), qbool())))
+        term = Abstraction(self.y, Abstraction(
+                self.x, Combination(Combination(f, self.y), self.x)))
+        assert_true(normalize(term, eta=True) is f)
+
+    def test_expand_definition(self):
+        term = self.pt('(a:bool) iff (b:bool)')
+        expanded = environment.expand_definition(
+            term, self.env.definitions['iff'])
+        assert_true(expanded.is_normal())
+        assert_equal(expanded, self.pt('(a:bool implies b:bool)'
+                                       ' and (b implies a)'))
+
+    def test_cache_keeps_no_terms_alive(self):
+        x = Variable('x', qbool())
+        y = Variable('kept_alive', qbool())
+        assert_true(normalize(Combination(Abstraction(x, x), y)) is y)
+        alive = weakref.ref(y)
+        del y
+        gc.collect()
+        assert_true(alive() is None)
@@ -1,6 +1,11 @@
-from nose.tools import assert_equal
+import multiprocessing
+import os
+import shutil
+import tempfile
 
-from cheqed.core import parser, qtype, qterm, term_builder
+from nose.tools import assert_equal, assert_true, assert_false
+
+from cheqed.core import environment, parser, pratt, qtype, qterm, term_builder
 
 from cheqed.core.qterm import Constant
 from cheqed.core.qtype import qbool, qobj, qfun, qvar
@@ -118,3 +123,131 @@ class TestParse:
         assert self.parser.parse('(exists)') == self.exists
         assert self.parser.parse('(=)') == self.equals
         self.parser.parse(r'(exists) = (\x.(not (for_all y . (not x(y)))))')
+
+class TestTableCache:
+    def setup(self):
+        self.table_dir = parser.table_dir
+        parser.table_dir = tempfile.mkdtemp()
+        self.tables = dict(parser._tables)
+        parser._tables.clear()
+
+    def teardown(self):
+        shutil.rmtree(parser.table_dir)
+        parser.table_dir = self.table_dir
+        parser._tables.clear()
+        parser._tables.update(self.tables)
+
+    def make_parser(self):
+        not_ = Constant('not', qfun(qbool(), qbool()))
+        extensions = [Type(qbool, 'bool'),
+                      Operator(not_, 1, 'right', 100)]
+        return parser.Parser(Syntax(extensions), term_builder)
+
+    def test_tables_are_shared(self):
+        first = self.make_parser()
+        second = self.make_parser()
+        assert (first._thread_state()[1].action
+                is second._thread_state()[1].action)
+        assert_equal(first.parse('not a'), second.parse('not a'))
+
+    def test_tables_are_stored(self):
+        first = self.make_parser()
+        assert_equal(len(os.listdir(parser.table_dir)), 2)
+        parser._tables.clear()
+        second = self.make_parser()
+        assert_equal(second.parse('not not a'), first.parse('not not a'))
+
+    def test_syntax_signature(self):
+        a = Syntax([Type(qbool, 'bool'), Type(qobj, 'obj')])
+        b = Syntax([Type(qobj, 'obj'), Type(qbool, 'bool')])
+        c = Syntax([Type(qbool, 'bool')])
+        assert_equal(a.signature(), b.signature())
+        assert a.signature() != c.signature()
+
+class TestParseStream:
+    @classmethod
+    def setup_class(cls):
+        cls.env = environment.load_modules('logic', 'set')
+        cls.lines = ['# a comment\n',
+                     'a and b\n',
+                     '\n',
+                     'for_all x . (x in y\n',
+                     '    or x in z)\n',
+                     'f(a:obj,\n',
+                     '  b:obj)\n']
+        cls.expected = [cls.env.parse('a and b'),
+                        cls.env.parse('for_all x . (x in y or x in z)'),
+                        cls.env.parse('f(a:obj, b:obj)')]
+
+    def parsers(self):
+        extensions = self.env.types + self.env.operators + self.env.binders
+        return [parser_class(Syntax(extensions), term_builder.deferred)
+                for parser_class in [parser.Parser, pratt.PrattParser]]
+
+    def assert_same(self, terms):
+        assert_equal(len(terms), len(self.expected))
+        for term, expected in zip(terms, self.expected):
+            assert_true(qterm.same_up_to_type_variables(term, expected))
+
+    def test_parse_stream(self):
+        for parser_ in self.parsers():
+            self.assert_same(list(parser_.parse_stream(iter(self.lines))))
+
+    def test_line_numbers(self):
+        for parser_ in self.parsers():
+            for lines, message in [
+                (['a and\n'], 'line 1: Syntax error at end of input'),
+                (['a\n', 'a b\n'], "line 2: Syntax error at 'b'"),
+                (['(a\n', ' and b\n', 'c c)\n'], "line 3: Syntax error at 'c'"),
+                (['a\n', '\n', '$\n'], "line 3: Syntax error at '$'"),
+                ]:
+                try:
+                    list(parser_.parse_stream(lines))
+                except parser.SyntaxError, e:
+                    assert_equal(str(e), message)
+                else:
+                    assert False, 'no syntax error in %r' % lines
+
+    def test_lazy(self):
+        for parser_ in self.parsers():
+            terms = parser_.parse_stream(self.lines + ['a b\n'])
+            assert_true(qterm.same_up_to_type_variables(terms.next(),
+                                                        self.expected[0]))
+
+    def test_pool(self):
+        pool = multiprocessing.Pool(2)
+        try:
+            for parser_ in self.parsers():
+                terms = list(parser_.parse_stream(self.lines, pool, 2))
+                self.assert_same(terms)
+                mine = self.env.parse('f(a:obj, b:obj)').type_variables()
+                assert_false(mine & terms[2].type_variables())
+        finally:
+            pool.close()
+            pool.join()
+
+    def test_pool_made_before_parsing(self):
+        # the workers' type variables must not clash with those this
+        # process makes after forking them
+        pool = multiprocessing.Pool(1)
+        try:
+            for parser_ in self.parsers():
+                term, = parser_.parse_stream(['(x = y) and (z:obj = w)\n'],
+                                             pool, 1)
+                types = dict((variable.name, variable.qtype)
+                             for variable in term.free_variables())
+                assert_true(qtype.is_variable(types['x']))
+                assert_equal(types['x'], types['y'])
+                assert_equal(types['z'], qtype.qobj())
+        finally:
+            pool.close()
+            pool.join()
+
+    def test_parse_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'formulas')
+            open(path, 'w').writelines(self.lines)
+            self.assert_same(list(self.env.parse_file(path)))
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,65 @@
+from nose.tools import assert_equal
+from py.test import raises
+
+from cheqed.core import environment, parser, pratt, qterm, term_builder
+from cheqed.core.benchmarks.parsing import set_theory_strings, \
+    test_strings, pattern_strings
+from cheqed.core.qterm import Constant, same_up_to_type_variables
+from cheqed.core.qtype import qobj, qfun
+from cheqed.core.syntax import Syntax, Operator
+
+class TestPratt:
+    @classmethod
+    def setup_class(cls):
+        cls.env, cls.strings = set_theory_strings()
+        cls.extensions = cls.env.types + cls.env.operators + cls.env.binders
+        cls.ply = parser.Parser(Syntax(cls.extensions), term_builder.deferred)
+        cls.pratt = pratt.PrattParser(Syntax(cls.extensions),
+                                      term_builder.deferred)
+
+    def assert_same(self, string, ply=None, pratt_=None):
+        expected = (ply or self.ply).parse(string)
+        result = (pratt_ or self.pratt).parse(string)
+        assert same_up_to_type_variables(expected, result), string
+
+    def test_same_terms(self):
+        for string in self.strings + test_strings + pattern_strings:
+            self.assert_same(string)
+
+    def test_precedence(self):
+        for string in ['a and b or c', 'a or b and c', 'not a and b',
+                       'a = b and c', 'a implies b or c', 'f(x)(y)',
+                       'not f(x)', 'a and for_all x . b or c',
+                       r'\x . x = y', r'a and . b or c', 'f()',
+                       'f(x, y,)', '(not)', 'x:obj->obj(y)']:
+            self.assert_same(string)
+
+    def test_associativity(self):
+        plus = Constant('plus', qfun(qobj(), qfun(qobj(), qobj())))
+        cons = Constant('cons', qfun(qobj(), qfun(qobj(), qobj())))
+        extensions = self.extensions + [Operator(plus, 2, 'nonassoc', 40),
+                                        Operator(cons, 2, 'right', 45)]
+        ply = parser.Parser(Syntax(extensions), term_builder.deferred)
+        pratt_ = pratt.PrattParser(Syntax(extensions), term_builder.deferred)
+        for string in ['a cons b cons c', 'a plus b cons c',
+                       'a cons b plus c']:
+            self.assert_same(string, ply, pratt_)
+        raises(parser.SyntaxError, pratt_.parse, 'a plus b plus c')
+
+    def test_types(self):
+        for string in ['obj', 'obj->bool->bool', '(obj->bool)->bool',
+                       '?a->?b']:
+            assert same_up_to_type_variables(
+                qterm.Variable('x', self.ply.parse_type(string)),
+                qterm.Variable('x', self.pratt.parse_type(string)))
+
+    def test_syntax_errors(self):
+        for string in ['a b', 'a and', '(a', 'a)', 'f(,)', 'x:', '1']:
+            raises(parser.SyntaxError, self.pratt.parse, string)
+
+    def test_environment(self):
+        env = environment.load_modules('logic')
+        env.parser_class = pratt.PrattParser
+        env.make_parser()
+        assert_equal(env.parse('a:bool and b:bool'),
+                     self.ply.parse('a:bool and b:bool'))
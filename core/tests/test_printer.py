@@ -0,0 +1,86 @@
+from nose.tools import assert_equal, assert_true
+
+from cheqed.core import environment, printer, qterm, syntax
+from cheqed.core.qtype import qobj, qfun
+
+class TestPrinter:
+    @classmethod
+    def setup_class(cls):
+        cls.env = environment.load_modules('logic', 'set')
+        cls.pt = cls.env.parse
+        extensions = cls.env.types + cls.env.operators + cls.env.binders
+        cls.printer = printer.Printer(syntax.Syntax(extensions))
+
+    def assert_prints(self, string, expected):
+        assert_equal(self.printer.print_term(self.pt(string)), expected)
+
+    def test_atoms(self):
+        self.assert_prints('x', 'x')
+        self.assert_prints('(not)', 'not')
+
+    def test_operators(self):
+        self.assert_prints('not a', '(not a)')
+        self.assert_prints('a and b or c', '((a and b) or c)')
+        self.assert_prints('not a = b', '((not a) = b)')
+
+    def test_binders_and_abstractions(self):
+        self.assert_prints('for_all x . exists y . x in y',
+                           '(for_all x . (exists y . (x in y)))')
+        self.assert_prints(r'\x . x = y', r'(\x. (x = y))')
+
+    def test_functions(self):
+        self.assert_prints('f(x, y)', 'f(x, y)')
+        self.assert_prints('f(g(x))(y)', 'f(g(x), y)')
+        self.assert_prints(r'(\x . x)(y)', r'(\x. x)(y)')
+        self.assert_prints('(for_all)(p)', 'for_all(p)')
+
+    def test_names_not_constants(self):
+        # printing goes by name, so a variable named like an operator
+        # prints as the operator
+        not_ = qterm.Variable('not', qfun(qobj(), qobj()))
+        x = qterm.Variable('x', qobj())
+        assert_equal(self.printer.print_term(qterm.Combination(not_, x)),
+                     '(not x)')
+
+    def test_memo(self):
+        term = self.pt('for_all x . x in y and not p')
+        text = self.printer.print_term(term)
+        assert_true(self.printer.print_term(term) is text)
+        assert_equal(self.printer.memo[term.operand.body.operand],
+                     '(not p)')
+
+class TestPrintShared:
+    @classmethod
+    def setup_class(cls):
+        cls.env = environment.load_modules('logic', 'set')
+        cls.pt = cls.env.parse
+        extensions = cls.env.types + cls.env.operators + cls.env.binders
+        cls.printer = printer.Printer(syntax.Syntax(extensions))
+        cls.printer.abbreviation_size = 4
+
+    def test_nothing_shared(self):
+        terms = [self.pt('a and b'), self.pt('x in y')]
+        assert_equal(self.printer.print_shared(terms),
+                     (['(a and b)', '(x in y)'], []))
+
+    def test_shared(self):
+        terms = [self.pt('(x in y and p) or (x in y and p)'),
+                 self.pt('not (x in y)')]
+        assert_equal(self.printer.print_shared(terms),
+                     (['(A or A)', '(not B)'],
+                      [('A', '(B and p)'), ('B', '(x in y)')]))
+
+    def test_small_terms_are_not_shared(self):
+        assert_equal(self.printer.print_shared([self.pt('not a or not a')]),
+                     (['((not a) or (not a))'], []))
+
+    def test_names_avoid_atoms(self):
+        texts, abbreviations = self.printer.print_shared(
+            [self.pt('A in B or A in B')])
+        assert_equal(texts, ['(C or C)'])
+        assert_equal(abbreviations, [('C', '(A in B)')])
+
+    def test_memo_unchanged(self):
+        term = self.pt('(x in y) = (x in y)')
+        self.printer.print_shared([term])
+        assert_equal(self.printer.print_term(term), '((x in y) = (x in y))')
@@ -1,7 +1,7 @@
 from nose.tools import assert_true, assert_equal, assert_raises
 
 from cheqed.core.qtype import qvar, qobj, qbool, qfun
-from cheqed.core.qtype_unifier import unify
+from cheqed.core.qtype_unifier import unify, TypeUnifier
 from cheqed.core.unification import UnificationError
 
 def test_str():
@@ -67,3 +67,43 @@ def test_unfiy_tricky():
     g2 = qfun(v2, qobj())
 
     assert_equal(unify([g1, g2]), qfun(qobj(), qobj()))
+
+def test_resolved_substitutions():
+    v1 = qvar()
+    v2 = qvar()
+    v3 = qvar()
+    unifier = TypeUnifier()
+    unifier.unify(v1, qfun(v2, v3))
+    unifier.unify(v2, qfun(v3, qobj()))
+    unifier.unify(v3, qbool())
+    subs = unifier.get_resolved_substitutions()
+    assert_equal(subs[v1], qfun(qfun(qbool(), qobj()), qbool()))
+    assert_equal(subs[v2], qfun(qbool(), qobj()))
+    assert_equal(subs[v3], qbool())
+
+def test_circular_resolution():
+    v1 = qvar()
+    v2 = qvar()
+    unifier = TypeUnifier()
+    unifier.unify(v1, qfun(v2, qobj()))
+    unifier.unify(v2, qfun(v1, qobj()))
+    assert_raises(UnificationError, unifier.apply, v1)
+
+def test_try_unify():
+    v1 = qvar()
+    v2 = qvar()
+    unifier = TypeUnifier()
+    assert_true(unifier.try_unify(qfun(v1, v2), qfun(qobj(), qbool())))
+    assert_true(not unifier.try_unify(qfun(v2, v2), qfun(qbool(), qobj())))
+    assert_equal(unifier.apply(qfun(v1, v2)), qfun(qobj(), qbool()))
+
+    v3 = qvar()
+    # the failed attempt must not leave v3 bound to bool
+    assert_true(not unifier.try_unify(qfun(v3, v1), qfun(qbool(), qbool())))
+    assert_equal(unifier.apply(v3), v3)
+
+def test_try_unify_keeps_no_trail():
+    unifier = TypeUnifier()
+    for i in range(100):
+        assert_true(unifier.try_unify(qvar(), qobj()))
+    assert_equal(unifier.unifier.trail, None)
@@ -1,9 +1,101 @@
-from nose.tools import assert_equal, assert_raises
+from nose.tools import assert_equal, assert_true, assert_false, assert_raises
 
-from cheqed.core.sequent import Sequent
+from cheqed.core import environment
+from cheqed.core.qterm import Variable
+from cheqed.core.qtype import qobj, qvar
+from cheqed.core.sequent import Formulas, Sequent, empty
 
 class TestSequent:
+    @classmethod
+    def setup_class(cls):
+        cls.env = environment.load_modules('logic', 'set')
+        cls.pt = cls.env.parse
+
     def test_immutable(self):
         assert_raises(AttributeError, setattr, Sequent(), 'left', None)
         assert_raises(AttributeError, setattr, Sequent(), 'right', None)
-        
+
+    def test_sides_are_shared(self):
+        goal = Sequent([self.pt('a in b'), self.pt('b in c')],
+                       [self.pt('a in c')])
+        weakened = Sequent(goal.left[1:], goal.right)
+        assert_true(weakened.left is goal.left.drop(1))
+        assert_true(weakened.right is goal.right)
+        contracted = Sequent([goal.left[0]] + goal.left, goal.right)
+        assert_true(contracted.left.drop(1) is goal.left)
+
+    def test_types_are_inferred(self):
+        x = Variable('x', qvar())
+        goal = Sequent([self.pt('x:obj in a')], [x])
+        assert_equal(goal.right[0], Variable('x', qobj()))
+        goal = Sequent(goal.left, [x])
+        assert_equal(goal.right[0], Variable('x', qobj()))
+
+    def test_context(self):
+        left = Formulas.from_sequence([self.pt('x:obj in a')])
+        assert_equal(left.context(), {'x': qobj(), 'a': qobj()})
+        assert_equal(empty.context(), {})
+        assert_equal(left.cons(Variable('x', qvar())).context(), None)
+
+    def test_equality(self):
+        a, b = self.pt('a:bool'), self.pt('b:bool')
+        assert_equal(Sequent([a, b], [a]), Sequent([a, b], [a]))
+        assert_true(Sequent([a, b], [a]) != Sequent([b, a], [a]))
+        assert_equal(Sequent([a], [b]).left, [a])
+
+    def test_hash(self):
+        a, b = self.pt('a:bool'), self.pt('b:bool')
+        assert_equal(hash(Sequent([a, b], [a])), hash(Sequent([a, b], [a])))
+        assert_equal(len(set([Sequent([a], [b]), Sequent([a], [b]),
+                              Sequent([b], [a])])), 2)
+
+    def test_canonical(self):
+        a, b = self.pt('a:bool'), self.pt('b:bool')
+        assert_equal(Sequent([a, b], [a]).canonical(),
+                     Sequent([b, a], [a]).canonical())
+        assert_true(Sequent([a, a], [b]).canonical()
+                    != Sequent([a], [b]).canonical())
+        assert_true(Sequent([a], [b]).canonical()
+                    != Sequent([b], [a]).canonical())
+        assert_equal(Sequent([self.pt('for_all x . x in c')], []).canonical(),
+                     Sequent([self.pt('for_all y . y in c')], []).canonical())
+
+    def test_shared_formula(self):
+        a, b, c = self.pt('a:bool'), self.pt('b:bool'), self.pt('c:bool')
+        assert_equal(Sequent([a, b, c], [c, b]).shared_formula(), (1, 1))
+        assert_equal(Sequent([a], [b, c]).shared_formula(), None)
+        assert_equal(Sequent([self.pt('for_all x . x in c')],
+                             [self.pt('for_all y . y in c')]).shared_formula(),
+                     (0, 0))
+
+class TestFormulas:
+    def test_list_operations(self):
+        formulas = Formulas.from_sequence([1, 2, 3, 4])
+        assert_equal(len(formulas), 4)
+        assert_equal(list(formulas), [1, 2, 3, 4])
+        assert_equal(formulas[0], 1)
+        assert_equal(formulas[-1], 4)
+        assert_raises(IndexError, formulas.__getitem__, 4)
+        assert_equal(formulas[1:], [2, 3, 4])
+        assert_equal(formulas[1:3], [2, 3])
+        assert_equal(formulas[::2], [1, 3])
+        assert_equal([0] + formulas[:1] + formulas[2:], [0, 1, 3, 4])
+        assert_equal(formulas + [5], [1, 2, 3, 4, 5])
+        assert_true(isinstance([0] + formulas, Formulas))
+
+    def test_hash(self):
+        assert_equal(hash(Formulas.from_sequence([1, 2])),
+                     hash(empty.cons(2).cons(1)))
+        assert_false(Formulas.from_sequence([1, 2])
+                     == Formulas.from_sequence([2, 1]))
+
+    def test_index(self):
+        env = environment.load_modules('logic', 'set')
+        formulas = Formulas.from_sequence([env.parse(text) for text in
+                                           ['a:obj = b', 'not p', 'a in b',
+                                            'c:obj = d', 'for_all x . x in c']])
+        assert_equal(formulas.with_head('='), [0, 3])
+        assert_equal(formulas.with_head('for_all'), [4])
+        assert_equal(formulas.with_head('or'), [])
+        assert_equal(formulas.position(env.parse('for_all y . y in c')), 4)
+        assert_equal(formulas.position(env.parse('q:bool')), None)
@@ -0,0 +1,89 @@
+from nose.tools import assert_true, assert_false, assert_equal
+
+from cheqed.core import environment, qterm
+from cheqed.core.qtype import qbool, qobj, qfun, qvar
+from cheqed.core.substitution import substitute, substitute_many, \
+    is_trusted, specialize
+
+class TestSubstitute:
+    @classmethod
+    def setup_class(cls):
+        cls.env = environment.load_modules('logic')
+        cls.pt = cls.env.parse
+
+    def test_untouched_subterms_are_reused(self):
+        term = self.pt(r'(for_all y:obj . (p:obj->bool)(y))'
+                       r' and (q:obj->bool)(x:obj)')
+        result = substitute(self.pt('z:obj'), self.pt('x:obj'), term)
+        assert_true(result.operator is term.operator)
+        assert_equal(result, self.pt(r'(for_all y:obj . (p:obj->bool)(y))'
+                                     r' and (q:obj->bool)(z:obj)'))
+
+    def test_unchanged_term_is_returned(self):
+        term = self.pt('(p:obj->bool)(y:obj)')
+        assert_true(substitute(self.pt('z:obj'), self.pt('x:obj'), term)
+                    is term)
+
+    def test_avoids_capture(self):
+        term = self.pt(r'for_all y:obj . x:obj = y')
+        result = substitute(self.pt('y:obj'), self.pt('x:obj'), term)
+        bound = result.operand.bound
+        assert_equal(bound.name, 'y1')
+        assert_equal(result.operand.body.operator.operand, self.pt('y:obj'))
+        assert_equal(result.operand.body.operand, bound)
+
+    def test_contracts_redexes(self):
+        term = self.pt('(f:obj->bool)(x:obj)')
+        value = self.pt(r'\y:obj . (p:obj->bool)(y)')
+        result = substitute(value, term.operator, term)
+        assert_equal(result, self.pt('(p:obj->bool)(x:obj)'))
+
+    def test_trusted(self):
+        x = qterm.Variable('x', qobj())
+        term = self.pt('(p:obj->bool->bool)(x:obj, y:bool)')
+        assert_true(is_trusted({x: self.pt('(f:obj->obj)(x:obj)')}, term))
+        assert_false(is_trusted({x: self.pt('y:obj')}, term))
+        assert_false(is_trusted({x: self.pt('z:bool')}, term))
+
+    def test_infers_when_not_trusted(self):
+        term = self.pt('(p:obj->bool)(x:obj) and y')
+        result = substitute(self.pt('(q:obj->bool)(x)'), self.pt('y:bool'),
+                            term)
+        assert_equal(result, self.pt('(p:obj->bool)(x:obj)'
+                                     ' and (q:obj->bool)(x:obj)'))
+
+    def test_specialize(self):
+        value = qterm.Variable('f', qfun(qvar(), qbool()))
+        pattern = qterm.Variable('g', qfun(qobj(), qbool()))
+        fixed = pattern.type_variables()
+        assert_equal(specialize(value, pattern, fixed).qtype, pattern.qtype)
+
+        value = qterm.Variable('f', qfun(qobj(), qbool()))
+        pattern = qterm.Variable('g', qfun(qvar(), qbool()))
+        fixed = pattern.type_variables()
+        assert_true(specialize(value, pattern, fixed) is value)
+
+    def test_simultaneous(self):
+        x = self.pt('x:obj')
+        y = self.pt('y:obj')
+        term = self.pt('(f:obj->obj->bool)(x:obj, y:obj)')
+        result = substitute_many({x: y, y: x}, term)
+        assert_equal(result, self.pt('(f:obj->obj->bool)(y:obj, x:obj)'))
+
+    def test_simultaneous_avoids_capture(self):
+        x = self.pt('x:obj')
+        y = self.pt('y:obj')
+        term = self.pt(r'for_all z:obj .'
+                       r' (f:obj->obj->obj->bool)(x:obj, y:obj, z)')
+        result = substitute_many({x: self.pt('z:obj'), y: x}, term)
+        bound = result.operand.bound
+        assert_equal(bound.name, 'z1')
+        expected = self.pt('(f:obj->obj->obj->bool)(z:obj, x:obj, w:obj)')
+        expected = substitute(bound, self.pt('w:obj'), expected)
+        assert_equal(result.operand.body, expected)
+
+    def test_curried_redex(self):
+        term = self.pt('(f:obj->obj->bool)(a:obj, b:obj)')
+        value = self.pt(r'\x:obj . \y:obj . (g:obj->obj->bool)(y, x)')
+        result = substitute(value, term.operator.operator, term)
+        assert_equal(result, self.pt('(g:obj->obj->bool)(b:obj, a:obj)'))
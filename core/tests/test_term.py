@@ -1,3 +1,5 @@
+import pickle
+
 from nose.tools import assert_true, assert_equal, assert_not_equal, \
     assert_raises
 
@@ -149,3 +151,82 @@ class TestAbstraction:
         assert_equal(Abstraction(Variable('a', type_a()),
                                  Variable('a', type_b())).free_variables(),
                      set([Variable('a', type_b())]))
+
+
+class TestInterning:
+    def test_atoms_are_shared(self):
+        assert_true(Variable('a', type_a()) is Variable('a', type_a()))
+        assert_true(Constant('a', type_a()) is not Variable('a', type_a()))
+        assert_true(Variable('a', type_a()) is not Variable('a', type_b()))
+
+    def test_compound_terms_are_shared(self):
+        f = Constant('f', qfun(type_a(), type_a()))
+        x = Variable('x', type_a())
+        assert_true(Combination(f, x) is Combination(f, x))
+        assert_true(Abstraction(x, Combination(f, x))
+                    is Abstraction(x, Combination(f, x)))
+
+    def test_unpickled_terms_are_shared(self):
+        f = Constant('f', qfun(type_a(), type_a()))
+        x = Variable('x', type_a())
+        term = Abstraction(x, Combination(f, x))
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            assert_true(pickle.loads(pickle.dumps(term, protocol)) is term)
+
+    def test_failed_construction_is_not_interned(self):
+        assert_raises(TypeError, Combination,
+                      Constant('a', type_a()), Constant('b', type_b()))
+        assert_raises(TypeError, Combination,
+                      Constant('a', type_a()), Constant('b', type_b()))
+
+
+class TestCachedProperties:
+    def test_size_and_depth(self):
+        f = Variable('f', qfun(type_a(), type_a()))
+        x = Variable('x', type_a())
+        term = Abstraction(x, Combination(f, Combination(f, x)))
+        assert_equal(x.size, 1)
+        assert_equal(x.depth, 1)
+        assert_equal(term.size, 7)
+        assert_equal(term.depth, 4)
+
+    def test_frozen_sets(self):
+        x = Variable('x', type_a())
+        term = Abstraction(x, x)
+        assert_true(isinstance(term.atoms(), frozenset))
+        assert_true(isinstance(term.free_variables(), frozenset))
+        assert_true(term.free_variables() is term.free_variables())
+
+    def test_private_attributes_are_immutable(self):
+        atom = Variable('a', type_a())
+        assert_raises(AttributeError, setattr, atom, '_name', 'b')
+        assert_raises(AttributeError, setattr, atom, 'other', None)
+
+
+class TestSubstituteTypes:
+    def test_unchanged_terms_are_reused(self):
+        v = qvar()
+        f = Variable('f', qfun(v, type_a()))
+        x = Variable('x', v)
+        c = Constant('c', type_b())
+        term = Abstraction(x, Combination(f, x))
+        assert_true(term.substitute_types({qvar(): type_a()}) is term)
+        assert_true(c.substitute_types({v: type_a()}) is c)
+        assert_equal(term.type_variables(), frozenset([v]))
+
+    def test_simultaneous(self):
+        v1 = qvar()
+        v2 = qvar()
+        f = Variable('f', qfun(v1, v2))
+        result = f.substitute_types({v1: v2, v2: v1})
+        assert_equal(result, Variable('f', qfun(v2, v1)))
+
+    def test_shared_subterms(self):
+        v = qvar()
+        f = Variable('f', qfun(v, v))
+        x = Variable('x', v)
+        fx = Combination(f, x)
+        term = Combination(f, fx)
+        result = term.substitute_types({v: type_a()})
+        assert_true(result.operator is result.operand.operator)
+        assert_equal(result.qtype, type_a())
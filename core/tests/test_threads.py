@@ -0,0 +1,78 @@
+import random
+import sys
+import threading
+
+from nose.tools import assert_equal, assert_true
+
+from cheqed.core import parser, pratt, qtype, term_builder
+from cheqed.core.benchmarks.parsing import set_theory_strings, \
+    test_strings, pattern_strings
+from cheqed.core.qterm import same_up_to_type_variables
+from cheqed.core.syntax import Syntax
+
+def run_threads(count, function):
+    '''Run function(i) in count threads at once, returning the results
+    in order, or raising the first exception.'''
+    results = [None] * count
+    errors = []
+    def run(i):
+        try:
+            results[i] = function(i)
+        except Exception, e:
+            errors.append(e)
+
+    interval = sys.getcheckinterval()
+    # switch threads as often as possible, to shake out races
+    sys.setcheckinterval(1)
+    try:
+        threads = [threading.Thread(target=run, args=(i,))
+                   for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setcheckinterval(interval)
+    if errors:
+        raise errors[0]
+    return results
+
+class TestConcurrentParsing:
+    @classmethod
+    def setup_class(cls):
+        cls.env, strings = set_theory_strings()
+        cls.strings = strings + test_strings + pattern_strings
+        cls.extensions = cls.env.types + cls.env.operators + cls.env.binders
+
+    def check_parser(self, parse):
+        serial = [parse(string) for string in self.strings]
+
+        def parse_all(i):
+            order = range(len(self.strings)) * 2
+            random.Random(i).shuffle(order)
+            return [(index, parse(self.strings[index])) for index in order]
+
+        for results in run_threads(8, parse_all):
+            for index, term in results:
+                assert_true(same_up_to_type_variables(term, serial[index]),
+                            self.strings[index])
+                if not term.type_variables():
+                    assert_true(term is serial[index])
+
+    def test_ply(self):
+        parser_ = parser.Parser(Syntax(self.extensions), term_builder.deferred)
+        self.check_parser(parser_.parse)
+
+    def test_pratt(self):
+        parser_ = pratt.PrattParser(Syntax(self.extensions),
+                                    term_builder.deferred)
+        self.check_parser(parser_.parse)
+
+    def test_environment(self):
+        self.check_parser(self.env.parse)
+
+    def test_type_variables_are_fresh(self):
+        variables = run_threads(8, lambda i: [qtype.qvar()
+                                              for j in range(2000)])
+        names = [variable.name for batch in variables for variable in batch]
+        assert_equal(len(set(names)), len(names))
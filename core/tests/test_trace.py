@@ -0,0 +1,158 @@
+from nose.tools import assert_true, assert_equal, assert_raises
+
+from cheqed.core import environment, sequent, trace
+from cheqed.core.cache import LRUCache
+from cheqed.core.unification import UnificationError
+
+class RecordingLog(trace.NullLog):
+    def __init__(self):
+        self.events = []
+
+    def begin_primitive(self, primitive, goal):
+        self.events.append(('primitive', primitive, goal))
+
+    def begin_compound(self, compound, goal):
+        self.events.append(('compound', compound, goal))
+
+    def begin_branch(self, branch, goal):
+        self.events.append(('branch', branch.rule, len(branch.branches), goal))
+
+    def end_branch(self, branch):
+        self.events.append(('end', branch.rule))
+
+class TestSequence:
+    @classmethod
+    def setup_class(cls):
+        cls.env = environment.make_default()
+        cls.rules = cls.env.rules
+        cls.goal = sequent.Sequent([], [cls.env.parse('a and b')])
+        cls.steps = (cls.rules['right_expand']('and'),
+                     cls.rules['right_negation'](),
+                     trace.branch(cls.rules['left_disjunction'](),
+                                  cls.rules['left_negation'](),
+                                  cls.rules['left_negation']()))
+
+    def nested(self, steps):
+        proof = steps[-1]
+        for step in reversed(steps[:-1]):
+            proof = trace.pair(step, proof)
+        return proof
+
+    def test_sequence(self):
+        assert_true(isinstance(trace.sequence(*self.steps), trace.Sequence))
+        assert_true(trace.sequence(self.steps[0]) is self.steps[0])
+        assert_raises(ValueError, trace.Sequence, self.steps[0])
+
+    def test_same_as_nested_branches(self):
+        flat, nested = RecordingLog(), RecordingLog()
+        assert_equal(trace.Sequence(*self.steps).evaluate(self.goal, flat),
+                     self.nested(self.steps).evaluate(self.goal, nested))
+        assert_equal(flat.events, nested.events)
+
+    def test_same_proved_goals_as_nested_branches(self):
+        steps = (self.rules['right_negation'](),
+                 self.rules['left_permutation'](1),
+                 self.rules['axiom']())
+        goal = sequent.Sequent([self.env.parse('b:bool')],
+                               [self.env.parse('not a'), self.env.parse('b')])
+        flat, nested = LRUCache(16), LRUCache(16)
+        assert_equal(trace.Sequence(*steps).evaluate(goal, proved=flat), [])
+        assert_equal(self.nested(steps).evaluate(goal, proved=nested), [])
+        assert_equal(len(flat), 2)
+        assert_equal(set(flat.entries), set(nested.entries))
+
+    def test_replace_and_print(self):
+        proof = trace.Sequence(*self.steps)
+        assumption = self.rules['assumption']()
+        replaced = proof.replace(self.steps[1], assumption)
+        assert_equal(replaced.steps[:2], (self.steps[0], assumption))
+        text = self.env.print_proof(replaced)
+        assert_true(text.startswith('sequence(right_expand('))
+        assert_equal(self.env.print_proof(self.env.evaluate(text)), text)
+
+    def test_long_proofs(self):
+        goal = sequent.Sequent([self.env.parse('p:bool')],
+                               [self.env.parse('p:bool')])
+        steps = [self.rules['left_contraction'](),
+                 self.rules['left_weakening']()] * 50000
+        steps.append(self.rules['axiom']())
+        assert_equal(trace.Sequence(*steps).evaluate(goal), [])
+        assert_equal(self.nested(steps).evaluate(goal), [])
+
+class TestExpansionCache:
+    def setup(self):
+        self.env = environment.make_default()
+        self.cache = self.env.expansion_cache
+
+    def test_hit(self):
+        goal = sequent.Sequent([], [self.env.parse('a and b')])
+        first, second = RecordingLog(), RecordingLog()
+        compound = self.env.rules['right_conjunction']()
+        subgoals = compound.evaluate(goal, first, expansions=self.cache)
+        assert_equal(self.cache.stats()['misses'], 1)
+        assert_equal(compound.evaluate(goal, second, expansions=self.cache),
+                     subgoals)
+        assert_equal(self.cache.hits, 1)
+        assert_equal(len(subgoals), 2)
+        assert_true('primitive' in [event[0] for event in first.events])
+        assert_equal([event[0] for event in second.events], ['compound'])
+
+    def test_args_parsed_again(self):
+        goal = sequent.Sequent([], [self.env.parse('exists x . x in a')])
+        rule = self.env.rules['right_existential']
+        assert_equal(rule('y').evaluate(goal, expansions=self.cache),
+                     rule('y').evaluate(goal, expansions=self.cache))
+        assert_equal(self.cache.hits, 1)
+
+    def test_args_of_different_types(self):
+        goal = sequent.Sequent([], [self.env.parse('exists x . p(x)')])
+        rule = self.env.rules['right_existential']
+        rule('y:obj').evaluate(goal, expansions=self.cache)
+        assert_raises(UnificationError, rule('y:bool').evaluate, goal,
+                      expansions=self.cache)
+        assert_equal(self.cache.hits, 0)
+
+    def test_goals_parsed_again(self):
+        compound = self.env.rules['right_conjunction']()
+        first = sequent.Sequent([], [self.env.parse('(x = y) and (y = x)')])
+        second = sequent.Sequent([], [self.env.parse('(x = y) and (y = x)')])
+        assert_true(first != second)
+        compound.evaluate(first, expansions=self.cache)
+        log = RecordingLog()
+        subgoals = compound.evaluate(second, log, expansions=self.cache)
+        assert_equal(self.cache.hits, 1)
+        assert_equal([event[0] for event in log.events], ['compound'])
+        conjunction = second.right[0]
+        assert_equal(subgoals,
+                     [sequent.Sequent([], [conjunction.operator.operand]),
+                      sequent.Sequent([], [conjunction.operand])])
+
+    def test_formula_order_is_kept(self):
+        compound = self.env.rules['qed']()
+        a, b = self.env.parse('a:bool'), self.env.parse('b:bool')
+        compound.evaluate(sequent.Sequent([a, b], [b]), expansions=self.cache)
+        compound.evaluate(sequent.Sequent([b, a], [b]), expansions=self.cache)
+        assert_equal(self.cache.hits, 0)
+
+    def test_unsound_expansions_are_evaluated(self):
+        self.env.load_extension('''
+@compound
+def later(goal):
+    return assumption()
+''')
+        goal = sequent.Sequent([], [self.env.parse('p:bool')])
+        compound = self.env.rules['later']()
+        for i in range(2):
+            log = RecordingLog()
+            assert_equal(compound.evaluate(goal, log, expansions=self.cache),
+                         [])
+            assert_equal([event[0] for event in log.events],
+                         ['compound', 'primitive'])
+        assert_equal(self.cache.hits, 1)
+
+    def test_cleared_with_rules(self):
+        goal = sequent.Sequent([], [self.env.parse('a and b')])
+        self.env.rules['right_conjunction']().evaluate(
+            goal, expansions=self.cache)
+        self.env.rules_changed()
+        assert_equal(len(self.cache), 0)
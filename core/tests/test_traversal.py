@@ -0,0 +1,149 @@
+from nose.tools import assert_true, assert_false, assert_equal
+
+from cheqed.core import environment, nameless, qterm, substitution, traversal
+from cheqed.core import term_builder, type_inference
+from cheqed.core.match import match_term
+from cheqed.core.normalize import normalize
+from cheqed.core.qtype import qobj, qbool
+from cheqed.core.qterm import Abstraction, Combination, Variable
+
+def tuple_children(node):
+    if isinstance(node, tuple):
+        return node
+    return ()
+
+class TestTraversal:
+    def test_fold(self):
+        tree = ((1, 2), (3, (4,)))
+        total = traversal.fold(tree, tuple_children,
+                               lambda node, parts: sum(parts) or node)
+        assert_equal(total, 10)
+
+    def test_order(self):
+        visited = []
+        def combine(node, parts):
+            visited.append(node)
+        traversal.fold(((1, 2), 3), tuple_children, combine)
+        assert_equal(visited, [1, 2, (1, 2), 3, ((1, 2), 3)])
+
+    def test_shared_nodes_are_visited_once(self):
+        shared = (1, 2)
+        visited = []
+        def combine(node, parts):
+            visited.append(node)
+            return node
+        traversal.fold((shared, (shared, shared)), tuple_children, combine)
+        assert_equal(visited.count(shared), 1)
+
+    def test_memo(self):
+        memo = {}
+        traversal.fold((1, 2), tuple_children, lambda node, parts: node, memo)
+        assert_equal(set(memo), set([1, 2, (1, 2)]))
+        calls = []
+        traversal.fold((1, 2), tuple_children,
+                       lambda node, parts: calls.append(node), memo)
+        assert_equal(calls, [])
+
+    def test_preorder(self):
+        shared = (1, 2)
+        assert_equal(list(traversal.preorder((shared, (shared, 3)),
+                                             tuple_children)),
+                     [(shared, (shared, 3)), shared, 1, 2, (shared, 3), 3])
+
+    def test_write(self):
+        def pieces(node):
+            if isinstance(node, tuple):
+                return ['['] + list(node) + [']']
+            return [str(node)]
+        assert_equal(traversal.write((1, (2, 3)), pieces), '[1[23]]')
+
+class TestDeepTerms:
+    '''Terms far deeper than the recursion limit.'''
+
+    depth = 100000
+
+    @classmethod
+    def setup_class(cls):
+        cls.env = environment.load_modules('logic')
+        cls.or_ = cls.env.constants['or']
+        cls.p = Variable('p', qbool())
+        cls.q = Variable('q', qbool())
+        x = Variable('x', qbool())
+
+        # p or (p or (... or (\x. x)(r = s))), with r and s of a type
+        # variable
+        cls.leaf = cls.env.parse('r = s')
+        cls.redex = Combination(Abstraction(x, x), cls.leaf)
+        cls.chain = cls.disjunction(cls.redex)
+
+        # for_all y . p or for_all y . p or ... y = z, three nodes deep
+        # for each binder
+        cls.y = Variable('y', qobj())
+        cls.z = Variable('z', qobj())
+        cls.binders = cls.env.parse('y:obj = z:obj')
+        for_all = cls.env.constants['for_all']
+        for i in xrange(cls.depth / 3):
+            cls.binders = Combination(
+                for_all,
+                Abstraction(cls.y, cls.disjoin(cls.p, cls.binders)))
+
+    @classmethod
+    def disjoin(cls, a, b):
+        return Combination(Combination(cls.or_, a), b)
+
+    @classmethod
+    def disjunction(cls, leaf):
+        term = leaf
+        for i in xrange(cls.depth):
+            term = cls.disjoin(cls.p, term)
+        return term
+
+    def test_structure(self):
+        assert_true(self.chain.depth > self.depth)
+        assert_true(self.binders.depth > self.depth)
+        assert_equal(self.chain.free_variables(),
+                     self.leaf.free_variables() | set([self.p]))
+        assert_true(self.chain == self.disjunction(self.redex))
+        assert_true(repr(self.chain).startswith(
+                'Combination(Combination(Constant('))
+
+    def test_substitute_types(self):
+        renamed = qterm.rename_type_variables(self.chain)
+        assert_false(renamed.type_variables() & self.chain.type_variables())
+        assert_true(qterm.same_up_to_type_variables(renamed, self.chain))
+
+    def test_normalize(self):
+        normal = normalize(self.chain)
+        assert_true(normal.is_normal())
+        assert_equal(normal, self.disjunction(self.leaf))
+
+    def test_substitute(self):
+        term = substitution.substitute(self.q, self.p, self.chain)
+        assert_false(self.p in term.free_variables())
+        assert_equal(term.depth, self.chain.depth)
+
+    def test_infer(self):
+        builder = term_builder.deferred
+        term = builder.build_variable('q', self.q.qtype)
+        for i in xrange(self.depth):
+            term = builder.build_binary_op(self.or_, self.p, term)
+        assert_equal(type_inference.infer(term), self.disjunction(self.q))
+
+    def test_match(self):
+        assignments = match_term(self.chain, self.chain)
+        assert_equal(assignments['p'], self.p)
+
+    def test_print(self):
+        text = self.env.printer.print_term(self.binders)
+        assert_true(text.startswith('(for_all y . (p or (for_all y . '))
+        assert_true(text.endswith('(y = z)))' + '))' * (self.depth / 3 - 1)))
+
+    def test_nameless(self):
+        w = Variable('w', qobj())
+        node = nameless.nameless(self.binders)
+        assert_equal(nameless.free_variables(node),
+                     frozenset([self.p, self.z]))
+        term = nameless.substitute(w, self.z, self.binders)
+        assert_true(term.depth > self.depth)
+        assert_true(nameless.nameless(term)
+                    is nameless.replace(node, self.z, w))
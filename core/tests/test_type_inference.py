@@ -0,0 +1,57 @@
+from nose.tools import assert_equal
+from py.test import raises
+
+from cheqed.core import parser, qtype, qterm, term_builder, type_inference
+from cheqed.core.benchmarks.parsing import set_theory_strings
+from cheqed.core.qterm import Variable, same_up_to_type_variables
+from cheqed.core.qtype import qbool, qobj, qfun, qvar
+from cheqed.core.sequent import Sequent
+from cheqed.core.syntax import Syntax
+from cheqed.core.unification import UnificationError
+
+class TestInference:
+    @classmethod
+    def setup_class(cls):
+        cls.env, cls.strings = set_theory_strings()
+        extensions = cls.env.types + cls.env.operators + cls.env.binders
+        cls.incremental = parser.Parser(Syntax(extensions), term_builder)
+        cls.deferred = parser.Parser(Syntax(extensions), term_builder.deferred)
+
+    def test_same_as_incremental(self):
+        for string in self.strings + ['x = y', '(=)', r'\x . f(x) = g(x)',
+                                      'p(x:obj) and p(y)']:
+            assert same_up_to_type_variables(self.incremental.parse(string),
+                                             self.deferred.parse(string))
+
+    def test_constants_instantiated(self):
+        term = self.deferred.parse('(x:obj = y) and (p:bool = q)')
+        assert_equal(term.operator.operand.operator.operator.qtype,
+                     qfun(qobj(), qfun(qobj(), qbool())))
+        assert_equal(term.operand.operator.operator.qtype,
+                     qfun(qbool(), qfun(qbool(), qbool())))
+
+    def test_declared_type_kept(self):
+        equals = self.env.constants['=']
+        assert self.deferred.parse('(=)') is equals
+
+    def test_bound_apart_from_free(self):
+        term = self.deferred.parse(r'(x:bool) and (\x:obj . x = y)(z)')
+        assert_equal(term.operator.operand.qtype, qbool())
+        assert_equal(term.operand.operand.qtype, qobj())
+
+    def test_ill_typed(self):
+        raises(UnificationError, self.deferred.parse, 'f(f)')
+        raises(UnificationError, self.deferred.parse, '(x:bool)(y)')
+
+    def test_infer_all(self):
+        a = Variable('x', qvar())
+        b = Variable('x', qobj())
+        assert_equal(type_inference.infer_all([a, b]), [b, b])
+
+    def test_sequent_finishes_terms(self):
+        builder = term_builder.deferred
+        f = builder.build_combination(Variable('f', qvar()),
+                                      Variable('x', qobj()))
+        sequent = Sequent([f], [Variable('f', qfun(qvar(), qbool()))])
+        assert_equal(sequent.left[0].operator.qtype,
+                     qfun(qobj(), qbool()))
@@ -32,3 +32,52 @@ def test_unify():
     assert_raises(UnificationError, unify, [('x', 0), ('x', 1)])
     assert_raises(UnificationError, unify, [('x', 'y'), ('x', 0), ('y', 1)])
     assert_raises(UnificationError, unify, [('x', 'xy')])
+
+def test_long_chain():
+    unifier = Unifier(is_variable, occurs_in)
+    names = ['v%d' % i for i in range(5000)]
+    for a, b in zip(names, names[1:]):
+        unifier.unify(a, b)
+    unifier.unify(names[0], 0)
+    assert_equal(unifier.representative(names[-1]), 0)
+    assert_equal(len(unifier.get_substitutions()), len(names))
+
+def test_rollback():
+    unifier = Unifier(is_variable, occurs_in)
+    unifier.unify('x', 'y')
+    checkpoint = unifier.checkpoint()
+    unifier.unify('y', 0)
+    unifier.unify('z', 'x')
+    assert_equal(unifier.get_substitutions(), {'x': 0, 'y': 0, 'z': 0})
+
+    unifier.rollback(checkpoint)
+    assert_equal(unifier.get_substitutions(), {'x': 'y'})
+    unifier.unify('y', 1)
+    assert_equal(unifier.get_substitutions(), {'x': 1, 'y': 1})
+
+def test_nested_rollback():
+    unifier = Unifier(is_variable, occurs_in)
+    outer = unifier.checkpoint()
+    unifier.unify('x', 0)
+    inner = unifier.checkpoint()
+    unifier.unify('y', 'x')
+    unifier.rollback(inner)
+    assert_equal(unifier.get_substitutions(), {'x': 0})
+    unifier.rollback(outer)
+    assert_equal(unifier.get_substitutions(), {})
+
+def test_commit():
+    unifier = Unifier(is_variable, occurs_in)
+    outer = unifier.checkpoint()
+    unifier.unify('x', 0)
+    inner = unifier.checkpoint()
+    unifier.unify('y', 'x')
+    unifier.commit(inner)
+    assert_equal(unifier.get_substitutions(), {'x': 0, 'y': 0})
+    unifier.rollback(outer)
+    assert_equal(unifier.get_substitutions(), {})
+
+    # with no checkpoint open, nothing is recorded
+    unifier.commit(unifier.checkpoint())
+    unifier.unify('z', 1)
+    assert_equal(unifier.trail, None)
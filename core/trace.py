@@ -1,3 +1,141 @@
+'''Proofs as trees of rules, and their evaluation against goals.
+
+Evaluating a proof returns the goals it leaves unmet. An environment
+may also pass a cache of goals already proved, keyed on the canonical
+form of the goal: a branch or compound whose goal is in the cache is
+skipped, and one which proves its goal outright is recorded there. A
+proof counts only when it uses no assumption, which closes a goal
+without proving it, and leaves no subgoal without a branch. The log
+is told nothing about a skipped branch, even if the branch being
+skipped holds assumptions where the recorded proof had none, so a log
+which draws the proof or looks for its assumptions must not be given
+the cache.
+
+Proofs may be far deeper than Python's recursion limit: a proof of n
+steps in sequence is n branches deep, and the expansions of compounds
+nest inside that. So no node evaluates its children itself. Each node
+but a primitive is evaluated by a generator which yields the child and
+goal it needs evaluated next, and is sent back the result; run() keeps
+the stack of those generators.
+
+A cache of expansions remembers what each compound expanded to on a
+goal, and what the expansion left unmet. Evaluating the compound again
+with equal arguments on an equal goal, or ones which differ only in
+the names of their type variables, then returns those goals without expanding it, and the log
+sees the compound but nothing inside it. An expansion which was not
+sound, which may mean it holds an assumption, is evaluated again. As
+with the cache of proved goals, a log which draws the proof must not
+be given it.
+'''
+
+from cheqed.core import qterm, qtype
+from cheqed.core.cache import LRUCache
+from cheqed.core.sequent import Sequent
+from cheqed.core.traversal import preorder
+
+def is_assumption(primitive):
+    return primitive.func.func_name == 'assumption'
+
+def proof_of(proved, goal):
+    '''Return the recorded proof of goal, or None.'''
+    if proved is None:
+        return None
+    return proved.get(goal.canonical())
+
+def record_proof(proved, goal, proof):
+    if proved is not None:
+        proved.put(goal.canonical(), proof)
+
+def _add_type_variables(type_, order, seen):
+    stack = [type_]
+    while stack:
+        type_ = stack.pop()
+        if qtype.is_variable(type_):
+            if type_ not in seen:
+                seen.add(type_)
+                order.append(type_)
+        elif qtype.is_polymorphic(type_):
+            stack.extend(reversed(type_.args))
+
+def type_variables_in_order(terms):
+    '''Return the type variables of terms, in the order in which they
+    first occur.'''
+    order = []
+    seen = set()
+    for term in terms:
+        if not term.type_variables() - seen:
+            continue
+        for subterm in preorder(term, qterm.children):
+            if qterm.is_atom(subterm):
+                _add_type_variables(subterm.qtype, order, seen)
+    return order
+
+def _formulas(goals):
+    return [formula for goal in goals
+            for formula in list(goal.left) + list(goal.right)]
+
+def _substitute_types(goal, mapping):
+    if not mapping:
+        return goal
+    return Sequent([formula.substitute_types(mapping)
+                    for formula in goal.left],
+                   [formula.substitute_types(mapping)
+                    for formula in goal.right])
+
+class ExpansionCache(LRUCache):
+    '''Map (rule name, arguments, goal) to a compound's expansion on
+    the goal, its unmet goals and whether it was sound.
+
+    The goal and the arguments which are terms are keyed with their
+    type variables renamed to ?s0, ?s1, ... in the order in which they
+    occur, so a goal or argument parsed again, with its type variables
+    renamed apart, shares an entry, while arguments of different types
+    do not. The unmet goals are stored the same way, and are renamed
+    back to the type variables of the goal and arguments looked up, and
+    to fresh ones where those have none. Formulas keep their order in
+    the key, since compounds such as qed depend on it.
+    '''
+
+    def _key(self, compound, goal):
+        terms = [arg for arg in compound.args if qterm.is_term(arg)]
+        variables = type_variables_in_order(_formulas([goal]) + terms)
+        standard = dict((variable, qtype.Variable('?s%d' % i))
+                        for i, variable in enumerate(variables))
+        args = tuple([arg.substitute_types(standard) if qterm.is_term(arg)
+                      else arg for arg in compound.args])
+        key = (compound.func.func_name, args,
+               _substitute_types(goal, standard))
+        return key, standard
+
+    def lookup(self, compound, goal):
+        '''Return (expansion, unmet goals, sound) for compound on goal,
+        or None if it has not been seen on such a goal. The expansion is
+        None unless it was made with the same arguments on goal itself.'''
+        key, standard = self._key(compound, goal)
+        cached = self.get(key)
+        if cached is None:
+            return None
+        expanded_goal, args, expansion, subgoals, sound = cached
+        if expanded_goal != goal or args != compound.args:
+            expansion = None
+        mapping = dict((variable, original)
+                       for original, variable in standard.iteritems())
+        for variable in type_variables_in_order(_formulas(subgoals)):
+            if variable not in mapping:
+                mapping[variable] = qtype.qvar()
+        return (expansion,
+                [_substitute_types(subgoal, mapping) for subgoal in subgoals],
+                sound)
+
+    def store(self, compound, goal, expansion, subgoals, sound):
+        key, standard = self._key(compound, goal)
+        for variable in type_variables_in_order(_formulas(subgoals)):
+            if variable not in standard:
+                standard[variable] = qtype.Variable('?s%d' % len(standard))
+        subgoals = [_substitute_types(subgoal, standard)
+                    for subgoal in subgoals]
+        self.put(key, (goal, compound.args, expansion, subgoals, sound))
+
 class NullLog:
     def begin_primitive(self, primitive, goal):
         pass
@@ -17,28 +155,57 @@ class NullLog:
     def end_branch(self, branch):
         pass
 
-class Primitive:
+def run(proof, goal, log=NullLog(), proved=None, expansions=None):
+    '''Evaluate proof against goal. Return the unmet goals, and whether
+    the proof is sound.'''
+    # the generators yield (child, goal) to have child evaluated, and
+    # (None, result) when they are done
+    stack = []
+    node = proof
+    result = None
+    while True:
+        if node is not None:
+            if isinstance(node, Primitive):
+                result = node.apply(goal, log)
+            else:
+                stack.append(node.evaluation(goal, log, proved,
+                                             expansions))
+                result = None
+        if not stack:
+            return result
+        node, value = stack[-1].send(result)
+        if node is None:
+            stack.pop()
+            result = value
+        else:
+            goal = value
+
+class Proof(object):
+    def evaluate(self, goal, log=NullLog(), proved=None, expansions=None):
+        return run(self, goal, log, proved, expansions)[0]
+
+class Primitive(Proof):
     def __init__(self, func, *args):
         self.func = func
         self.args = args
 
     def __repr__(self):
         return 'Primitive(%r, %r)' % (self.func, self.args)
-    
-    def evaluate(self, goal, log=NullLog()):
+
+    def apply(self, goal, log):
         log.begin_primitive(self, goal)
 
         subgoals = self.func(goal, *self.args)
 
         log.end_primitive(self)
-        return subgoals
+        return subgoals, not is_assumption(self)
 
     def replace(self, a, b):
         if self == a:
             return b
         return self
 
-class Compound:
+class Compound(Proof):
     def __init__(self, func, *args):
         self.func = func
         self.args = args
@@ -46,14 +213,31 @@ class Compound:
     def __repr__(self):
         return 'Compound(%r, %r)' % (self.func, self.args)
 
-    def evaluate(self, goal, log=NullLog()):
+    def evaluation(self, goal, log, proved, expansions):
+        if proof_of(proved, goal) is not None:
+            yield None, ([], True)
+            return
+
         log.begin_compound(self, goal)
 
-        expansion = self.expand(goal)
-        subgoals = expansion.evaluate(goal, log)
+        if expansions is None:
+            subgoals, sound = yield self.expand(goal), goal
+        else:
+            cached = expansions.lookup(self, goal)
+            if cached is None:
+                expansion = None
+            else:
+                expansion, subgoals, sound = cached
+            if cached is None or not sound:
+                if expansion is None:
+                    expansion = self.expand(goal)
+                subgoals, sound = yield expansion, goal
+                expansions.store(self, goal, expansion, subgoals, sound)
 
         log.end_compound(self)
-        return subgoals
+        if sound and not subgoals:
+            record_proof(proved, goal, self)
+        yield None, (subgoals, sound)
     
     def expand(self, goal):
         return self.func(goal, *self.args)
@@ -63,7 +247,7 @@ class Compound:
             return b
         return self
 
-class Branch:
+class Branch(Proof):
     def __init__(self, rule, *branches):
         self.rule = rule
         self.branches = branches
@@ -77,16 +261,104 @@ class Branch:
         return Branch(self.rule.replace(a, b),
                       *[branch.replace(a, b) for branch in self.branches])
 
-    def evaluate(self, goal, log=NullLog()):
-        subgoals = self.rule.evaluate(goal, log)
+    def evaluation(self, goal, log, proved, expansions):
+        if proof_of(proved, goal) is not None:
+            yield None, ([], True)
+            return
+
+        subgoals, sound = yield self.rule, goal
         log.begin_branch(self, goal)
 
+        sound = sound and len(subgoals) <= len(self.branches)
         unmet_goals = []
         for subgoal, branch in zip(subgoals, self.branches):
-            unmet_goals.extend(branch.evaluate(subgoal, log))
+            unmet, branch_sound = yield branch, subgoal
+            unmet_goals.extend(unmet)
+            sound = sound and branch_sound
 
         log.end_branch(self)
-        return unmet_goals
+        if sound and not unmet_goals:
+            record_proof(proved, goal, self)
+        yield None, (unmet_goals, sound)
+
+class Sequence(Proof):
+    '''Steps applied one after another, each to the first subgoal left
+    by the step before it.
+
+    A sequence is the chain Branch(first, Branch(second, ...)) which
+    pair() would build, and it looks like one to the log and to the
+    cache of proved goals: its rule is its first step and its one
+    branch the sequence of the rest. It is evaluated in a loop rather
+    than a link at a time, and its links are made only when the log or
+    the cache needs them.
+    '''
+
+    def __init__(self, *steps):
+        if len(steps) < 2:
+            raise ValueError('a sequence needs at least two steps')
+        self._steps = steps
+        self._start = 0
+
+    def _link(self, start):
+        '''Return the sequence of the steps from start on, sharing them
+        with this one.'''
+        if start == len(self._steps) - 1:
+            return self._steps[start]
+        link = Sequence.__new__(Sequence)
+        link._steps = self._steps
+        link._start = start
+        return link
+
+    @property
+    def steps(self):
+        return self._steps[self._start:]
+
+    @property
+    def rule(self):
+        return self._steps[self._start]
+
+    @property
+    def branches(self):
+        return (self._link(self._start + 1),)
+
+    def __repr__(self):
+        return 'Sequence(%r)' % (self.steps,)
+
+    def replace(self, a, b):
+        if self == a:
+            return b
+        return Sequence(*[step.replace(a, b) for step in self.steps])
+
+    def evaluation(self, goal, log, proved, expansions):
+        # walk down the chain, keeping the links whose branches are
+        # still open; then close them from the innermost out
+        last = len(self._steps) - 1
+        opened = []
+        result = None
+        for index in xrange(self._start, last):
+            if proof_of(proved, goal) is not None:
+                result = [], True
+                break
+            subgoals, sound = yield self._steps[index], goal
+            link = self._link(index)
+            log.begin_branch(link, goal)
+            opened.append((link, goal, sound and len(subgoals) <= 1))
+            if not subgoals:
+                result = [], True
+                break
+            goal = subgoals[0]
+        else:
+            result = yield self._steps[last], goal
+
+        while opened:
+            link, goal, sound = opened.pop()
+            unmet, branch_sound = result
+            sound = sound and branch_sound
+            log.end_branch(link)
+            if sound and not unmet:
+                record_proof(proved, goal, link)
+            result = unmet, sound
+        yield None, result
 
 primitive = Primitive
 compound = Compound
@@ -98,8 +370,7 @@ def pair(first, second):
 def sequence(*args):
     if len(args) == 1:
         return args[0]
-    else:
-        return pair(args[0], sequence(*(args[1:])))
+    return Sequence(*args)
 
 # sequence(
 #     left_negation(),
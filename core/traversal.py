@@ -0,0 +1,76 @@
+'''Walk terms without recursion.
+
+Terms may be far deeper than Python's recursion limit: a long
+disjunction is a chain of combinations as deep as it is long. The
+walks here keep their own stack instead, and since terms are
+hash-consed they visit a subterm shared by several parents once.
+
+The walks are not tied to terms. A node is anything hashable, and the
+caller says what its children are, so the same walk serves nameless
+terms, or pairs of a term and the context it is visited in, such as
+the number of binders above it.
+'''
+
+def fold(root, children, combine, memo=None):
+    '''Return the result of folding combine over the nodes below root.
+
+    children(node) returns the nodes whose results the result for node
+    is made from, or an empty sequence if it needs none. Then
+    combine(node, results) returns the result for node, given the
+    results for its children in the same order. Children are visited
+    before their parents and from left to right, and each distinct
+    node is combined only once. A dictionary passed as memo keeps the
+    results between calls.
+    '''
+    if memo is None:
+        memo = {}
+    elif root in memo:
+        return memo[root]
+
+    expanded = {}
+    stack = [root]
+    while stack:
+        node = stack[-1]
+        if node in memo:
+            stack.pop()
+            continue
+        parts = expanded.get(node)
+        if parts is None:
+            parts = expanded[node] = tuple(children(node))
+            missing = [part for part in parts if part not in memo]
+            if missing:
+                missing.reverse()
+                stack.extend(missing)
+                continue
+        stack.pop()
+        del expanded[node]
+        memo[node] = combine(node, [memo[part] for part in parts])
+    return memo[root]
+
+def preorder(root, children):
+    '''Yield root and the distinct nodes below it, each before its
+    children, from left to right.'''
+    seen = set([root])
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        parts = [part for part in children(node) if part not in seen]
+        seen.update(parts)
+        parts.reverse()
+        stack.extend(parts)
+
+def write(root, pieces):
+    '''Return the text for root, where pieces(node) returns the strings
+    and the nodes whose text make up the text for node, in order.'''
+    out = []
+    stack = [root]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, basestring):
+            out.append(item)
+        else:
+            parts = list(pieces(item))
+            parts.reverse()
+            stack.extend(parts)
+    return ''.join(out)
@@ -0,0 +1,239 @@
+'''Infer the types of a whole term at once.
+
+TypeInferringTermBuilder infers types node by node: every combination
+it builds runs a fresh unifier over the free variables of both
+subterms and rebuilds them, so building a term costs time quadratic in
+its size. ConstraintTermBuilder instead builds an untyped skeleton,
+and infer() walks it once to collect type constraints into a single
+union-find unifier, then builds the typed term in a second pass.
+
+The constraints are the ones the node-by-node builder imposes: an
+operator's argument type matches its operand, a binder's variable has
+the type of the occurrences it binds, and free variables with the same
+name have the same type. Constants from the syntax are polymorphic:
+each occurrence gets its own copy of the constant's type variables.
+'''
+
+from cheqed.core import qterm, qtype
+from cheqed.core.qtype_unifier import TypeUnifier
+from cheqed.core.traversal import fold
+
+
+class PreConstant(object):
+    __slots__ = ('name', 'qtype', 'instance')
+
+    def __init__(self, name, qtype_):
+        self.name = name
+        self.qtype = qtype_
+        self.instance = None
+
+
+class PreCombination(object):
+    __slots__ = ('operator', 'operand', 'qtype')
+
+    def __init__(self, operator, operand):
+        self.operator = operator
+        self.operand = operand
+        self.qtype = None
+
+
+class PreAbstraction(object):
+    __slots__ = ('bound', 'body')
+
+    def __init__(self, bound, body):
+        if not qterm.is_variable(bound):
+            raise TypeError('bound terms must be variables')
+        self.bound = bound
+        self.body = body
+
+
+def is_preterm(term):
+    return isinstance(term, (PreConstant, PreCombination, PreAbstraction))
+
+
+class ConstraintTermBuilder:
+    '''Build untyped skeletons; finish() infers their types.
+
+    Variables are built as ordinary terms, and finished terms may be
+    used wherever a skeleton is expected.
+    '''
+
+    def build_constant(self, name, type_):
+        return PreConstant(name, type_)
+
+    def build_variable(self, name, type_):
+        return qterm.Variable(name, type_)
+
+    def build_combination(self, operator, operand):
+        return PreCombination(operator, operand)
+
+    def build_abstraction(self, bound, body):
+        return PreAbstraction(bound, body)
+
+    def finish(self, term):
+        return infer(term)
+
+
+class Inference:
+    def __init__(self):
+        self.unifier = TypeUnifier()
+        self.names = {}
+        self.scope = {}
+        self.origins = {}
+
+    def bind_name(self, name, type_):
+        if self.scope.get(name):
+            self.unifier.unify(type_, self.scope[name][-1])
+        elif name in self.names:
+            self.unifier.unify(type_, self.names[name])
+        else:
+            self.names[name] = type_
+
+    def representative(self, type_):
+        return self.unifier.unifier.representative(type_)
+
+    def instantiate(self, type_):
+        renaming = {}
+        for atom in type_.atoms():
+            if qtype.is_variable(atom):
+                renaming[atom] = qtype.qvar()
+                self.origins[renaming[atom]] = atom
+        return type_.substitute_all(renaming)
+
+    def collect(self, term):
+        '''Add the constraints for term and return its type.
+
+        The term is walked with an explicit stack, since it may be
+        deeper than the recursion limit. Each entry is a node and the
+        stage it has reached; the types of finished nodes are kept on a
+        second stack.
+        '''
+        types = []
+        stack = [(term, 0, None)]
+        while stack:
+            term, stage, operator = stack.pop()
+            if isinstance(term, PreConstant):
+                term.instance = self.instantiate(term.qtype)
+                types.append(term.instance)
+            elif isinstance(term, PreCombination):
+                if stage == 0:
+                    stack.append((term, 1, None))
+                    stack.append((term.operator, 0, None))
+                elif stage == 1:
+                    operator = self.representative(types.pop())
+                    stack.append((term, 2, operator))
+                    stack.append((term.operand, 0, None))
+                else:
+                    operand = types.pop()
+                    if qtype.is_polymorphic(operator) and qtype.is_fun(operator):
+                        self.unifier.unify(operator.args[0], operand)
+                        term.qtype = operator.args[1]
+                    else:
+                        term.qtype = qtype.qvar()
+                        self.unifier.unify(operator,
+                                           qtype.qfun(operand, term.qtype))
+                    types.append(term.qtype)
+            elif isinstance(term, PreAbstraction):
+                bound = term.bound
+                if stage == 0:
+                    self.scope.setdefault(bound.name, []).append(bound.qtype)
+                    stack.append((term, 1, None))
+                    stack.append((term.body, 0, None))
+                else:
+                    self.scope[bound.name].pop()
+                    types.append(qtype.qfun(bound.qtype, types.pop()))
+            else:
+                for free in term.free_variables():
+                    self.bind_name(free.name, free.qtype)
+                types.append(term.qtype)
+        return types.pop()
+
+    def substitutions(self):
+        '''Return the solution as a single simultaneous substitution.
+
+        A class of variables that did not resolve to a type is named
+        by a variable that occurs outside constant instances if it has
+        one. Otherwise it gets back the constant's own variable, as
+        long as no other class has claimed it, so that for instance a
+        lone (=) keeps the type it was declared with.
+        '''
+        unifier = self.unifier.unifier
+        classes = unifier.classes()
+        for instance in self.origins:
+            if instance not in unifier.parents:
+                classes.append([instance])
+
+        canonical = {}
+        claimed = set()
+        for members in classes:
+            rep = unifier.representative(members[0])
+            if not qtype.is_variable(rep):
+                continue
+            plain = [var for var in members if var not in self.origins]
+            if rep in plain:
+                name = rep
+            elif plain:
+                name = plain[0]
+            else:
+                name = rep
+                for var in members:
+                    if self.origins[var] not in claimed:
+                        name = self.origins[var]
+                        break
+                claimed.add(name)
+            for var in members:
+                canonical[var] = name
+
+        result = {}
+        for var in canonical:
+            resolved = self.unifier.resolve(var).substitute_all(canonical)
+            if resolved != var:
+                result[var] = resolved
+        for var in unifier.parents.keys():
+            if qtype.is_variable(var) and var not in canonical:
+                result[var] = self.unifier.resolve(var).substitute_all(canonical)
+        return result
+
+    def build(self, term, substitutions, memo=None):
+        def parts(term):
+            if isinstance(term, PreCombination):
+                return (term.operator, term.operand)
+            elif isinstance(term, PreAbstraction):
+                return (term.body,)
+            return ()
+
+        def combine(term, parts):
+            if isinstance(term, PreConstant):
+                return qterm.Constant(
+                    term.name, term.instance.substitute_all(substitutions))
+            elif isinstance(term, PreCombination):
+                return qterm.Combination(*parts)
+            elif isinstance(term, PreAbstraction):
+                return qterm.Abstraction(
+                    term.bound.substitute_types(substitutions), parts[0])
+            else:
+                return term.substitute_types(substitutions)
+
+        return fold(term, parts, combine, memo)
+
+
+def infer(term):
+    '''Return the typed term for a skeleton built by a
+    ConstraintTermBuilder.'''
+    if not is_preterm(term):
+        return term
+    inference = Inference()
+    inference.collect(term)
+    return inference.build(term, inference.substitutions())
+
+def infer_all(terms):
+    '''Infer types for several terms together, so that free variables
+    with the same name get the same type in all of them.'''
+    if len(terms) == 1:
+        return [infer(terms[0])]
+    inference = Inference()
+    for term in terms:
+        inference.collect(term)
+    substitutions = inference.substitutions()
+    memo = {}
+    return [inference.build(term, substitutions, memo) for term in terms]
@@ -1,42 +1,114 @@
 class UnificationError(Exception):
     pass
 
+_missing = object()
+
 class Unifier:
+    '''Union-find over arbitrary hashable values.
+
+    Each set has a representative value, which is a non-variable
+    member if the set has one. Sets are linked by rank and paths are
+    compressed on lookup, so a sequence of unifications costs almost
+    linear time in its length.
+
+    While a checkpoint is open, every change to the unifier is recorded
+    on a trail, and rollback() undoes the changes made since a
+    checkpoint in time proportional to their number. Each checkpoint
+    is closed by exactly one rollback() or commit(); once the outermost
+    one is closed, the trail is dropped and changes are no longer
+    recorded.
+    '''
+
     def __init__(self, is_variable, occurs_in):
         self.is_variable = is_variable
         self.occurs_in = occurs_in
-        self.sets = []
-        
+        self.parents = {}
+        self.ranks = {}
+        self.reps = {}
+        self.trail = None
+        self.open_checkpoints = 0
+
+    def _set(self, table, key, value):
+        if self.trail is not None:
+            self.trail.append((table, key, table.get(key, _missing)))
+        table[key] = value
+
+    def checkpoint(self):
+        '''Return a marker for the current state of the unifier.'''
+        if self.trail is None:
+            self.trail = []
+        self.open_checkpoints += 1
+        return len(self.trail)
+
+    def rollback(self, checkpoint):
+        '''Undo every change made since checkpoint was taken, and close
+        it.'''
+        trail = self.trail
+        while len(trail) > checkpoint:
+            table, key, value = trail.pop()
+            if value is _missing:
+                del table[key]
+            else:
+                table[key] = value
+        self._close()
+
+    def commit(self, checkpoint):
+        '''Keep the changes made since checkpoint was taken, and close
+        it.'''
+        self._close()
+
+    def _close(self):
+        self.open_checkpoints -= 1
+        if not self.open_checkpoints:
+            self.trail = None
+
     def find(self, value):
-        for index, (rep, set_) in enumerate(self.sets):
-            if value in set_:
-                return index
-
-        self.sets.append((value, set([value])))
-        return len(self.sets) - 1
-    
-    def union(self, index_a, index_b):
-        if index_a == index_b:
+        '''Return the root of the set containing value, adding a new
+        singleton set if value has not been seen before.'''
+        parents = self.parents
+        if value not in parents:
+            self._set(parents, value, value)
+            self._set(self.ranks, value, 0)
+            self._set(self.reps, value, value)
+            return value
+
+        # parents and roots are the stored keys themselves, so identity
+        # comparisons suffice and avoid calling __eq__ on the values
+        root = parents[value]
+        while parents[root] is not root:
+            root = parents[root]
+
+        while parents[value] is not root:
+            parent = parents[value]
+            self._set(parents, value, root)
+            value = parent
+        return root
+
+    def union(self, root_a, root_b):
+        if root_a == root_b:
             return
-        
-        rep_a, set_a = self.sets[index_a]
-        rep_b, set_b = self.sets[index_b]
-        
+
+        rep_a = self.reps[root_a]
+        rep_b = self.reps[root_b]
+
         if self.is_variable(rep_a):
-            keep = index_b
-            discard = index_a
+            rep, discard = rep_b, rep_a
         elif self.is_variable(rep_b):
-            keep = index_a
-            discard = index_b
+            rep, discard = rep_a, rep_b
         elif rep_a != rep_b:
             raise UnificationError('cannot unify %r and %r' % (rep_a, rep_b))
         else:
             return
 
-        if self.occurs_in(self.sets[discard][0], self.sets[keep][0]):
-            raise UnificationError('bar')
-        self.sets[keep][1].update(self.sets[discard][1])
-        del self.sets[discard]
+        if self.occurs_in(discard, rep):
+            raise UnificationError('%r occurs in %r' % (discard, rep))
+
+        if self.ranks[root_a] < self.ranks[root_b]:
+            root_a, root_b = root_b, root_a
+        self._set(self.parents, root_b, root_a)
+        if self.ranks[root_a] == self.ranks[root_b]:
+            self._set(self.ranks, root_a, self.ranks[root_a] + 1)
+        self._set(self.reps, root_a, rep)
 
     def unify(self, a, b):
         '''Extend the unifier such that a and b will be equivalent after
@@ -46,11 +118,24 @@ class Unifier:
         '''
         self.union(self.find(a), self.find(b))
 
+    def representative(self, value):
+        '''Return the representative of the set containing value.'''
+        if value not in self.parents:
+            return value
+        return self.reps[self.find(value)]
+
+    def classes(self):
+        '''Return a list of the sets, each as a list of its members.'''
+        classes = {}
+        for value in self.parents.keys():
+            classes.setdefault(self.find(value), []).append(value)
+        return classes.values()
+
     def get_substitutions(self):
         '''return a dictionary of substitutions (value for key)'''
         result = {}
-        for rep, set_ in self.sets:
-            for value in set_:
-                if value != rep:
-                    result[value] = rep
+        for value in self.parents.keys():
+            rep = self.representative(value)
+            if value != rep:
+                result[value] = rep
         return result